@@ -0,0 +1,411 @@
+#================================================================================================================================================
+#                                                              nanobench
+
+# Benchmarks for the NanOS hot paths, run against stub hardware on the host.
+#
+#   python nanobench.py ../v0.0.3                      run, print, and append the results to bench_history.jsonl
+#   python nanobench.py ../v0.0.3 --compare            ... and flag anything more than 10% slower than the recent median
+#   micropython nanobench.py ../v0.0.3 --compare       same thing on MicroPython's unix port
+#
+# Options:
+#   --history FILE       history file (default bench_history.jsonl in the current directory)
+#   --threshold PCT      slowdown, in percent, that counts as a regression (default 10)
+#   --window N           compare against the median of the last N matching runs (default 5), so one noisy run
+#                        in the history doesn't mask or fake a regression
+#   --no-save            don't append this run to the history
+#
+# Each line of the history file is one run:
+#   {"time": ..., "impl": "cpython", "version": "v0.0.3", "results": {"encoder_isr": 1.92, ...}}
+# with every result in microseconds per call (best of BENCH_ROUNDS rounds). --compare only compares against runs of
+# the same implementation and NanOS version, and exits with status 1 if anything regressed.
+#
+# This file only uses what MicroPython's unix port has (no argparse, no types module), so the same benchmarks run
+# on both interpreters. Timing uses time.ticks_us where it exists and perf_counter otherwise.
+
+import sys
+import os
+import json
+import time
+
+BENCH_ROUNDS = 7
+
+#================================================================================================================================================
+#                                                              timing
+
+if hasattr(time, "ticks_us"):
+    def now_us():
+        return time.ticks_us()
+    def elapsed_us(start):
+        return time.ticks_diff(time.ticks_us(), start)
+else:
+    def now_us():
+        return time.perf_counter()
+    def elapsed_us(start):
+        return (time.perf_counter() - start) * 1000000
+
+# Calls func(n) BENCH_ROUNDS times and returns the best time per iteration in microseconds.
+# func runs the operation n times itself, so loop overhead stays inside the benchmarked code, as it would on the float.
+def best_of(func, n):
+    best = None
+    for r in range(BENCH_ROUNDS):
+        start = now_us()
+        func(n)
+        t = elapsed_us(start) / n
+        if best is None or t < best:
+            best = t
+    return best
+
+#================================================================================================================================================
+#                                                           stub hardware
+
+# Just enough of machine, network and webrepl for boot.py to import. Nothing here moves in the background:
+# the benchmarks drive the encoder pins and the piston control loop themselves.
+
+class _Namespace:
+    pass
+
+class StubPin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+        self.handler = None
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+    def irq(self, handler=None, trigger=3, hard=False):
+        self.handler = handler
+
+class StubPWM:
+    def __init__(self, pin, freq=0, duty_u16=0):
+        self._duty = duty_u16
+
+    def duty_u16(self, d=None):
+        if d is None:
+            return self._duty
+        self._duty = d
+
+    def deinit(self):
+        pass
+
+class StubI2C:
+    def __init__(self, *args, **kwargs):
+        pass
+
+class StubADC:
+    ATTN_0DB = 0
+    ATTN_11DB = 3
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def read_u16(self):
+        return 0
+
+class StubTimer:
+    PERIODIC = 1
+    ONE_SHOT = 0
+
+    def __init__(self, *args, **kwargs):
+        self.callback = None
+
+    def init(self, mode=1, period=0, freq=0, callback=None):
+        self.callback = callback
+
+    def deinit(self):
+        self.callback = None
+
+class StubRTC:
+    def __init__(self, *args, **kwargs):
+        self._memory = b""
+
+    def memory(self, data=None):
+        if data is None:
+            return self._memory
+        self._memory = bytes(data)
+
+class StubWLAN:
+    def __init__(self, interface=0):
+        pass
+
+    def active(self, v=None):
+        return True
+
+    def config(self, *args, **kwargs):
+        pass
+
+    def isconnected(self):
+        return False
+
+def install_stubs():
+    machine = _Namespace()
+    machine.Pin = StubPin
+    machine.PWM = StubPWM
+    machine.I2C = StubI2C
+    machine.ADC = StubADC
+    machine.Timer = StubTimer
+    machine.disable_irq = lambda: 0
+    machine.enable_irq = lambda state: None
+    machine.RTC = StubRTC
+    machine.deepsleep = lambda ms=0: None
+    machine.lightsleep = lambda ms=0: None
+    machine.reset_cause = lambda: 1
+    machine.DEEPSLEEP_RESET = 4
+    sys.modules["machine"] = machine
+
+    network = _Namespace()
+    network.WLAN = StubWLAN
+    network.STA_IF = 0
+    network.AP_IF = 1
+    sys.modules["network"] = network
+
+    webrepl = _Namespace()
+    webrepl.start = lambda *args, **kwargs: None
+    sys.modules["webrepl"] = webrepl
+
+    # CPython's time module has no MicroPython ticks, boot.py needs them
+    if not hasattr(time, "ticks_ms"):
+        utime = _Namespace()
+        for name in dir(time):
+            if not name.startswith("_"):
+                setattr(utime, name, getattr(time, name))
+        utime.sleep_ms = lambda ms: time.sleep(ms / 1000)
+        utime.ticks_ms = lambda: int(time.perf_counter() * 1000) & 0x3FFFFFFF
+        utime.ticks_us = lambda: int(time.perf_counter() * 1000000) & 0x3FFFFFFF
+        utime.ticks_diff = lambda a, b: ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+        utime.ticks_add = lambda a, b: (a + b) & 0x3FFFFFFF
+        sys.modules["time"] = utime
+
+# Bus object that satisfies the ms5837 driver without any I/O
+class StubBus:
+    def write_byte(self, addr, value):
+        pass
+
+#================================================================================================================================================
+#                                                              benchmarks
+
+# Quadrature sequence, in the order the decoder counts up
+QUADRATURE = ((0, 0), (1, 0), (1, 1), (0, 1))
+
+def bench_encoder_isr(boot):
+    pin_a = boot.en_A
+    pin_b = boot.en_B
+    isr = boot.encoder_isr
+    states = QUADRATURE
+
+    def run(n):
+        for i in range(n):
+            a, b = states[i & 3]
+            pin_a._value = a
+            pin_b._value = b
+            isr(pin_a)
+    return best_of(run, 50000)
+
+def bench_calculate(ms5837, model):
+    sensor = ms5837.MS5837(model, StubBus())
+    sensor._C = [0, 34982, 36352, 20328, 22354, 26646, 26146]
+    sensor._D1 = 4958179
+    sensor._D2 = 6815414
+    calc = sensor._calculate
+
+    def run(n):
+        for i in range(n):
+            calc()
+    return best_of(run, 5000)
+
+def bench_crc4(ms5837):
+    sensor = ms5837.MS5837(ms5837.MODEL_30BA, StubBus())
+    prom = [0x40A5, 34982, 36352, 20328, 22354, 26646, 26146]
+    crc = sensor._crc4
+
+    def run(n):
+        for i in range(n):
+            crc(prom)
+    return best_of(run, 5000)
+
+def bench_save_position(boot):
+    save = boot.save_position
+
+    def run(n):
+        for i in range(n):
+            boot.position = i
+            save()
+    return best_of(run, 200)
+
+# A full closed-loop piston_move of `counts` encoder counts. The stub encoder moves one count per control tick
+# so the benchmark covers the planner, every piston_tick and the final save.
+def bench_piston_move(boot, counts=1000):
+    pin_a = boot.en_A
+    pin_b = boot.en_B
+    isr = boot.encoder_isr
+    tick = boot.piston_tick
+    # Normally-closed limit switch, closed while the piston is short of full extension
+    boot.lim_sw_state._value = 1
+
+    def run(n):
+        for i in range(n):
+            target = counts if i % 2 == 0 else 0
+            move = boot.piston_move("abs", target)
+            count = boot.encoder_read()
+            while not move.done():
+                count += 1 if boot.piston_drive_duty > 0 else -1
+                a, b = QUADRATURE[count & 3]
+                pin_a._value = a
+                pin_b._value = b
+                isr(pin_a)
+                tick(None)
+    return best_of(run, 4)
+
+#================================================================================================================================================
+#                                                              runner
+
+def load_firmware(version_dir):
+    install_stubs()
+    if not version_dir.startswith("/"):
+        version_dir = os.getcwd() + "/" + version_dir
+    version_dir = version_dir.rstrip("/")
+    sys.path.insert(0, version_dir)
+    # Modules shared between versions (ms5837, smbus, config_store), as the board's /lib
+    sys.path.insert(1, version_dir.rsplit("/", 1)[0] + "/lib")
+
+    # boot.py writes its journal to the current directory, keep that out of the source tree
+    scratch = ".nanobench"
+    try:
+        os.mkdir(scratch)
+    except OSError:
+        pass
+    os.chdir(scratch)
+    for name in os.listdir("."):
+        os.remove(name)
+
+    import boot
+    import ms5837
+    return boot, ms5837
+
+def run_benchmarks(version_dir):
+    # Silence boot.py's startup and piston_move chatter while it runs
+    import builtins
+    real_print = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        boot, ms5837 = load_firmware(version_dir)
+        results = {}
+        results["encoder_isr"] = bench_encoder_isr(boot)
+        results["ms5837_calculate_30ba"] = bench_calculate(ms5837, ms5837.MODEL_30BA)
+        results["ms5837_calculate_02ba"] = bench_calculate(ms5837, ms5837.MODEL_02BA)
+        results["ms5837_crc4"] = bench_crc4(ms5837)
+        results["save_position"] = bench_save_position(boot)
+        results["piston_move_1000"] = bench_piston_move(boot)
+    finally:
+        builtins.print = real_print
+        os.chdir("..")
+    return results
+
+def load_history(path):
+    runs = []
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    runs.append(json.loads(line))
+    except OSError:
+        pass
+    return runs
+
+# Per-benchmark median of a list of runs
+def median_results(runs):
+    baseline = {}
+    for run in runs:
+        for name in run["results"]:
+            baseline.setdefault(name, []).append(run["results"][name])
+    for name in baseline:
+        values = sorted(baseline[name])
+        baseline[name] = values[len(values) // 2]
+    return baseline
+
+# Returns a list of (name, baseline, current, percent slower) for every benchmark past the threshold
+def compare(baseline, results, threshold):
+    regressions = []
+    for name in results:
+        old = baseline.get(name)
+        if not old:
+            continue
+        new = results[name]
+        change = (new - old) * 100 / old
+        if change > threshold:
+            regressions.append((name, old, new, change))
+    return regressions
+
+def main(argv):
+    if len(argv) < 2:
+        print("usage: nanobench.py <NanOS version dir> [--compare] [--history FILE] [--threshold PCT] [--window N] [--no-save]")
+        return 2
+
+    version_dir = argv[1]
+    history = "bench_history.jsonl"
+    threshold = 10.0
+    window = 5
+    do_compare = False
+    save = True
+    i = 2
+    while i < len(argv):
+        if argv[i] == "--compare":
+            do_compare = True
+        elif argv[i] == "--no-save":
+            save = False
+        elif argv[i] == "--history":
+            i += 1
+            history = argv[i]
+        elif argv[i] == "--threshold":
+            i += 1
+            threshold = float(argv[i])
+        elif argv[i] == "--window":
+            i += 1
+            window = int(argv[i])
+        i += 1
+
+    history = os.getcwd() + "/" + history if not history.startswith("/") else history
+    version = version_dir.rstrip("/").split("/")[-1]
+    impl = sys.implementation.name
+
+    results = run_benchmarks(version_dir)
+
+    previous = [run for run in load_history(history) if run.get("impl") == impl and run.get("version") == version]
+    baseline = median_results(previous[-window:]) if previous else None
+
+    print("NanOS %s on %s" % (version, impl))
+    for name in results:
+        line = "  %-24s %10.2f us" % (name, results[name])
+        if baseline is not None and baseline.get(name):
+            old = baseline[name]
+            line += "   (%+.1f%%)" % ((results[name] - old) * 100 / old)
+        print(line)
+
+    if save:
+        with open(history, "a") as f:
+            f.write(json.dumps({"time": time.time(), "impl": impl, "version": version, "results": results}) + "\n")
+
+    if do_compare:
+        if baseline is None:
+            print("No earlier %s run of %s in %s to compare against" % (impl, version, history))
+            return 0
+        regressions = compare(baseline, results, threshold)
+        for name, old, new, change in regressions:
+            print("REGRESSION: %s %.2f us -> %.2f us (+%.1f%%)" % (name, old, new, change))
+        if regressions:
+            return 1
+        print("No regressions past %.0f%%" % threshold)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
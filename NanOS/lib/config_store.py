@@ -0,0 +1,175 @@
+#================================================================================================================================================
+#                                                              config_store
+
+# Typed key/value settings in one small binary file, read once at boot into a dict.
+#
+# Every setting has a default, and its type (int, float, bool or str) is the default's type. get()/config[key]
+# reads the cached dict, set() checks and converts the value and marks the store dirty, and save() writes it back.
+#
+# File layout (CONFIG_FILE):
+#
+#   magic b"NFCF", number of entries (uint16), then per entry:
+#       key length (uint8), key, type (one byte: b"i" int32, b"f" float32, b"b" bool, b"s" string),
+#       value (4 bytes for i and f, 1 for b, uint16 length and UTF-8 bytes for s)
+#   then a CRC32 of everything before it (uint32)
+#
+# save() writes the whole file to CONFIG_TEMP and renames it over CONFIG_FILE, so a reset mid-write leaves the old
+# settings or the new ones, never half of each. A file that is missing, cut short or fails its CRC loads as empty
+# and the defaults apply. Entries for keys without a default (e.g. written by newer firmware) are kept as they are.
+
+import os
+import struct
+from binascii import crc32
+
+CONFIG_FILE = "config.bin"
+CONFIG_TEMP = "config.tmp"
+CONFIG_MAGIC = b"NFCF"
+
+# Mission parameters and their defaults. Every NanOS version with a mission menu reads and writes these keys in the
+# same config.bin, so they're defined once here rather than in each boot.py.
+MISSION_DEFAULTS = {
+    "dives": 6, #-------------------------- Dives per deploy()
+    "dive_depth_m": 2.5, #----------------- Depth to hold at the bottom of a dive, 0 for an open-loop dive
+    "dive_tolerance_m": 0.25, #------------ How close to that depth counts as holding it
+    "dive_bottom_s": 60, #----------------- Time spent at depth per dive, in seconds
+    "dive_surface_s": 60, #---------------- Time spent at the surface between dives, in seconds
+    "depth_hold_timeout_s": 900, #--------- Give up on a hold that hasn't finished after this long
+}
+
+class ConfigStore(object):
+
+    def __init__(self, defaults, path=CONFIG_FILE, temp=CONFIG_TEMP):
+        self._defaults = defaults
+        self._path = path
+        self._temp = temp
+        self._values = {}
+        self.dirty = False #------------------ Something was set since the last load() or save()
+
+    # Reads the file into the cache. Returns False if there was no valid file, leaving every setting at its default.
+    def load(self):
+        self._values = {}
+        self.dirty = False
+        for path in (self._path, self._temp):
+            # The temp file only survives on its own if a reset came between removing the old file and the rename
+            try:
+                with open(path, "rb") as f:
+                    values = self._decode(f.read())
+            except OSError:
+                continue
+            if values is not None:
+                self._values = values
+                return True
+        return False
+
+    def _decode(self, data):
+        if len(data) < 10 or data[:4] != CONFIG_MAGIC:
+            return None
+        if struct.unpack("<I", data[-4:])[0] != crc32(data[:-4]) & 0xFFFFFFFF:
+            return None
+        values = {}
+        count = struct.unpack("<H", data[4:6])[0]
+        pos = 6
+        try:
+            for _ in range(count):
+                length = data[pos]
+                key = data[pos + 1:pos + 1 + length].decode()
+                kind = data[pos + 1 + length]
+                pos += length + 2
+                if kind == 0x69: # b"i"
+                    value = struct.unpack("<i", data[pos:pos + 4])[0]
+                    pos += 4
+                elif kind == 0x66: # b"f"
+                    value = struct.unpack("<f", data[pos:pos + 4])[0]
+                    pos += 4
+                elif kind == 0x62: # b"b"
+                    value = data[pos] != 0
+                    pos += 1
+                elif kind == 0x73: # b"s"
+                    length = struct.unpack("<H", data[pos:pos + 2])[0]
+                    value = data[pos + 2:pos + 2 + length].decode()
+                    pos += length + 2
+                else:
+                    return None
+                values[key] = value
+        except Exception:
+            # The CRC checked out, so this is a layout this firmware doesn't know rather than a damaged file
+            return None
+        return values
+
+    def _encode(self):
+        parts = [CONFIG_MAGIC, struct.pack("<H", len(self._values))]
+        for key, value in self._values.items():
+            name = key.encode()
+            parts.append(struct.pack("<B", len(name)) + name)
+            if type(value) is bool:
+                parts.append(b"b" + (b"\x01" if value else b"\x00"))
+            elif type(value) is int:
+                parts.append(b"i" + struct.pack("<i", value))
+            elif type(value) is float:
+                parts.append(b"f" + struct.pack("<f", value))
+            else:
+                text = value.encode()
+                parts.append(b"s" + struct.pack("<H", len(text)) + text)
+        data = b"".join(parts)
+        return data + struct.pack("<I", crc32(data) & 0xFFFFFFFF)
+
+    def get(self, key):
+        if key in self._values:
+            return self._values[key]
+        return self._defaults[key]
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def __contains__(self, key):
+        return key in self._defaults or key in self._values
+
+    def keys(self):
+        keys = list(self._defaults)
+        for key in self._values:
+            if key not in self._defaults:
+                keys.append(key)
+        return keys
+
+    # Sets key to value converted to the type of its default, so text typed at the REPL or a menu ("2.5", "on")
+    # can be passed straight in. Raises KeyError for a key without a default and ValueError for a value that doesn't
+    # convert. Nothing is written until save().
+    def set(self, key, value):
+        kind = type(self._defaults[key])
+        if kind is bool and isinstance(value, str):
+            text = value.strip().lower()
+            if text in ("1", "true", "yes", "on"):
+                value = True
+            elif text in ("0", "false", "no", "off"):
+                value = False
+            else:
+                raise ValueError("not a yes/no value: %s" % value)
+        else:
+            value = kind(value)
+        if kind is int and not -0x80000000 <= value <= 0x7FFFFFFF:
+            raise ValueError("out of range: %d" % value)
+        if kind is str and len(value.encode()) > 0xFFFF:
+            raise ValueError("too long")
+        if self.get(key) != value:
+            self._values[key] = value
+            self.dirty = True
+        return value
+
+    # Writes the settings if anything changed. Returns True if the file was written.
+    def save(self):
+        if not self.dirty:
+            return False
+        with open(self._temp, "wb") as f:
+            f.write(self._encode())
+        try:
+            os.rename(self._temp, self._path)
+        except OSError:
+            # Filesystems that won't rename over an existing file: load() falls back to the temp file if a reset
+            # comes before the rename
+            os.remove(self._path)
+            os.rename(self._temp, self._path)
+        self.dirty = False
+        return True
+
+    def __repr__(self):
+        return "<config %s>" % ", ".join("%s=%r" % (key, self.get(key)) for key in self.keys())
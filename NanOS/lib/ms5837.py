@@ -0,0 +1,469 @@
+try:
+    import smbus2 as smbus
+except ImportError:
+    try:
+        # On the float, the MicroPython SMBus adapter in smbus.py
+        import smbus
+    except ImportError:
+        print('Try sudo apt-get install python-smbus2')
+    
+from time import sleep
+
+import struct
+from binascii import crc32
+
+try:
+    # Only available on the float, used to tell a deepsleep wake from a cold boot
+    from machine import reset_cause, DEEPSLEEP_RESET
+except ImportError:
+    reset_cause = None
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    # CPython has no ticks, build them from perf_counter
+    from time import perf_counter
+    def ticks_us():
+        return int(perf_counter() * 1000000)
+    def ticks_diff(a, b):
+        return a - b
+
+# Models
+MODEL_02BA = 0
+MODEL_30BA = 1
+
+# Oversampling options
+OSR_256  = 0
+OSR_512  = 1
+OSR_1024 = 2
+OSR_2048 = 3
+OSR_4096 = 4
+OSR_8192 = 5
+
+# Adaptive oversampling: pass as the oversampling option and the driver picks one per sample from how fast the
+# pressure is changing (see adaptive_osr). Each entry is (rate in Pa/s, OSR to use at or above that rate), fastest
+# first. About 9800 Pa/s is 1 m/s in water. Below the last rate, e.g. while holding depth, OSR_8192 is used.
+# It pays off when the caller samples faster while the depth changes fast, as v0.0.3's depth_hold() does: a quicker
+# conversion fits the shorter period. At a fixed rate it would only give noisier readings.
+OSR_ADAPTIVE = 6
+ADAPTIVE_OSR = ((3000, OSR_1024), (1500, OSR_2048), (500, OSR_4096))
+
+# Non-blocking conversion states (see start/ready/collect)
+STATE_IDLE = 0
+STATE_CONVERTING_D1 = 1
+STATE_CONVERTING_D2 = 2
+STATE_READY = 3
+
+# Calibration cache file: sensor address, model, the 7 PROM words and a CRC32 of all of that
+CAL_FILE = "ms5837_cal.bin"
+CAL_FORMAT = "<BB7H"
+
+# CRC4 lookup table, built on first use by _crc4_table()
+_CRC4_TABLE = None
+
+# kg/m^3 convenience
+DENSITY_FRESHWATER = 997
+DENSITY_SALTWATER = 1029
+
+# Conversion factors (from native unit, mbar)
+UNITS_Pa     = 100.0
+UNITS_hPa    = 1.0
+UNITS_kPa    = 0.1
+UNITS_mbar   = 1.0
+UNITS_bar    = 0.001
+UNITS_atm    = 0.000986923
+UNITS_Torr   = 0.750062
+UNITS_psi    = 0.014503773773022
+
+# Valid units
+UNITS_Centigrade = 1
+UNITS_Farenheit  = 2
+UNITS_Kelvin     = 3
+
+    
+class MS5837(object):
+    
+    # Registers
+    _MS5837_ADDR             = 0x76  
+    _MS5837_RESET            = 0x1E
+    _MS5837_ADC_READ         = 0x00
+    _MS5837_PROM_READ        = 0xA0
+    _MS5837_CONVERT_D1_256   = 0x40
+    _MS5837_CONVERT_D2_256   = 0x50
+    
+    # bus is either a bus number, or an SMBus object that is already set up
+    # (e.g. smbus.SMBus(0, scl=Pin(23), sda=Pin(22)) on the float)
+    def __init__(self, model=MODEL_30BA, bus=1):
+        self._model = model
+        
+        if hasattr(bus, "write_byte"):
+            self._bus = bus
+        else:
+            try:
+                self._bus = smbus.SMBus(bus)
+            except:
+                print("Bus %d is not available."%bus)
+                print("Available busses are listed as /dev/i2c*")
+                self._bus = None
+        
+        # ADC reads go into this buffer when the bus can fill one (the MicroPython adapter), so sampling allocates nothing
+        self._adc_buf = bytearray(3)
+        self._read_into = getattr(self._bus, "read_i2c_block_data_into", None)
+        
+        self._fluidDensity = DENSITY_FRESHWATER
+        self._pressure = 0
+        self._temperature = 0
+        self._D1 = 0
+        self._D2 = 0
+        self._state = STATE_IDLE
+        self._osr = OSR_8192
+        self._deadline = 0
+        self._rate = 0 #----------------------- Filtered rate of pressure change in Pa/s, positive while descending
+        self._rate_us = None #----------------- ticks_us of the reading the rate was last updated from
+        self._rate_pressure = 0
+        
+    # Resets the sensor and reads its PROM calibration, or loads the calibration cached by an earlier init().
+    # cached=None (the default) uses the cache only when the float wakes from deepsleep: boot.py runs on every wake,
+    # but the sensor and its PROM are the same, so the reset and 7 PROM reads can be skipped. A cold boot always reads
+    # the PROM and refreshes the cache. Pass True or False to force either behaviour.
+    def init(self, cached=None):
+        if self._bus is None:
+            "No bus!"
+            return False
+        
+        if cached is None:
+            save = reset_cause is not None
+            cached = save and reset_cause() == DEEPSLEEP_RESET
+        else:
+            save = True
+        
+        if cached and self._load_calibration():
+            return True
+        
+        self._bus.write_byte(self._MS5837_ADDR, self._MS5837_RESET)
+        
+        # Wait for reset to complete
+        sleep(0.01)
+        
+        self._C = []
+        
+        # Read calibration values and CRC
+        for i in range(7):
+            c = self._bus.read_word_data(self._MS5837_ADDR, self._MS5837_PROM_READ + 2*i)
+            c =  ((c & 0xFF) << 8) | (c >> 8) # SMBus is little-endian for word transfers, we need to swap MSB and LSB
+            self._C.append(c)
+                        
+        crc = (self._C[0] & 0xF000) >> 12
+        if crc != self._crc4(self._C):
+            print("PROM read error, CRC failed!")
+            return False
+        
+        if save:
+            self._save_calibration()
+        
+        return True
+    
+    # Loads cached calibration for this sensor. Returns False if there is no cache, it belongs to a different
+    # address or model, or it fails either its CRC32 or the PROM's own CRC4.
+    def _load_calibration(self):
+        try:
+            with open(CAL_FILE, "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        
+        size = struct.calcsize(CAL_FORMAT)
+        if len(data) != size + 4:
+            return False
+        if struct.unpack("<I", data[size:])[0] != crc32(data[:size]) & 0xFFFFFFFF:
+            return False
+        
+        cal = struct.unpack(CAL_FORMAT, data[:size])
+        if cal[0] != self._MS5837_ADDR or cal[1] != self._model:
+            return False
+        
+        C = list(cal[2:])
+        if (C[0] & 0xF000) >> 12 != self._crc4(C):
+            return False
+        
+        self._C = C
+        return True
+    
+    def _save_calibration(self):
+        data = struct.pack(CAL_FORMAT, self._MS5837_ADDR, self._model, *self._C)
+        try:
+            with open(CAL_FILE, "wb") as f:
+                f.write(data)
+                f.write(struct.pack("<I", crc32(data) & 0xFFFFFFFF))
+        except OSError:
+            print("Could not cache calibration in %s" % CAL_FILE)
+        
+    def read(self, oversampling=OSR_8192):
+        if not self.start(oversampling):
+            return False
+        
+        while not self.ready():
+            wait = self.remaining_us()
+            if wait > 0:
+                sleep(wait / 1000000)
+        
+        return self.collect()
+    
+    # Maximum conversion time increases linearly with oversampling
+    # max time (seconds) ~= 2.2e-6(x) where x = OSR = (2^8, 2^9, ..., 2^13)
+    # We use 2.5e-6 for some overhead, i.e. 2.5 * 2^(8+osr) microseconds
+    def _conversion_us(self, oversampling):
+        return (5 << (8 + oversampling)) >> 1
+    
+    def _read_adc(self):
+        if self._read_into is not None:
+            d = self._adc_buf
+            self._read_into(self._MS5837_ADDR, self._MS5837_ADC_READ, d)
+        else:
+            d = self._bus.read_i2c_block_data(self._MS5837_ADDR, self._MS5837_ADC_READ, 3)
+        return d[0] << 16 | d[1] << 8 | d[2]
+    
+    def _convert(self, command):
+        self._bus.write_byte(self._MS5837_ADDR, command + 2*self._osr)
+        self._deadline = ticks_us() + self._conversion_us(self._osr)
+    
+    # Non-blocking read, in three steps:
+    #   start(osr)  requests the D1 (pressure) conversion and returns straight away
+    #   ready()     returns True once both conversions are done. Each call that finds the D1 conversion finished
+    #               reads it and requests D2 (temperature), so ready() must be polled until it returns True
+    #   collect()   calculates pressure and temperature from D1 and D2, as read() does
+    # remaining_us() says how long the current conversion still has to run, for callers that want to sleep.
+    def start(self, oversampling=OSR_8192):
+        if self._bus is None:
+            print("No bus!")
+            return False
+        
+        if oversampling == OSR_ADAPTIVE:
+            oversampling = self.adaptive_osr()
+        
+        if oversampling < OSR_256 or oversampling > OSR_8192:
+            print("Invalid oversampling option!")
+            return False
+        
+        self._osr = oversampling
+        
+        # Request D1 conversion (pressure)
+        self._convert(self._MS5837_CONVERT_D1_256)
+        self._state = STATE_CONVERTING_D1
+        
+        return True
+    
+    def remaining_us(self):
+        if self._state in (STATE_CONVERTING_D1, STATE_CONVERTING_D2):
+            return max(0, ticks_diff(self._deadline, ticks_us()))
+        return 0
+    
+    def ready(self):
+        if self._state == STATE_CONVERTING_D1 and self.remaining_us() == 0:
+            self._D1 = self._read_adc()
+            
+            # Request D2 conversion (temperature)
+            self._convert(self._MS5837_CONVERT_D2_256)
+            self._state = STATE_CONVERTING_D2
+        
+        elif self._state == STATE_CONVERTING_D2 and self.remaining_us() == 0:
+            self._D2 = self._read_adc()
+            self._state = STATE_READY
+        
+        return self._state == STATE_READY
+    
+    def collect(self):
+        if self._state != STATE_READY:
+            return False
+        
+        self._state = STATE_IDLE
+        
+        # Calculate compensated pressure and temperature
+        # using raw ADC values and internal calibration
+        self._calculate()
+        self._update_rate()
+        
+        return True
+    
+    # Updates the filtered pressure rate from the reading just collected. Integer-only, like _calculate.
+    def _update_rate(self):
+        now = ticks_us()
+        if self._rate_us is not None:
+            dt = ticks_diff(now, self._rate_us)
+            if dt > 0:
+                rate = (self._pressure - self._rate_pressure) * 1000000 // dt
+                self._rate += (rate - self._rate) >> 1
+        self._rate_us = now
+        self._rate_pressure = self._pressure
+    
+    # Oversampling for the next sample in adaptive mode: the faster the float is moving, the less time each
+    # sample is worth spending, since the depth changes more during a long conversion than the extra resolution buys
+    def adaptive_osr(self):
+        rate = abs(self._rate)
+        for threshold, osr in ADAPTIVE_OSR:
+            if rate >= threshold:
+                return osr
+        return OSR_8192
+    
+    # Oversampling used for the last sample, e.g. for logging when it was picked adaptively
+    def osr(self):
+        return self._osr
+    
+    # Filtered rate of pressure change in Pa/s, positive while the pressure rises (descending)
+    def pressure_rate(self):
+        return self._rate
+    
+    # uasyncio coroutine for a full read. The controller is handed back to the scheduler while each conversion runs,
+    # so other tasks (piston control, telemetry) carry on between the D1 and D2 steps.
+    #   await sensor.read_async(ms5837.OSR_8192)
+    async def read_async(self, oversampling=OSR_8192):
+        try:
+            import uasyncio as asyncio
+        except ImportError:
+            import asyncio
+        
+        if not self.start(oversampling):
+            return False
+        
+        while not self.ready():
+            await asyncio.sleep(self.remaining_us() / 1000000)
+        
+        return self.collect()
+    
+    def setFluidDensity(self, denisty):
+        self._fluidDensity = denisty
+        
+    # Pressure in requested units
+    # mbar * conversion
+    def pressure(self, conversion=UNITS_mbar):
+        return self._pressure * conversion / 100.0
+    
+    # Raw (D1, D2) ADC readings behind the last pressure and temperature, e.g. for logging
+    def raw(self):
+        return self._D1, self._D2
+    
+    # Pressure as an integer number of Pa, with no float conversion
+    def pressure_pa(self):
+        return self._pressure
+        
+    # Temperature in requested units
+    # default degrees C
+    def temperature(self, conversion=UNITS_Centigrade):
+        degC = self._temperature / 100.0
+        if conversion == UNITS_Farenheit:
+            return (9.0/5.0)*degC + 32
+        elif conversion == UNITS_Kelvin:
+            return degC + 273
+        return degC
+    
+    # Temperature as an integer number of hundredths of a degree C, with no float conversion
+    def temperature_centi(self):
+        return self._temperature
+        
+    # Depth relative to MSL pressure in given fluid density
+    def depth(self):
+        return (self.pressure(UNITS_Pa)-101300)/(self._fluidDensity*9.80665)
+    
+    # Altitude relative to MSL pressure
+    def altitude(self):
+        return (1-pow((self.pressure()/1013.25),.190284))*145366.45*.3048        
+    
+    # Cribbed from datasheet
+    # Integer-only version of the datasheet's 64-bit compensation, with every division by 2^n done as a shift.
+    # The ESP32-C3/C6 have no FPU, so this avoids software floats entirely on the sample path.
+    # Results are kept as scaled integers and only converted to floats by pressure() and temperature():
+    #   self._pressure     pressure in Pa (0.01 mbar)
+    #   self._temperature  temperature in 0.01 degC
+    def _calculate(self):
+        C = self._C
+        OFFi = 0
+        SENSi = 0
+        Ti = 0
+
+        dT = self._D2 - (C[5] << 8)
+        if self._model == MODEL_02BA:
+            SENS = (C[1] << 16) + ((C[3]*dT) >> 7)
+            OFF = (C[2] << 17) + ((C[4]*dT) >> 6)
+        else:
+            SENS = (C[1] << 15) + ((C[3]*dT) >> 8)
+            OFF = (C[2] << 16) + ((C[4]*dT) >> 7)
+        
+        TEMP = 2000 + ((dT*C[6]) >> 23)
+
+        # Second order compensation
+        if self._model == MODEL_02BA:
+            if TEMP < 2000: # Low temp
+                Ti = (11*dT*dT) >> 35
+                OFFi = (31*(TEMP-2000)*(TEMP-2000)) >> 3
+                SENSi = (63*(TEMP-2000)*(TEMP-2000)) >> 5
+                
+        else:
+            if TEMP < 2000: # Low temp
+                Ti = (3*dT*dT) >> 33
+                OFFi = (3*(TEMP-2000)*(TEMP-2000)) >> 1
+                SENSi = (5*(TEMP-2000)*(TEMP-2000)) >> 3
+                if TEMP < -1500: # Very low temp
+                    OFFi = OFFi+7*(TEMP+1500)*(TEMP+1500)
+                    SENSi = SENSi+4*(TEMP+1500)*(TEMP+1500)
+            else: # High temp
+                Ti = (2*dT*dT) >> 37
+                OFFi = ((TEMP-2000)*(TEMP-2000)) >> 4
+                SENSi = 0
+        
+        OFF2 = OFF-OFFi
+        SENS2 = SENS-SENSi
+        
+        self._temperature = TEMP-Ti
+        if self._model == MODEL_02BA:
+            # 02BA resolution is 0.01 mbar, already Pa
+            self._pressure = (((self._D1*SENS2) >> 21) - OFF2) >> 15
+        else:
+            # 30BA resolution is 0.1 mbar
+            self._pressure = ((((self._D1*SENS2) >> 21) - OFF2) >> 13) * 10
+        
+    # Cribbed from datasheet
+    # Table-driven: each byte of the PROM is folded in with one lookup instead of 8 shift/xor steps.
+    # The first word's CRC nibble is masked off and the 8th word is taken as 0, without touching n_prom.
+    def _crc4(self, n_prom):
+        table = _crc4_table()
+        n_rem = 0
+        
+        for i in range(16):
+            if i >= 14:
+                byte = 0
+            elif i%2 == 1:
+                byte = n_prom[i>>1] & 0x00FF
+            elif i == 0:
+                byte = (n_prom[0] & 0x0FFF) >> 8
+            else:
+                byte = n_prom[i>>1] >> 8
+            
+            n_rem ^= byte
+            n_rem = ((n_rem & 0x00FF) << 8) ^ table[n_rem >> 8]
+        
+        return (n_rem >> 12) & 0x000F
+
+# Remainder left by shifting each possible high byte 8 times through the datasheet's CRC4 polynomial.
+# The low byte of the remainder just moves up 8 bits, so one lookup replaces the inner loop of the bitwise version.
+def _crc4_table():
+    global _CRC4_TABLE
+    if _CRC4_TABLE is None:
+        table = []
+        for byte in range(256):
+            n_rem = byte << 8
+            for n_bit in range(8):
+                if n_rem & 0x8000:
+                    n_rem = ((n_rem << 1) ^ 0x3000) & 0xFFFF
+                else:
+                    n_rem = (n_rem << 1) & 0xFFFF
+            table.append(n_rem)
+        _CRC4_TABLE = tuple(table)
+    return _CRC4_TABLE
+    
+class MS5837_30BA(MS5837):
+    def __init__(self, bus=1):
+        MS5837.__init__(self, MODEL_30BA, bus)
+        
+class MS5837_02BA(MS5837):
+    def __init__(self, bus=1):
+        MS5837.__init__(self, MODEL_02BA, bus)
@@ -0,0 +1,97 @@
+""" Provides an SMBus class for use on micropython """
+
+try:
+    from machine import I2C
+except ImportError:
+    raise ImportError("Can't find the micropython machine.I2C class: "
+                      "perhaps you don't need this adapter?")
+
+
+class SMBus(I2C):
+    """ Provides an 'SMBus' module which supports some of the py-smbus
+        i2c methods, as well as being a subclass of machine.I2C
+
+        Hopefully this will allow you to run code that was targeted at
+        py-smbus unmodified on micropython.
+
+        Use it like you would the machine.I2C class:
+
+            from smbus import SMBus
+
+            bus = SMBus(0, scl=Pin(23), sda=Pin(22))
+            bus.read_byte_data(addr, register)
+            ... etc
+
+        read_i2c_block_data_into() is an extension over py-smbus that fills a
+        caller-supplied bytearray, for read loops that must not allocate.
+    """
+
+    # Scratch buffers shared by the single-byte and word transfers below, so
+    # that they never allocate. Kept as class attributes so the adapter still
+    # needs no __init__ of its own.
+    _buf1 = bytearray(1)
+    _buf2 = bytearray(2)
+
+    def read_byte(self, addr):
+        """ Read a single byte from the device at addr, with no register
+            Returns a single byte """
+        self.readfrom_into(addr, self._buf1)
+        return self._buf1[0]
+
+    def write_byte(self, addr, value):
+        """ Write a single byte (e.g. a command) to the device at addr,
+            with no register
+            Returns None """
+        self._buf1[0] = value
+        self.writeto(addr, self._buf1)
+
+    def read_byte_data(self, addr, register):
+        """ Read a single byte from register of device at addr
+            Returns a single byte """
+        self.readfrom_mem_into(addr, register, self._buf1)
+        return self._buf1[0]
+
+    def write_byte_data(self, addr, register, data):
+        """ Write a single byte from buffer `data` to register of device at addr
+            Returns None """
+        # writeto_mem() expects something it can treat as a buffer
+        if isinstance(data, int):
+            self._buf1[0] = data
+            data = self._buf1
+        return self.writeto_mem(addr, register, data)
+
+    def read_word_data(self, addr, register):
+        """ Read a 16 bit word from register of device at addr
+            Like py-smbus, the first byte on the wire is the low byte
+            Returns an int """
+        buf = self._buf2
+        self.readfrom_mem_into(addr, register, buf)
+        return buf[0] | (buf[1] << 8)
+
+    def write_word_data(self, addr, register, value):
+        """ Write a 16 bit word to register of device at addr, low byte first
+            Returns None """
+        buf = self._buf2
+        buf[0] = value & 0xFF
+        buf[1] = (value >> 8) & 0xFF
+        self.writeto_mem(addr, register, buf)
+
+    def read_i2c_block_data(self, addr, register, length):
+        """ Read a block of length from register of device at addr
+            Returns a bytes object filled with whatever was read """
+        return self.readfrom_mem(addr, register, length)
+
+    def read_i2c_block_data_into(self, addr, register, buf):
+        """ Read len(buf) bytes from register of device at addr into the
+            caller's bytearray (or memoryview), allocating nothing
+            Returns None """
+        self.readfrom_mem_into(addr, register, buf)
+
+    def write_i2c_block_data(self, addr, register, data):
+        """ Write multiple bytes of data to register of device at addr
+            Returns None """
+        # writeto_mem() expects something it can treat as a buffer
+        if isinstance(data, int):
+            self._buf1[0] = data
+            data = self._buf1
+        return self.writeto_mem(addr, register, data)
@@ -0,0 +1,13 @@
+""" nanobuild: package a NanOS version as precompiled .mpy modules
+
+    Compiles every module with mpy-cross, reports per-module bytecode size
+    and the heap the board no longer spends compiling, and checks that the
+    bundle still boots under stub machine/network modules.
+
+    From the NanOS directory:
+
+        python -m nanobuild v0.0.3
+        mpremote cp -r dist/v0.0.3/. :
+"""
+
+from .bundle import build, verify, BundleModule, COMPILED_BOOT
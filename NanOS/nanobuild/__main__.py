@@ -0,0 +1,52 @@
+""" python -m nanobuild <version dir> [-o DIR] [-O N] [--march ARCH] [--no-verify] """
+
+import argparse
+import os
+import sys
+
+from .bundle import build, verify
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nanobuild", description="Package a NanOS version as precompiled .mpy modules")
+    parser.add_argument("version", help="NanOS version directory, e.g. v0.0.3")
+    parser.add_argument("-o", "--output", help="bundle directory (default dist/<version>)")
+    parser.add_argument("-O", "--opt", type=int, default=0,
+                        help="mpy-cross optimisation level; 3 drops line numbers from tracebacks (default 0)")
+    parser.add_argument("--march", help="native code architecture, rv32imc for the ESP32-C3/C6; only needed for "
+                                        "@micropython.native code")
+    parser.add_argument("--mpy-cross", help="mpy-cross executable (default: PATH, then the mpy-cross pip package)")
+    parser.add_argument("--micropython", help="MicroPython unix port to verify the bundle with (default: PATH)")
+    parser.add_argument("--no-verify", action="store_true", help="skip booting the bundle against stub hardware")
+    args = parser.parse_args(argv)
+
+    version = os.path.basename(os.path.normpath(args.version))
+    out_dir = args.output or os.path.join("dist", version)
+    modules = build(args.version, out_dir, mpy_cross=args.mpy_cross, opt=args.opt, march=args.march)
+
+    print("%-20s %-18s %8s %8s %10s" % ("module", "bundle file", "source", "mpy", "compile*"))
+    total_source = total_mpy = total_heap = 0
+    for m in modules:
+        if m.compiled:
+            print("%-20s %-18s %8d %8d %10d" % (m.name, m.output, m.source_bytes, m.mpy_bytes, m.compile_heap))
+            total_source += m.source_bytes
+            total_mpy += m.mpy_bytes
+            total_heap = max(total_heap, m.compile_heap)
+        else:
+            print("%-20s %-18s %8d %8s %10s" % (m.name, m.output, m.source_bytes, "source", "-"))
+    print("%-20s %-18s %8d %8d" % ("total compiled", "", total_source, total_mpy))
+    print("* estimated heap for compiling the module on the board; the largest, %d bytes, is the peak heap "
+          "each boot no longer needs" % total_heap)
+    print("bundle written to %s" % out_dir)
+
+    if args.no_verify:
+        return 0
+    method, ok, output = verify(out_dir, args.version, args.micropython)
+    if output.strip():
+        print(output.rstrip())
+    print("verify (%s): %s" % (method, "ok" if ok else "FAILED"))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
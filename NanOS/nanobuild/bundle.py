@@ -0,0 +1,213 @@
+""" Builds a NanOS deployment bundle
+
+    MicroPython only runs boot.py from source, so boot.py itself is
+    compiled as the module COMPILED_BOOT and replaced in the bundle by a
+    two-line boot.py that imports it and copies its names into the REPL
+    namespace. Functions (deploy(), piston_move(), ...) work from the REPL
+    as before. Module-level state that the firmware reassigns, such as
+    position, has to be read through the module (nanos.position), since the
+    REPL only holds a copy.
+
+    Config files the user edits on the board (SOURCE_ONLY) are copied as
+    source. Everything else goes through mpy-cross. The modules shared
+    between versions (NanOS/lib) are compiled into the bundle's lib
+    directory, which becomes /lib on the board.
+
+    Sizes reported per module:
+        source     bytes of .py the board no longer stores or reads
+        mpy        bytes of bytecode in the bundle
+        compile    rough heap the board no longer needs to compile the
+                   module: the parser holds every token of a module in a
+                   parse node before emitting any bytecode, about
+                   PARSE_NODE_BYTES each on a 32-bit port
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tokenize
+
+COMPILED_BOOT = "nanos"
+SOURCE_ONLY = ("wlan_cfg.py", "webrepl_cfg.py", "main.py")
+PARSE_NODE_BYTES = 12
+
+BOOT_STUB = """# NanOS bundle: the firmware is precompiled in %(module)s.mpy, built from boot.py by nanobuild.
+# Its functions are brought into the REPL here. Read state the firmware updates, e.g. %(module)s.position, through the module.
+import %(module)s
+from %(module)s import *
+"""
+
+NOISE_TOKENS = (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT,
+                tokenize.ENCODING, tokenize.ENDMARKER)
+
+
+class BundleModule:
+    """ One file in the bundle and its sizes in bytes """
+
+    def __init__(self, name, output, source_bytes, mpy_bytes=None, tokens=0):
+        self.name = name
+        self.output = output
+        self.source_bytes = source_bytes
+        self.mpy_bytes = mpy_bytes
+        self.tokens = tokens
+
+    @property
+    def compiled(self):
+        return self.mpy_bytes is not None
+
+    @property
+    def compile_heap(self):
+        """ Estimated peak heap for compiling the module on the board """
+        return self.tokens * PARSE_NODE_BYTES if self.compiled else 0
+
+
+def find_mpy_cross(path=None):
+    """ The mpy-cross executable: path if given, else the one on PATH,
+        else the binary shipped in the mpy-cross pip package """
+    if path:
+        return path
+    found = shutil.which("mpy-cross")
+    if found:
+        return found
+    try:
+        import mpy_cross
+        return mpy_cross.mpy_cross
+    except (ImportError, SystemExit):
+        raise RuntimeError("mpy-cross not found: pip install mpy-cross, or pass --mpy-cross PATH")
+
+
+def count_tokens(source):
+    tokens = tokenize.generate_tokens(io.StringIO(source).readline)
+    return sum(1 for token in tokens if token.type not in NOISE_TOKENS)
+
+
+def lib_for(version_dir):
+    """ NanOS/lib, next to version_dir, or None if there isn't one """
+    path = os.path.join(os.path.dirname(os.path.abspath(version_dir)), "lib")
+    return path if os.path.isdir(path) else None
+
+
+def build(version_dir, out_dir, mpy_cross=None, opt=0, march=None, lib_dir=None):
+    """ Compiles version_dir, and lib_dir (default NanOS/lib) into out_dir's
+        lib, into out_dir (emptied first). Returns a list of BundleModule,
+        boot.py's compiled module first """
+    compiler = find_mpy_cross(mpy_cross)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    names = sorted(name for name in os.listdir(version_dir) if name.endswith(".py"))
+    if "boot.py" in names:
+        names.remove("boot.py")
+        names.insert(0, "boot.py")
+    sources = [(version_dir, "", name) for name in names]
+    lib_dir = lib_dir or lib_for(version_dir)
+    if lib_dir is not None:
+        os.makedirs(os.path.join(out_dir, "lib"))
+        sources += [(lib_dir, "lib/", name) for name in sorted(os.listdir(lib_dir)) if name.endswith(".py")]
+
+    modules = []
+    for src_dir, prefix, name in sources:
+        src = os.path.join(src_dir, name)
+        with open(src) as f:
+            source = f.read()
+        source_bytes = os.path.getsize(src)
+
+        if name in SOURCE_ONLY:
+            shutil.copy(src, os.path.join(out_dir, prefix + name))
+            modules.append(BundleModule(prefix + name, prefix + name, source_bytes))
+            continue
+
+        module = COMPILED_BOOT if name == "boot.py" and not prefix else name[:-3]
+        output = prefix + module + ".mpy"
+        command = [compiler, "-o", os.path.join(out_dir, output), "-s", name]
+        if opt:
+            command.append("-O%d" % opt)
+        if march:
+            command.append("-march=%s" % march)
+        command.append(src)
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError("mpy-cross failed on %s:\n%s" % (name, result.stderr or result.stdout))
+        modules.append(BundleModule(prefix + name, output, source_bytes,
+                                    os.path.getsize(os.path.join(out_dir, output)), count_tokens(source)))
+
+    if any(m.name == "boot.py" for m in modules):
+        with open(os.path.join(out_dir, "boot.py"), "w") as f:
+            f.write(BOOT_STUB % {"module": COMPILED_BOOT})
+    return modules
+
+
+VERIFY_SCRIPT = """
+import sys, os
+sys.path.insert(0, %(bench)r)
+import nanobench
+nanobench.install_stubs()
+sys.path.insert(0, %(bundle)r + "/lib")
+sys.path.insert(0, %(bundle)r)
+os.chdir(%(scratch)r)
+import boot
+import %(module)s
+for name in ("deploy", "piston_move", "mission_run", "depth_hold", "log_download"):
+    getattr(boot, name)
+print("bundle ok")
+"""
+
+
+def verify(out_dir, version_dir, micropython=None):
+    """ Boots the bundle against stub hardware. With a MicroPython unix
+        port (micropython on PATH, or passed in) the .mpy files themselves
+        are imported, using nanobench's stub machine/network modules.
+        Without one, the bundle's layout (the boot.py stub and the
+        renamed boot module) is booted from source under nanosim on this
+        interpreter, which checks everything but the bytecode itself.
+        Returns (method, ok, output). """
+    nanos_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    scratch = os.path.join(os.path.abspath(out_dir), "..", ".verify")
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+    try:
+        micropython = micropython or shutil.which("micropython")
+        if micropython:
+            script = VERIFY_SCRIPT % {"bench": os.path.join(nanos_dir, "bench"), "bundle": os.path.abspath(out_dir),
+                                      "scratch": scratch, "module": COMPILED_BOOT}
+            result = subprocess.run([micropython, "-c", script], capture_output=True, text=True, timeout=60)
+            output = result.stdout + result.stderr
+            return "micropython", result.returncode == 0 and "bundle ok" in output, output
+        return _verify_from_source(out_dir, version_dir, nanos_dir, scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _verify_from_source(out_dir, version_dir, nanos_dir, scratch):
+    # The bundle with each .mpy swapped back for its source, lib included
+    copies = [(out_dir, version_dir, scratch)]
+    if os.path.isdir(os.path.join(out_dir, "lib")):
+        os.makedirs(os.path.join(scratch, "lib"))
+        copies.append((os.path.join(out_dir, "lib"), lib_for(version_dir), os.path.join(scratch, "lib")))
+    for bundle_dir, src_dir, dst_dir in copies:
+        for name in os.listdir(bundle_dir):
+            if name.endswith(".mpy"):
+                module = name[:-4]
+                src = "boot.py" if module == COMPILED_BOOT else module + ".py"
+                shutil.copy(os.path.join(src_dir, src), os.path.join(dst_dir, module + ".py"))
+            elif os.path.isfile(os.path.join(bundle_dir, name)):
+                shutil.copy(os.path.join(bundle_dir, name), dst_dir)
+
+    if nanos_dir not in sys.path:
+        sys.path.insert(0, nanos_dir)
+    from nanosim import Simulator
+
+    output = io.StringIO()
+    with Simulator(scratch, echo=False) as sim:
+        try:
+            boot = sim.boot()
+            for name in ("deploy", "piston_move", "mission_run", "depth_hold", "log_download"):
+                getattr(boot, name)
+            ok = True
+        except Exception as e:
+            output.write("%s: %s\n" % (type(e).__name__, e))
+            ok = False
+    return "nanosim (source layout, bytecode not executed)", ok, output.getvalue()
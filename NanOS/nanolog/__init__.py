@@ -0,0 +1,14 @@
+""" nanolog: host-side tools for NanOS dive logs
+
+    Pulls log files off a surfaced float from its log server (see
+    v0.0.3/log_server.py), resuming across dropped links, and decodes the
+    raw samples in them with NumPy (nanolog.decode, which needs numpy and
+    so isn't imported here).
+
+    From the NanOS directory:
+
+        python -m nanolog pull 192.168.4.1 dive.log
+        python -m nanolog decode dive.log -o dive.csv
+"""
+
+from .client import PullResult, pull, pull_once, LOG_PORT, CHUNK_SIZE
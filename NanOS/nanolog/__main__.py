@@ -0,0 +1,56 @@
+""" python -m nanolog pull <float address> [file] [-o PATH]
+    python -m nanolog decode <log file> [-o CSV] [--salt] """
+
+import argparse
+import sys
+import time
+
+from .client import pull, LOG_PORT
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nanolog", description="Host-side tools for NanOS dive logs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("pull", help="download a log from a surfaced float, resuming after dropped links")
+    p.add_argument("host", help="the float's address, 192.168.4.1 in access-point mode")
+    p.add_argument("name", nargs="?", default="dive.log", help="file on the float (default dive.log)")
+    p.add_argument("-o", "--output", help="local path (default: the same name in the current directory)")
+    p.add_argument("--port", type=int, default=LOG_PORT)
+    p.add_argument("--attempts", type=int, default=50, help="connections to try before giving up")
+    d = commands.add_parser("decode", help="compensate a downloaded log and write it out as CSV")
+    d.add_argument("log", help="dive.log pulled from the float")
+    d.add_argument("-o", "--output", help="CSV path (default: the log's name with .csv)")
+    d.add_argument("--salt", action="store_true", help="use salt water density for depth")
+    args = parser.parse_args(argv)
+
+    if args.command == "decode":
+        decode_command(args)
+        return
+
+    started = time.perf_counter()
+    result = pull(args.host, args.name, args.output, port=args.port, attempts=args.attempts,
+                  log=lambda text: print(text, file=sys.stderr))
+    wall = time.perf_counter() - started
+    print("%s: %d bytes (%d new from offset %d) in %d bytes over %d connection(s), %.1fx, %.1f s"
+          % (result.path, result.size, result.bytes_raw, result.start_offset, result.bytes_received,
+             result.connections, result.ratio, wall))
+
+
+def decode_command(args):
+    from . import decode
+
+    density = decode.DENSITY_SALTWATER if args.salt else decode.DENSITY_FRESHWATER
+    sections = decode.read_log(args.log)
+    result = decode.decode(sections, density=density)
+    output = args.output or args.log.rsplit(".", 1)[0] + ".csv"
+    columns = ("tick", "count", "duty", "osr", "flags", "pressure", "temperature", "depth")
+    with open(output, "w") as f:
+        f.write(",".join(columns) + "\n")
+        rows = zip(*(result[name].tolist() for name in columns))
+        f.writelines(",".join(str(value) for value in row) + "\n" for row in rows)
+    print("%s: %d samples in %d section(s) -> %s" % (args.log, len(result["tick"]), len(sections), output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+""" Client for the float's log server
+
+    The server's protocol is described at the top of v0.0.3/log_server.py.
+    Only chunks whose CRC32 checks out are written to the local copy, each
+    at its own offset, so the local file is always a verified prefix of the
+    float's log. That prefix is what a new connection resumes from, whether
+    the link dropped mid-transfer or the float has logged more dives since
+    the last download.
+
+    If the log on the float is cleared and then grows past the local copy,
+    the two can no longer be told apart by size: delete the local copy
+    after clearing the log.
+"""
+
+import os
+import socket
+import struct
+import time
+import zlib
+
+LOG_PORT = 8270
+CHUNK_SIZE = 4096
+
+HEADER_MAGIC = b"NFLT"
+HEADER_FORMAT = "<4sII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+CHUNK_FORMAT = "<IHHI"
+CHUNK_HEADER_SIZE = struct.calcsize(CHUNK_FORMAT)
+NO_FILE = 0xFFFFFFFF
+
+
+class TransferError(Exception):
+    """ The server sent something that doesn't check out; the chunks
+        verified before it are kept """
+
+
+class PullResult:
+    """ What a pull() did: the file size on the float, bytes that came over
+        the network, how many connections it took """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.start_offset = None
+        self.bytes_received = 0
+        self.bytes_raw = 0
+        self.connections = 0
+        self.complete = False
+
+    @property
+    def ratio(self):
+        """ Raw bytes per byte received, the compression the link saw """
+        return self.bytes_raw / self.bytes_received if self.bytes_received else 0.0
+
+    def __repr__(self):
+        return ("PullResult(%r, size=%d, received=%d, connections=%d, complete=%s)"
+                % (self.path, self.size, self.bytes_received, self.connections, self.complete))
+
+
+def _recv_exact(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        part = sock.recv(n - len(data))
+        if not part:
+            raise ConnectionError("connection closed by the float")
+        data += part
+    return bytes(data)
+
+
+def _local_offset(path):
+    """ Offset to resume from: the verified local prefix, rounded down to a
+        chunk so a short last chunk is fetched again in full """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    return size - size % CHUNK_SIZE
+
+
+def pull_once(host, name, path, result, port=LOG_PORT, timeout=10.0):
+    """ One connection's worth of pull(). Returns when the transfer is
+        complete and raises OSError if the link drops. """
+    offset = _local_offset(path)
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        result.connections += 1
+        sock.sendall(("GET %s %d\n" % (name, offset)).encode())
+        magic, size, start = struct.unpack(HEADER_FORMAT, _recv_exact(sock, HEADER_SIZE))
+        if magic != HEADER_MAGIC:
+            raise TransferError("not a NanOS log server")
+        if size == NO_FILE:
+            raise FileNotFoundError("%s is not available on the float" % name)
+        result.size = size
+        if result.start_offset is None:
+            result.start_offset = start
+
+        mode = "r+b" if os.path.exists(path) else "wb"
+        with open(path, mode) as f:
+            # The server restarts from 0 if the log got shorter than our copy
+            f.truncate(start)
+            while True:
+                chunk_offset, raw_len, sent_len, crc = struct.unpack(
+                    CHUNK_FORMAT, _recv_exact(sock, CHUNK_HEADER_SIZE))
+                result.bytes_received += CHUNK_HEADER_SIZE
+                if raw_len == 0:
+                    break
+                body = _recv_exact(sock, sent_len)
+                result.bytes_received += sent_len
+                data = body if sent_len == raw_len else zlib.decompress(body, -15)
+                if len(data) != raw_len or zlib.crc32(data) != crc:
+                    raise TransferError("chunk at %d failed its CRC" % chunk_offset)
+                f.seek(chunk_offset)
+                f.write(data)
+                f.flush()
+                result.bytes_raw += raw_len
+            f.truncate(size)
+    result.complete = True
+    return result
+
+
+def pull(host, name="dive.log", path=None, port=LOG_PORT, timeout=10.0, attempts=50, retry_delay=1.0, log=None):
+    """ Downloads `name` from the float at `host` into `path` (default: the
+        same name in the current directory), reconnecting after every
+        dropped link or bad chunk until the whole file is down or
+        `attempts` connections have failed. Returns a PullResult. """
+    path = path or os.path.basename(name)
+    result = PullResult(path)
+    failures = 0
+    while True:
+        try:
+            return pull_once(host, name, path, result, port=port, timeout=timeout)
+        except (OSError, TransferError) as e:
+            if isinstance(e, FileNotFoundError):
+                raise
+            failures += 1
+            if failures >= attempts:
+                raise
+            if log is not None:
+                log("link lost at %d of %d bytes (%s), resuming" % (_local_offset(path), result.size, e))
+            time.sleep(retry_delay)
@@ -0,0 +1,174 @@
+""" Vectorized decoding of raw MS5837 dive logs
+
+    The float logs raw D1/D2 readings (see v0.0.3/dive_log.py) and leaves
+    compensation to the ground. compensate() is MS5837._calculate rewritten
+    as NumPy array operations. It runs the same integer arithmetic on int64
+    arrays, where >> is an arithmetic shift just like Python's, so the
+    output matches the driver sample for sample. Intermediate values stay
+    below 2^57, well inside int64.
+
+        log = read_log("dive.log")
+        result = decode(log)                        # calibration from the log
+        result = decode(log, prom=corrected_prom)   # or reprocess with other coefficients
+        result["depth"], result["temperature"], result["tick"], ...
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+MODEL_02BA = 0
+MODEL_30BA = 1
+
+DENSITY_FRESHWATER = 997
+DENSITY_SALTWATER = 1029
+GRAVITY = 9.80665
+SURFACE_PA = 101300
+
+BLOCK_SIZE = 4096
+BLOCK_MAGIC = b"NFLB"
+HEADER_FORMAT = "<4sIHBBI"
+HEADER_SIZE = 16
+KIND_SAMPLES = 0
+KIND_CALIBRATION = 1
+CALIBRATION_FORMAT = "<B7H"
+
+# One dive_log sample record, SAMPLE_FORMAT "<IIIihBB"
+SAMPLE_DTYPE = np.dtype([
+    ("tick", "<u4"),
+    ("d1", "<u4"),
+    ("d2", "<u4"),
+    ("count", "<i4"),
+    ("duty", "<i2"),
+    ("osr", "u1"),
+    ("flags", "u1"),
+])
+
+
+def compensate(d1, d2, prom, model=MODEL_30BA):
+    """ First- and second-order compensation of whole arrays of raw
+        readings. prom is the sensor's 7 PROM words (C[0]..C[6]). Returns
+        (pressure in Pa, temperature in 0.01 degC) as int64 arrays, equal to
+        MS5837.pressure_pa() and temperature_centi() for every sample. """
+    C = [int(c) for c in prom]
+    D1 = np.asarray(d1, dtype=np.int64)
+    D2 = np.asarray(d2, dtype=np.int64)
+
+    dT = D2 - (C[5] << 8)
+    if model == MODEL_02BA:
+        SENS = (C[1] << 16) + ((C[3] * dT) >> 7)
+        OFF = (C[2] << 17) + ((C[4] * dT) >> 6)
+    else:
+        SENS = (C[1] << 15) + ((C[3] * dT) >> 8)
+        OFF = (C[2] << 16) + ((C[4] * dT) >> 7)
+
+    TEMP = 2000 + ((dT * C[6]) >> 23)
+
+    # Second order compensation, with the driver's branches as masks
+    low = TEMP < 2000
+    t2 = (TEMP - 2000) * (TEMP - 2000)
+    zero = np.zeros_like(TEMP)
+    if model == MODEL_02BA:
+        Ti = np.where(low, (11 * dT * dT) >> 35, zero)
+        OFFi = np.where(low, (31 * t2) >> 3, zero)
+        SENSi = np.where(low, (63 * t2) >> 5, zero)
+    else:
+        very_low = TEMP < -1500
+        t15 = (TEMP + 1500) * (TEMP + 1500)
+        Ti = np.where(low, (3 * dT * dT) >> 33, (2 * dT * dT) >> 37)
+        OFFi = np.where(low, ((3 * t2) >> 1) + np.where(very_low, 7 * t15, zero), t2 >> 4)
+        SENSi = np.where(low, ((5 * t2) >> 3) + np.where(very_low, 4 * t15, zero), zero)
+
+    OFF2 = OFF - OFFi
+    SENS2 = SENS - SENSi
+
+    temperature = TEMP - Ti
+    if model == MODEL_02BA:
+        pressure = (((D1 * SENS2) >> 21) - OFF2) >> 15
+    else:
+        pressure = ((((D1 * SENS2) >> 21) - OFF2) >> 13) * 10
+    return pressure, temperature
+
+
+def depth(pressure_pa, density=DENSITY_FRESHWATER):
+    """ Depth in m from pressure in Pa, computed the way MS5837.depth() does """
+    pa = np.asarray(pressure_pa, dtype=float)
+    return (pa - SURFACE_PA) / (density * GRAVITY)
+
+
+def temperature_c(temperature_centi):
+    return np.asarray(temperature_centi) / 100.0
+
+
+class LogSection:
+    """ Samples logged under one calibration block: the sensor model, its
+        PROM words and a structured array of SAMPLE_DTYPE records """
+
+    def __init__(self, model, prom, samples):
+        self.model = model
+        self.prom = prom
+        self.samples = samples
+
+    def __repr__(self):
+        return "LogSection(model=%d, samples=%d)" % (self.model, len(self.samples))
+
+
+def read_log(path):
+    """ Splits a dive.log into LogSections. Blocks that fail their CRC are
+        skipped, as are samples logged before any calibration block. """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    sections = []
+    model = prom = None
+    pieces = []
+
+    def close():
+        if model is not None and pieces:
+            sections.append(LogSection(model, prom, np.concatenate(pieces)))
+
+    for start in range(0, len(data) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        magic, seq, count, kind, size, crc = struct.unpack_from(HEADER_FORMAT, data, start)
+        body = data[start + HEADER_SIZE:start + HEADER_SIZE + count * size]
+        if magic != BLOCK_MAGIC or zlib.crc32(body) != crc:
+            continue
+        if kind == KIND_CALIBRATION:
+            close()
+            values = struct.unpack(CALIBRATION_FORMAT, body[:struct.calcsize(CALIBRATION_FORMAT)])
+            model, prom, pieces = values[0], list(values[1:]), []
+        elif kind == KIND_SAMPLES and size == SAMPLE_DTYPE.itemsize:
+            pieces.append(np.frombuffer(body, dtype=SAMPLE_DTYPE, count=count))
+    close()
+    return sections
+
+
+def decode(sections, prom=None, model=None, density=DENSITY_FRESHWATER):
+    """ Compensates every section of a log in one pass per section and
+        returns a dict of concatenated arrays: tick, count, duty (full
+        signed duty_u16), osr, flags, pressure_pa, temperature_centi,
+        pressure (mbar), temperature (degC) and depth (m). prom and model
+        override what the log recorded, to reprocess with corrected
+        calibration. """
+    if isinstance(sections, LogSection):
+        sections = [sections]
+    columns = {name: [] for name in ("tick", "count", "duty", "osr", "flags", "pressure_pa", "temperature_centi")}
+    for section in sections:
+        s = section.samples
+        p, t = compensate(s["d1"], s["d2"], prom if prom is not None else section.prom,
+                          model if model is not None else section.model)
+        columns["tick"].append(s["tick"])
+        columns["count"].append(s["count"])
+        columns["duty"].append(s["duty"].astype(np.int32) << 1)
+        columns["osr"].append(s["osr"])
+        columns["flags"].append(s["flags"])
+        columns["pressure_pa"].append(p)
+        columns["temperature_centi"].append(t)
+
+    result = {}
+    for name, parts in columns.items():
+        result[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    result["pressure"] = result["pressure_pa"] / 100.0
+    result["temperature"] = temperature_c(result["temperature_centi"])
+    result["depth"] = depth(result["pressure_pa"], density)
+    return result
@@ -0,0 +1,16 @@
+""" nanosim: run NanOS on a Linux host, faster than real time
+
+    Fake machine, network, webrepl and micropython modules, a virtual clock
+    that sleeps instantly, and models of the piston/encoder, the float's
+    depth and the MS5837 pressure sensor. See runner.Simulator.
+
+    From the NanOS directory:
+
+        python -m nanosim v0.0.3 --deploy
+"""
+
+from .clock import VirtualClock
+from .board import Board, WIRING_V003, PWRON_RESET, DEEPSLEEP_RESET
+from .devices import PistonModel, DepthModel, MS5837Model
+from .fakes import DeepSleep
+from .runner import Simulator
@@ -0,0 +1,37 @@
+""" python -m nanosim <version dir> [--deploy] [--input LINE ...] """
+
+import argparse
+import time
+
+from .runner import Simulator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nanosim", description="Boot a NanOS version on a simulated float")
+    parser.add_argument("version", help="NanOS version directory, e.g. v0.0.3")
+    parser.add_argument("--deploy", action="store_true", help="run deploy() after boot, confirming it")
+    parser.add_argument("--input", action="append", default=[], metavar="LINE",
+                        help="line to feed to input(), may be repeated")
+    parser.add_argument("--quiet", action="store_true", help="hide the firmware's own output")
+    args = parser.parse_args(argv)
+
+    inputs = list(args.input)
+    entry = None
+    if args.deploy:
+        inputs.insert(0, "confirm")
+        entry = lambda boot: boot.deploy()
+
+    started = time.perf_counter()
+    with Simulator(args.version, inputs=inputs, echo=not args.quiet) as sim:
+        wakes = sim.run(entry)
+        board = sim.board
+        simulated = sim.clock.now_us / 1000000
+    wall = time.perf_counter() - started
+
+    print("simulated %.1f s in %.2f s wall time (%.0fx)" % (simulated, wall, simulated / max(wall, 1e-9)))
+    print("boots: %d  deepsleep wakes: %d  encoder edges: %d" % (sim.boots, wakes, board.edges))
+    print("piston count: %d  depth: %.2f m" % (board.piston.count, board.depth.depth))
+
+
+if __name__ == "__main__":
+    main()
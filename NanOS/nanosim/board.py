@@ -0,0 +1,162 @@
+""" Simulated NanoBoard: pin levels, PWM duties and the hardware models
+    wired to them
+
+    The fake machine/network modules read and write pins through the Board,
+    and the VirtualClock calls advance_to() so the piston moves, the encoder
+    ticks and the float sinks while the firmware sleeps.
+"""
+
+from .devices import PistonModel, DepthModel, MS5837Model
+
+# GPIO numbers used by NanOS v0.0.3 on the NB10x boards
+WIRING_V003 = {
+    "encoder_a": 1,
+    "encoder_b": 2,
+    "limit_switch": 16,
+    "limit_enable": 17,
+    "motor_in1": 20,
+    "motor_in2": 18,
+    "motor_sense": 0,
+}
+
+# machine.reset_cause() values on the ESP32 port
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+
+class Board:
+
+    def __init__(self, clock, wiring=WIRING_V003, piston=None, depth=None, sensor=None):
+        self.clock = clock
+        self.wiring = dict(wiring)
+        self.piston = piston if piston is not None else PistonModel()
+        self.depth = depth if depth is not None else DepthModel()
+        self.sensor = sensor if sensor is not None else MS5837Model(clock, self.depth)
+
+        self.levels = {}  # pin id -> level, for outputs and model-driven inputs
+        self.pin_objects = {}  # pin id -> most recent fake Pin, for its irq
+        self.pwm_duty = {}  # pin id -> duty_u16, while a PWM owns the pin
+        self.adc_sources = {}  # pin id -> function returning a 0-65535 reading
+        self.i2c_devices = {MS5837Model.ADDRESS: self.sensor}
+
+        self.reset_cause = PWRON_RESET
+        self.rtc_memory = b""
+        self.networks = {}  # ssid -> {"key": ..., "channel": ..., "bssid": ...}
+        self.events = []  # (time_us, text) for anything worth looking at after a run
+
+        self.edges = 0
+        self._time_us = clock.now_us
+        clock.attach(self)
+        self._update_encoder_pins(fire=False)
+        self.adc_sources[self.wiring["motor_sense"]] = self.motor_sense
+
+    def log(self, text):
+        self.events.append((self.clock.now_us, text))
+
+    def power_down(self):
+        """ Chip reset: timers, PWM, outputs and irq handlers are gone, the
+            models and RTC memory carry on """
+        self.clock.clear_timers()
+        self.pwm_duty.clear()
+        self.pin_objects.clear()
+        for pin_id in list(self.levels):
+            if pin_id not in (self.wiring["encoder_a"], self.wiring["encoder_b"], self.wiring["limit_switch"]):
+                del self.levels[pin_id]
+        self._update_limit_switch()
+
+    # Pins
+
+    def register_pin(self, pin):
+        self.pin_objects[pin.id] = pin
+        self._update_limit_switch()
+
+    def level(self, pin_id):
+        return self.levels.get(pin_id, 0)
+
+    def write_pin(self, pin_id, level):
+        self.levels[pin_id] = level
+        if pin_id == self.wiring["limit_enable"]:
+            self._update_limit_switch()
+
+    def drive_input(self, pin_id, level, fire=True):
+        """ Sets an input from the outside world, firing its irq handler if
+            the edge matches the trigger it was armed with """
+        old = self.levels.get(pin_id, 0)
+        self.levels[pin_id] = level
+        if not fire or old == level:
+            return
+        pin = self.pin_objects.get(pin_id)
+        if pin is None or pin.irq_handler is None:
+            return
+        if (level and pin.irq_trigger & 1) or (not level and pin.irq_trigger & 2):
+            pin.irq_handler(pin)
+
+    def duty(self, pin_id):
+        if pin_id in self.pwm_duty:
+            return self.pwm_duty[pin_id]
+        return 65535 if self.level(pin_id) else 0
+
+    def motor_duty(self):
+        """ Signed duty across the motor, positive extending the piston """
+        return self.duty(self.wiring["motor_in1"]) - self.duty(self.wiring["motor_in2"])
+
+    def motor_sense(self):
+        """ ADC reading for the motor current: proportional to duty while
+            turning, and pinned high when the motor stalls """
+        duty = abs(self.motor_duty())
+        if duty == 0:
+            return 0
+        if self.piston.stalled(self.motor_duty()):
+            return 60000
+        return 8000 + duty // 8
+
+    # Hardware models
+
+    def _update_encoder_pins(self, fire=True):
+        a, b = self.piston.quadrature()
+        self.drive_input(self.wiring["encoder_a"], a, fire)
+        self.drive_input(self.wiring["encoder_b"], b, fire)
+
+    def _update_limit_switch(self):
+        # Normally-closed switch from the enable pin to the input, opened by
+        # the piston at full extension
+        closed = self.piston.count < self.piston.stroke_counts
+        self.drive_input(self.wiring["limit_switch"],
+                         1 if closed and self.level(self.wiring["limit_enable"]) else 0)
+
+    def advance_to(self, t_us):
+        """ Steps the piston and depth models to t_us, one encoder edge at a
+            time so every edge reaches the firmware's encoder ISR """
+        piston = self.piston
+        while self._time_us < t_us:
+            velocity = piston.velocity(self.motor_duty())
+            span = t_us - self._time_us
+            if velocity != 0.0:
+                if velocity > 0:
+                    to_edge = (piston.count + 1 - piston.position) / velocity
+                else:
+                    to_edge = (piston.count - 1 - piston.position) / velocity
+                edge_us = max(1, int(to_edge * 1000000 + 0.5))
+                if edge_us <= span:
+                    self.depth.step(piston.fraction(), edge_us / 1000000)
+                    self._time_us += edge_us
+                    # Edge ISRs that read ticks_us see the time of their own edge
+                    self.clock.now_us = self._time_us
+                    piston.count += 1 if velocity > 0 else -1
+                    piston.position = float(piston.count)
+                    self.edges += 1
+                    self._update_encoder_pins()
+                    self._update_limit_switch()
+                    continue
+                # Rounding edge times to whole microseconds must not carry the
+                # piston past an edge it hasn't reported
+                piston.position += velocity * span / 1000000
+                if velocity > 0:
+                    piston.position = min(piston.position, piston.count + 0.999)
+                else:
+                    piston.position = max(piston.position, piston.count - 0.999)
+            self.depth.step(piston.fraction(), span / 1000000)
+            self._time_us = t_us
@@ -0,0 +1,112 @@
+""" Virtual clock for the NanOS host simulator
+
+    Everything on the simulated float runs on VirtualClock time. sleep()
+    calls advance the clock instantly instead of waiting, firing machine.Timer
+    callbacks and stepping the board's hardware models (piston, encoder,
+    depth) on the way, so a mission that takes an hour in the pool runs in
+    a fraction of a second.
+"""
+
+import time as _real_time
+import types
+
+# MicroPython ticks wrap at 2^30
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD >> 1
+
+
+class VirtualClock:
+    """ Microsecond clock that only moves when the simulated code sleeps """
+
+    def __init__(self, start_us=0):
+        self.now_us = start_us
+        self.ticks_origin_us = start_us  # ticks count from here; the Simulator moves it to each boot, as a reset does
+        self._timers = []
+        self._board = None
+
+    def attach(self, board):
+        """ Board whose hardware models are stepped as time passes """
+        self._board = board
+
+    def add_timer(self, timer):
+        if timer not in self._timers:
+            self._timers.append(timer)
+
+    def remove_timer(self, timer):
+        if timer in self._timers:
+            self._timers.remove(timer)
+
+    def clear_timers(self):
+        self._timers = []
+
+    def advance(self, us):
+        """ Moves time forward by us microseconds, firing every timer
+            callback and hardware event that falls due on the way """
+        end = self.now_us + max(0, int(us))
+        while True:
+            t_next = end
+            for timer in self._timers:
+                if timer.due_us < t_next:
+                    t_next = timer.due_us
+            if self._board is not None:
+                self._board.advance_to(t_next)
+            self.now_us = t_next
+            for timer in list(self._timers):
+                if timer.due_us <= self.now_us:
+                    timer.fire()
+            if self.now_us >= end:
+                break
+
+    def advance_to(self, t_us):
+        self.advance(t_us - self.now_us)
+
+    # time module functions, MicroPython flavour
+
+    def sleep(self, seconds):
+        self.advance(seconds * 1000000)
+
+    def sleep_ms(self, ms):
+        self.advance(ms * 1000)
+
+    def sleep_us(self, us):
+        self.advance(us)
+
+    def ticks_ms(self):
+        return ((self.now_us - self.ticks_origin_us) // 1000) & TICKS_MAX
+
+    def ticks_us(self):
+        return (self.now_us - self.ticks_origin_us) & TICKS_MAX
+
+    def ticks_cpu(self):
+        return (self.now_us - self.ticks_origin_us) & TICKS_MAX
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & TICKS_MAX
+
+    @staticmethod
+    def ticks_diff(ticks1, ticks2):
+        diff = (ticks1 - ticks2) & TICKS_MAX
+        if diff >= TICKS_HALFPERIOD:
+            diff -= TICKS_PERIOD
+        return diff
+
+    def time(self):
+        return self.now_us / 1000000
+
+    def time_ns(self):
+        return self.now_us * 1000
+
+    def make_time_module(self):
+        """ Builds a stand-in for the time module: sleeps and ticks run on
+            this clock, anything else falls through to the real module """
+        module = types.ModuleType("time")
+        for name in ("sleep", "sleep_ms", "sleep_us", "ticks_ms", "ticks_us",
+                     "ticks_cpu", "ticks_add", "ticks_diff", "time", "time_ns"):
+            setattr(module, name, getattr(self, name))
+        module.monotonic = module.time
+        module.perf_counter = module.time
+        module.__getattr__ = lambda name: getattr(_real_time, name)
+        return module
+
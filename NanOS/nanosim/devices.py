@@ -0,0 +1,185 @@
+""" Hardware models for the NanOS host simulator
+
+    PistonModel   DC motor + lead screw + quadrature encoder, driven by the
+                  DRV8833 inputs
+    DepthModel    how fast the float sinks or rises for a given piston
+                  position, and the water pressure/temperature it sees
+    MS5837Model   the pressure sensor on the I2C bus, answering reset, PROM
+                  and ADC commands like the real part
+"""
+
+# Quadrature (A, B) levels for count % 4, in the order the NanOS decoder
+# counts up
+QUADRATURE = ((0, 0), (1, 0), (1, 1), (0, 1))
+
+
+class PistonModel:
+    """ Piston position in encoder counts, 0 fully retracted to
+        stroke_counts fully extended """
+
+    def __init__(self, stroke_counts=12000, max_speed=2000, start_duty=15000, position=0):
+        self.stroke_counts = stroke_counts
+        self.max_speed = max_speed  # counts/s at full duty
+        self.start_duty = start_duty  # below this duty the motor stalls
+        self.position = float(position)
+        self.count = int(position)
+
+    def velocity(self, duty):
+        """ Counts/s for a signed duty_u16, 0 when stalled or at an end stop """
+        if abs(duty) < self.start_duty:
+            return 0.0
+        if duty > 0 and self.count >= self.stroke_counts:
+            return 0.0
+        if duty < 0 and self.count <= 0:
+            return 0.0
+        return self.max_speed * duty / 65535
+
+    def stalled(self, duty):
+        return duty != 0 and self.velocity(duty) == 0.0
+
+    def fraction(self):
+        return self.position / self.stroke_counts
+
+    def quadrature(self):
+        return QUADRATURE[self.count % 4]
+
+
+class DepthModel:
+    """ First-order buoyancy model: the float is neutral with the piston at
+        neutral_fraction of its stroke, and sinks (or rises) at up to
+        max_rate m/s as the piston moves in (or out) from there """
+
+    def __init__(self, depth=0.0, bottom=10.0, neutral_fraction=0.5, max_rate=0.2,
+                 density=997, surface_pa=101325, surface_temp=20.0, temp_gradient=0.5):
+        self.depth = depth
+        self.bottom = bottom
+        self.neutral_fraction = neutral_fraction
+        self.max_rate = max_rate
+        self.density = density
+        self.surface_pa = surface_pa
+        self.surface_temp = surface_temp
+        self.temp_gradient = temp_gradient  # degC lost per metre
+
+    def rate(self, piston_fraction):
+        """ Vertical speed in m/s, positive going down """
+        return self.max_rate * (self.neutral_fraction - piston_fraction) / 0.5
+
+    def step(self, piston_fraction, seconds):
+        self.depth += self.rate(piston_fraction) * seconds
+        if self.depth < 0.0:
+            self.depth = 0.0
+        elif self.depth > self.bottom:
+            self.depth = self.bottom
+
+    def pressure_pa(self):
+        return self.surface_pa + self.density * 9.80665 * self.depth
+
+    def temperature(self):
+        return self.surface_temp - self.temp_gradient * self.depth
+
+
+def crc4(prom):
+    """ MS5837 PROM CRC, as in the datasheet """
+    n_prom = list(prom) + [0]
+    n_prom[0] &= 0x0FFF
+    n_rem = 0
+    for i in range(16):
+        if i % 2 == 1:
+            n_rem ^= n_prom[i >> 1] & 0x00FF
+        else:
+            n_rem ^= n_prom[i >> 1] >> 8
+        for _ in range(8):
+            if n_rem & 0x8000:
+                n_rem = ((n_rem << 1) ^ 0x3000) & 0xFFFF
+            else:
+                n_rem = (n_rem << 1) & 0xFFFF
+    return (n_rem >> 12) & 0x000F
+
+
+class MS5837Model:
+    """ MS5837 on the I2C bus. Conversions take the datasheet's maximum time
+        and sample the DepthModel when they are requested; reading the ADC
+        before a conversion is done returns 0, as on the real sensor. """
+
+    ADDRESS = 0x76
+
+    # Maximum conversion time for OSR 256 ... 8192, in microseconds
+    CONVERSION_US = (600, 1170, 2280, 4540, 9040, 18080)
+
+    def __init__(self, clock, environment, model=1, prom=(0, 34982, 36352, 20328, 22354, 26646, 26146)):
+        self.clock = clock
+        self.environment = environment
+        self.model = model  # 0 = 02BA, 1 = 30BA, as in ms5837.py
+        prom = list(prom)
+        prom[0] = (prom[0] & 0x0FFF) | (crc4(prom) << 12)
+        self.prom = prom
+        self._result = 0
+        self._ready_us = 0
+        self.commands = 0
+
+    # I2C device interface
+
+    def write(self, data):
+        if not data:
+            return
+        self.commands += 1
+        cmd = data[0]
+        if cmd == 0x1E:
+            self._result = 0
+        elif 0x40 <= cmd <= 0x4A or 0x50 <= cmd <= 0x5A:
+            osr = (cmd & 0x0F) >> 1
+            d1, d2 = self.raw(self.environment.pressure_pa(), self.environment.temperature())
+            self._result = d1 if cmd < 0x50 else d2
+            self._ready_us = self.clock.now_us + self.CONVERSION_US[osr]
+
+    def read(self, register, length):
+        if register == 0x00:
+            value = self._result if self.clock.now_us >= self._ready_us else 0
+            self._result = 0
+            data = bytes(((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF))
+        elif 0xA0 <= register <= 0xAC:
+            word = self.prom[(register - 0xA0) >> 1]
+            data = bytes((word >> 8, word & 0xFF))
+        else:
+            data = b""
+        return (data + bytes(length))[:length]
+
+    # Inverse of the datasheet compensation
+
+    def raw(self, pressure_pa, temperature_c):
+        """ D1, D2 ADC values that the driver will compensate back to
+            (about) pressure_pa and temperature_c """
+        C = self.prom
+        TEMP = int(round(temperature_c * 100))
+        dT = ((TEMP - 2000) << 23) // C[6]
+        D2 = dT + (C[5] << 8)
+        TEMP = 2000 + ((dT * C[6]) >> 23)
+
+        if self.model == 0:
+            SENS = (C[1] << 16) + ((C[3] * dT) >> 7)
+            OFF = (C[2] << 17) + ((C[4] * dT) >> 6)
+            OFFi = SENSi = 0
+            if TEMP < 2000:
+                OFFi = (31 * (TEMP - 2000) ** 2) >> 3
+                SENSi = (63 * (TEMP - 2000) ** 2) >> 5
+            P = int(round(pressure_pa))
+            shift = 15
+        else:
+            SENS = (C[1] << 15) + ((C[3] * dT) >> 8)
+            OFF = (C[2] << 16) + ((C[4] * dT) >> 7)
+            if TEMP < 2000:
+                OFFi = (3 * (TEMP - 2000) ** 2) >> 1
+                SENSi = (5 * (TEMP - 2000) ** 2) >> 3
+                if TEMP < -1500:
+                    OFFi += 7 * (TEMP + 1500) ** 2
+                    SENSi += 4 * (TEMP + 1500) ** 2
+            else:
+                OFFi = ((TEMP - 2000) ** 2) >> 4
+                SENSi = 0
+            P = int(round(pressure_pa / 10))
+            shift = 13
+
+        OFF2 = OFF - OFFi
+        SENS2 = SENS - SENSi
+        D1 = -((-((P << shift) + OFF2) << 21) // SENS2)
+        return max(0, min(D1, 0xFFFFFF)), max(0, min(D2, 0xFFFFFF))
@@ -0,0 +1,387 @@
+""" Stand-ins for the MicroPython modules NanOS imports: machine, network,
+    webrepl and micropython
+
+    Each make_*_module() call builds a fresh module bound to one Board, so
+    several simulations can run side by side.
+"""
+
+import types
+
+from . import board as _board
+
+
+class DeepSleep(BaseException):
+    """ Raised by machine.deepsleep(): the Simulator catches it, advances
+        the clock and boots the firmware again. A BaseException, like
+        SystemExit, so the firmware's own "except Exception" recovery code
+        doesn't catch it, just as nothing catches a real deepsleep. """
+
+    def __init__(self, ms):
+        BaseException.__init__(self, "deepsleep(%d)" % ms)
+        self.ms = ms
+
+
+def make_machine_module(board):
+    clock = board.clock
+
+    class Pin:
+        IN = 1
+        OUT = 3
+        OPEN_DRAIN = 7
+        PULL_UP = 2
+        PULL_DOWN = 1
+        IRQ_RISING = 1
+        IRQ_FALLING = 2
+        WAKE_LOW = 4
+        WAKE_HIGH = 5
+
+        def __init__(self, id, mode=-1, pull=-1, value=None, **kwargs):
+            self.id = id
+            self.mode = mode
+            self.pull = pull
+            self.irq_handler = None
+            self.irq_trigger = 0
+            self.irq_hard = False
+            if value is not None:
+                board.write_pin(id, 1 if value else 0)
+            board.register_pin(self)
+
+        def init(self, mode=-1, pull=-1, value=None, **kwargs):
+            if mode != -1:
+                self.mode = mode
+            if pull != -1:
+                self.pull = pull
+            if value is not None:
+                board.write_pin(self.id, 1 if value else 0)
+
+        def value(self, value=None):
+            if value is None:
+                return board.level(self.id)
+            board.write_pin(self.id, 1 if value else 0)
+
+        __call__ = value
+
+        def on(self):
+            board.write_pin(self.id, 1)
+
+        def off(self):
+            board.write_pin(self.id, 0)
+
+        def irq(self, handler=None, trigger=3, hard=False, **kwargs):
+            self.irq_handler = handler
+            self.irq_trigger = trigger
+            self.irq_hard = hard
+            board.register_pin(self)
+
+        def __repr__(self):
+            return "Pin(%d)" % self.id
+
+    class PWM:
+        def __init__(self, pin, freq=5000, duty_u16=None, duty=None, **kwargs):
+            self._pin = pin.id
+            self._freq = freq
+            board.pwm_duty[self._pin] = duty_u16 if duty_u16 is not None else 0
+
+        def freq(self, value=None):
+            if value is None:
+                return self._freq
+            self._freq = value
+
+        def duty_u16(self, value=None):
+            if value is None:
+                return board.pwm_duty.get(self._pin, 0)
+            board.pwm_duty[self._pin] = int(value)
+
+        def duty(self, value=None):
+            if value is None:
+                return board.pwm_duty.get(self._pin, 0) >> 6
+            board.pwm_duty[self._pin] = int(value) << 6
+
+        def deinit(self):
+            board.pwm_duty.pop(self._pin, None)
+
+    class ADC:
+        ATTN_0DB = 0
+        ATTN_2_5DB = 1
+        ATTN_6DB = 2
+        ATTN_11DB = 3
+        WIDTH_12BIT = 3
+
+        def __init__(self, pin, atten=None, **kwargs):
+            self._pin = pin.id if hasattr(pin, "id") else pin
+
+        def atten(self, atten):
+            pass
+
+        def width(self, width):
+            pass
+
+        def read_u16(self):
+            source = board.adc_sources.get(self._pin)
+            return int(source()) if source is not None else 0
+
+        def read(self):
+            return self.read_u16() >> 4
+
+        def read_uv(self):
+            # 11 dB attenuation, about 3.1 V full scale
+            return self.read_u16() * 3100000 // 65535
+
+    class I2C:
+        def __init__(self, id=-1, scl=None, sda=None, freq=400000, timeout=50000, **kwargs):
+            self._freq = freq
+
+        def _device(self, addr):
+            device = board.i2c_devices.get(addr)
+            if device is None:
+                raise OSError(19)  # ENODEV, as MicroPython reports a missing device
+            return device
+
+        def scan(self):
+            return sorted(board.i2c_devices)
+
+        def writeto(self, addr, buf, stop=True):
+            self._device(addr).write(bytes(buf))
+            return len(buf)
+
+        def readfrom(self, addr, nbytes, stop=True):
+            return self._device(addr).read(None, nbytes)
+
+        def readfrom_into(self, addr, buf, stop=True):
+            buf[:] = self._device(addr).read(None, len(buf))
+
+        def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+            return self._device(addr).read(memaddr, nbytes)
+
+        def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+            buf[:] = self._device(addr).read(memaddr, len(buf))
+
+        def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+            self._device(addr).write(bytes((memaddr,)) + bytes(buf))
+
+    SoftI2C = I2C
+
+    class Timer:
+        ONE_SHOT = 0
+        PERIODIC = 1
+
+        def __init__(self, id=-1, **kwargs):
+            self.id = id
+            self.due_us = 0
+            self._period_us = 0
+            self._mode = Timer.PERIODIC
+            self._callback = None
+            if kwargs:
+                self.init(**kwargs)
+
+        def init(self, mode=1, period=-1, freq=-1, callback=None, **kwargs):
+            if freq > 0:
+                self._period_us = 1000000 // freq
+            else:
+                self._period_us = max(1, period) * 1000
+            self._mode = mode
+            self._callback = callback
+            self.due_us = clock.now_us + self._period_us
+            clock.add_timer(self)
+
+        def deinit(self):
+            clock.remove_timer(self)
+            self._callback = None
+
+        def fire(self):
+            if self._mode == Timer.PERIODIC:
+                # Catch up from the deadline, not from now, so the period doesn't drift
+                self.due_us += self._period_us
+            else:
+                clock.remove_timer(self)
+            if self._callback is not None:
+                self._callback(self)
+
+    class RTC:
+        def __init__(self, id=0):
+            pass
+
+        def memory(self, data=None):
+            if data is None:
+                return board.rtc_memory
+            board.rtc_memory = bytes(data)
+
+        def datetime(self, value=None):
+            seconds = clock.now_us // 1000000
+            return (2000, 1, 1, 5, seconds // 3600 % 24, seconds // 60 % 60, seconds % 60, 0)
+
+    class WDT:
+        def __init__(self, id=0, timeout=5000):
+            pass
+
+        def feed(self):
+            pass
+
+    state = {"irq_depth": 0}
+
+    def disable_irq():
+        state["irq_depth"] += 1
+        return state["irq_depth"]
+
+    def enable_irq(irq_state):
+        state["irq_depth"] = max(0, irq_state - 1)
+
+    def deepsleep(ms=0):
+        board.log("deepsleep %d ms" % ms)
+        raise DeepSleep(ms)
+
+    def lightsleep(ms=0):
+        board.log("lightsleep %d ms" % ms)
+        clock.sleep_ms(ms)
+
+    def reset():
+        raise DeepSleep(0)
+
+    module = types.ModuleType("machine")
+    module.Pin = Pin
+    module.PWM = PWM
+    module.ADC = ADC
+    module.I2C = I2C
+    module.SoftI2C = SoftI2C
+    module.Timer = Timer
+    module.RTC = RTC
+    module.WDT = WDT
+    module.disable_irq = disable_irq
+    module.enable_irq = enable_irq
+    module.deepsleep = deepsleep
+    module.lightsleep = lightsleep
+    module.reset = reset
+    module.reset_cause = lambda: board.reset_cause
+    module.freq = lambda *args: 160000000
+    module.idle = lambda: None
+    module.unique_id = lambda: b"\x00nanosm"
+    module.PWRON_RESET = _board.PWRON_RESET
+    module.HARD_RESET = _board.HARD_RESET
+    module.WDT_RESET = _board.WDT_RESET
+    module.DEEPSLEEP_RESET = _board.DEEPSLEEP_RESET
+    module.SOFT_RESET = _board.SOFT_RESET
+    return module
+
+
+def make_network_module(board):
+    clock = board.clock
+
+    STA_IF = 0
+    AP_IF = 1
+    STAT_IDLE = 1000
+    STAT_CONNECTING = 1001
+    STAT_GOT_IP = 1010
+    STAT_NO_AP_FOUND = 201
+    STAT_WRONG_PASSWORD = 202
+    STAT_CONNECT_FAIL = 203
+
+    # How long a simulated association takes
+    CONNECT_US = 1500000
+
+    interfaces = {}
+
+    class WLAN:
+        def __new__(cls, interface=STA_IF):
+            # One object per interface, as on the ESP32 port
+            if interface not in interfaces:
+                wlan = object.__new__(cls)
+                wlan._interface = interface
+                wlan._active = False
+                wlan._config = {"ssid": "", "channel": 1, "mac": b"\x24\x0a\xc4\x00\x00\x01"}
+                wlan._status = STAT_IDLE
+                wlan._ssid = None
+                wlan._connected_at = None
+                interfaces[interface] = wlan
+            return interfaces[interface]
+
+        def __init__(self, interface=STA_IF):
+            pass
+
+        def active(self, value=None):
+            if value is None:
+                return self._active
+            self._active = bool(value)
+            board.log("WLAN %d active %s" % (self._interface, self._active))
+            if not self._active:
+                self._status = STAT_IDLE
+            return self._active
+
+        def config(self, *args, **kwargs):
+            if args:
+                return self._config.get(args[0])
+            self._config.update(kwargs)
+
+        def connect(self, ssid=None, key=None, bssid=None, **kwargs):
+            if not self._active:
+                raise OSError("STA must be active")
+            self._ssid = ssid
+            net = board.networks.get(ssid)
+            if net is None or (bssid is not None and bytes(bssid) != net.get("bssid")):
+                self._status = STAT_NO_AP_FOUND
+            elif net.get("key") not in (None, key):
+                self._status = STAT_WRONG_PASSWORD
+            else:
+                self._status = STAT_CONNECTING
+                # A known channel and BSSID skip the scan and associate faster
+                delay = CONNECT_US // 4 if bssid is not None else CONNECT_US
+                self._connected_at = clock.now_us + delay
+                self._config["channel"] = net.get("channel", 1)
+            board.log("WLAN connect %s" % ssid)
+
+        def disconnect(self):
+            self._status = STAT_IDLE
+            self._connected_at = None
+
+        def status(self, param=None):
+            if param == "rssi":
+                return -60
+            if self._status == STAT_CONNECTING and clock.now_us >= self._connected_at:
+                self._status = STAT_GOT_IP
+            return self._status
+
+        def isconnected(self):
+            if self._interface == AP_IF:
+                return self._active
+            return self.status() == STAT_GOT_IP
+
+        def scan(self):
+            clock.sleep_ms(2000)
+            return [(ssid.encode(), net.get("bssid", b""), net.get("channel", 1), -60, 3, False)
+                    for ssid, net in board.networks.items()]
+
+        def ifconfig(self, *args):
+            if self._interface == AP_IF:
+                return ("192.168.4.1", "255.255.255.0", "192.168.4.1", "0.0.0.0")
+            if self.isconnected():
+                return ("192.168.1.50", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+            return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+
+    module = types.ModuleType("network")
+    module.WLAN = WLAN
+    module.STA_IF = STA_IF
+    module.AP_IF = AP_IF
+    module.STAT_IDLE = STAT_IDLE
+    module.STAT_CONNECTING = STAT_CONNECTING
+    module.STAT_GOT_IP = STAT_GOT_IP
+    module.STAT_NO_AP_FOUND = STAT_NO_AP_FOUND
+    module.STAT_WRONG_PASSWORD = STAT_WRONG_PASSWORD
+    module.STAT_CONNECT_FAIL = STAT_CONNECT_FAIL
+    return module
+
+
+def make_webrepl_module(board):
+    module = types.ModuleType("webrepl")
+    module.start = lambda *args, **kwargs: board.log("webrepl started")
+    module.stop = lambda: board.log("webrepl stopped")
+    return module
+
+
+def make_micropython_module(board):
+    module = types.ModuleType("micropython")
+    module.const = lambda value: value
+    module.schedule = lambda func, arg: func(arg)
+    module.alloc_emergency_exception_buf = lambda size: None
+    module.opt_level = lambda *args: 0
+    module.mem_info = lambda *args: None
+    module.native = module.viper = lambda func: func
+    return module
@@ -0,0 +1,163 @@
+""" Runs a NanOS version on the host against a simulated board
+
+    The version directory is copied into a scratch "flash" directory, which
+    becomes the working directory and the front of sys.path, the same way
+    the board sees its filesystem. The modules shared between versions
+    (NanOS/lib, or the lib directory of a bundle) go into the flash
+    directory's lib, which is on sys.path as /lib is on the board. boot.py
+    is then imported with fake
+    machine/network/webrepl/micropython modules and a virtual time module
+    installed, and deepsleep() reboots it with reset_cause() reporting a
+    deepsleep wake. Files the firmware writes (journals, logs, caches) stay
+    in the flash directory across reboots.
+"""
+
+import builtins
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+
+from .board import Board, DEEPSLEEP_RESET
+from .clock import VirtualClock
+from .fakes import (DeepSleep, make_machine_module, make_network_module,
+                    make_webrepl_module, make_micropython_module)
+
+SIMULATED_MODULES = ("machine", "network", "webrepl", "micropython", "time")
+
+
+def find_lib(version_dir):
+    """ The shared modules for version_dir: its own lib directory (a
+        bundle), else the lib directory next to it (NanOS/lib), else None """
+    for path in (os.path.join(version_dir, "lib"), os.path.join(os.path.dirname(version_dir), "lib")):
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+class Simulator:
+    """ Host-side NanOS runtime
+
+            with Simulator("NanOS/v0.0.3", inputs=["confirm"]) as sim:
+                sim.run(lambda boot: boot.deploy())
+                print(sim.clock.now_us / 1e6, "simulated seconds")
+    """
+
+    def __init__(self, version_dir, inputs=(), board=None, flash_dir=None, echo=True, lib_dir=None):
+        self.version_dir = os.path.abspath(version_dir)
+        self.lib_dir = os.path.abspath(lib_dir) if lib_dir else find_lib(self.version_dir)
+        self.clock = board.clock if board is not None else VirtualClock()
+        self.board = board if board is not None else Board(self.clock)
+        self.inputs = list(inputs)
+        self.echo = echo
+        self.boots = 0
+        self.module = None
+        self._own_flash = flash_dir is None
+        self.flash_dir = flash_dir or tempfile.mkdtemp(prefix="nanosim-")
+        self._saved = None
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def install(self):
+        """ Puts the simulated modules, flash directory and scripted input in place """
+        flash_lib = os.path.join(self.flash_dir, "lib")
+        copies = [(self.version_dir, self.flash_dir)]
+        if self.lib_dir is not None:
+            os.makedirs(flash_lib, exist_ok=True)
+            copies.append((self.lib_dir, flash_lib))
+        for src_dir, dst_dir in copies:
+            for name in os.listdir(src_dir):
+                src = os.path.join(src_dir, name)
+                if os.path.isfile(src) and not os.path.exists(os.path.join(dst_dir, name)):
+                    shutil.copy(src, dst_dir)
+
+        self._saved = {
+            "modules": {name: sys.modules.get(name) for name in SIMULATED_MODULES},
+            "cwd": os.getcwd(),
+            "input": builtins.input,
+            "print": builtins.print,
+        }
+        sys.modules["machine"] = make_machine_module(self.board)
+        sys.modules["network"] = make_network_module(self.board)
+        sys.modules["webrepl"] = make_webrepl_module(self.board)
+        sys.modules["micropython"] = make_micropython_module(self.board)
+        sys.modules["time"] = self.clock.make_time_module()
+        sys.path.insert(0, flash_lib)
+        sys.path.insert(0, self.flash_dir)
+        os.chdir(self.flash_dir)
+        builtins.input = self._input
+        if not self.echo:
+            builtins.print = lambda *args, **kwargs: None
+
+    def uninstall(self):
+        if self._saved is None:
+            return
+        self._forget_firmware()
+        for name, module in self._saved["modules"].items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        os.chdir(self._saved["cwd"])
+        for path in (self.flash_dir, os.path.join(self.flash_dir, "lib")):
+            if path in sys.path:
+                sys.path.remove(path)
+        builtins.input = self._saved["input"]
+        builtins.print = self._saved["print"]
+        self._saved = None
+        if self._own_flash:
+            shutil.rmtree(self.flash_dir, ignore_errors=True)
+
+    def _input(self, prompt=""):
+        if not self.inputs:
+            raise EOFError("simulated input exhausted")
+        line = self.inputs.pop(0)
+        if self.echo:
+            self._saved["print"](prompt + line)
+        return line
+
+    def _forget_firmware(self):
+        # Drop every module loaded from flash so the next boot imports fresh copies
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None) or ""
+            if path.startswith(self.flash_dir):
+                del sys.modules[name]
+
+    def boot(self):
+        """ Runs boot.py (and main.py, if there is one) and returns the boot
+            module, whose globals are the firmware's REPL namespace """
+        self._forget_firmware()
+        self.boots += 1
+        self.clock.ticks_origin_us = self.clock.now_us
+        self.module = importlib.import_module("boot")
+        if os.path.exists(os.path.join(self.flash_dir, "main.py")):
+            importlib.import_module("main")
+        return self.module
+
+    def run(self, entry=None, max_wakes=1000):
+        """ Boots the firmware, calls entry(boot_module) (e.g. lambda boot:
+            boot.deploy()), then keeps rebooting through every deepsleep
+            until the firmware stops sleeping. Returns the number of
+            deepsleep wakes. """
+        wakes = 0
+        while True:
+            try:
+                module = self.boot()
+                if entry is not None and wakes == 0:
+                    entry(module)
+                return wakes
+            except DeepSleep as sleep:
+                wakes += 1
+                if wakes > max_wakes:
+                    raise RuntimeError("firmware still deep sleeping after %d wakes" % max_wakes)
+                self.board.power_down()
+                self.clock.advance(sleep.ms * 1000)
+                self.board.reset_cause = DEEPSLEEP_RESET
+            except SystemExit:
+                return wakes
@@ -0,0 +1,61 @@
+""" Host tests for NanOS, on nanosim's simulated board
+
+    From the NanOS directory:
+
+        python -m pytest tests
+
+    Firmware tests boot v0.0.3 through the `firmware` fixture, in a scratch
+    flash directory that is thrown away afterwards. Tests of a single module
+    with no hardware behind it load it with load_module() and run in
+    pytest's tmp_path.
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+NANOS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRMWARE_DIR = os.path.join(NANOS_DIR, "v0.0.3")
+LIB_DIR = os.path.join(NANOS_DIR, "lib")
+
+if NANOS_DIR not in sys.path:
+    sys.path.insert(0, NANOS_DIR)
+
+from nanosim import Board, Simulator, VirtualClock  # noqa: E402
+
+
+def load_module(path):
+    """ Imports the firmware module at path (relative to NanOS) under a
+        name of its own, so it never stands in for the copy a simulated
+        boot imports """
+    name = "nanos_test_" + os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(NANOS_DIR, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def board():
+    return Board(VirtualClock())
+
+
+@pytest.fixture
+def simulator(board):
+    """ A Simulator for v0.0.3 on `board`, not booted yet """
+    with Simulator(FIRMWARE_DIR, board=board, echo=False) as sim:
+        yield sim
+
+
+@pytest.fixture
+def firmware(simulator):
+    """ v0.0.3's boot module after a cold boot, radio up and no mission """
+    return simulator.boot()
+
+
+@pytest.fixture
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,131 @@
+""" Typed settings file (lib/config_store.py) """
+
+import os
+
+import pytest
+
+from conftest import load_module
+
+config_store = load_module("lib/config_store.py")
+
+DEFAULTS = {
+    "network_name": "NF1.1-01",
+    "dives": 6,
+    "dive_depth_m": 2.5,
+    "station": False,
+}
+
+
+def store():
+    return config_store.ConfigStore(DEFAULTS)
+
+
+def test_defaults_without_a_file(in_tmp_path):
+    config = store()
+    assert not config.load()
+    assert [config[key] for key in DEFAULTS] == list(DEFAULTS.values())
+
+
+def test_round_trip_keeps_every_type(in_tmp_path):
+    config = store()
+    config.load()
+    config.set("network_name", "NF1.1-07")
+    config.set("dives", 12)
+    config.set("dive_depth_m", 3.25)
+    config.set("station", True)
+    assert config.save()
+    assert not os.path.exists("config.tmp")
+
+    config = store()
+    assert config.load()
+    assert config["network_name"] == "NF1.1-07"
+    assert config["dives"] == 12 and type(config["dives"]) is int
+    assert config["dive_depth_m"] == 3.25
+    assert config["station"] is True
+
+
+def test_set_converts_text_to_the_default_type(in_tmp_path):
+    config = store()
+    assert config.set("dives", "8") == 8
+    assert config.set("dive_depth_m", "1.5") == 1.5
+    assert config.set("station", "on") is True
+    assert config.set("station", "no") is False
+    with pytest.raises(ValueError):
+        config.set("station", "maybe")
+    with pytest.raises(ValueError):
+        config.set("dives", "many")
+    with pytest.raises(ValueError):
+        config.set("dives", 1 << 40)
+    with pytest.raises(KeyError):
+        config.set("depth", 3)
+
+
+def test_save_only_writes_changes(in_tmp_path):
+    config = store()
+    config.load()
+    config.set("dives", 6)
+    assert not config.save()
+    assert not os.path.exists("config.bin")
+
+
+@pytest.mark.parametrize("damage", ["flip", "truncate", "magic"])
+def test_damaged_file_falls_back_to_the_defaults(in_tmp_path, damage):
+    config = store()
+    config.set("dives", 9)
+    config.save()
+    with open("config.bin", "rb") as f:
+        data = bytearray(f.read())
+    if damage == "flip":
+        data[8] ^= 0x40
+    elif damage == "truncate":
+        data = data[:len(data) // 2]
+    else:
+        data[:4] = b"XXXX"
+    with open("config.bin", "wb") as f:
+        f.write(data)
+
+    config = store()
+    assert not config.load()
+    assert config["dives"] == 6
+
+
+def test_temp_file_left_by_a_reset_mid_save_is_used(in_tmp_path):
+    config = store()
+    config.set("dives", 3)
+    config.save()
+    # A reset between removing config.bin and renaming the temp file over it
+    os.rename("config.bin", "config.tmp")
+
+    config = store()
+    assert config.load()
+    assert config["dives"] == 3
+
+
+def test_keys_from_newer_firmware_are_kept(in_tmp_path):
+    newer = config_store.ConfigStore(dict(DEFAULTS, ballast_g=12))
+    newer.set("ballast_g", 40)
+    newer.save()
+
+    config = store()
+    config.load()
+    assert "ballast_g" in config
+    config.set("dives", 2)
+    config.save()
+
+    newer = config_store.ConfigStore(dict(DEFAULTS, ballast_g=12))
+    newer.load()
+    assert newer["ballast_g"] == 40 and newer["dives"] == 2
+
+
+def test_boot_seeds_from_the_old_config_files_then_keeps_its_own(simulator):
+    boot = simulator.boot()
+    assert os.path.exists("config.bin")
+    assert boot.config["network_name"] == "NF1.1-01"
+    assert boot.config["webrepl_password"] == "nanofloat"
+
+    boot.config_set("dives", 2)
+    with open("wlan_cfg.py", "w") as f:
+        f.write('network_name = "changed"\n')
+    boot = simulator.boot()
+    assert boot.config["dives"] == 2
+    assert boot.config["network_name"] == "NF1.1-01"
@@ -0,0 +1,39 @@
+""" Depth hold sampling (depth_hold in boot.py, sampler.py, adaptive OSR in lib/ms5837.py) """
+
+import pytest
+
+np = pytest.importorskip("numpy")
+decode = pytest.importorskip("nanolog.decode")
+
+
+@pytest.fixture
+def hold_log(firmware):
+    """ Decoded dive.log of a 30 s hold at 2.5 m, starting at the surface """
+    assert firmware.depth_hold(2.5, 30)
+    firmware.dive_logger.flush()
+    return decode.decode(decode.read_log("dive.log"))
+
+
+def test_osr_follows_the_descent_rate(firmware, hold_log):
+    ms5837 = firmware.ms5837
+    osr = hold_log["osr"][1:]
+    rate = np.abs(np.diff(hold_log["pressure_pa"]) * 1000.0 / np.diff(hold_log["tick"]))
+    used = sorted(set(osr.tolist()))
+    assert ms5837.OSR_8192 in used and len(used) > 1
+    # Faster descent, lower OSR
+    mean_rate = [rate[osr == o].mean() for o in used]
+    assert mean_rate == sorted(mean_rate, reverse=True)
+    # Holding at the bottom, the rate is low and the sensor back at full resolution
+    assert osr[-1] == ms5837.OSR_8192
+
+
+def test_period_is_cut_while_the_osr_is_lowered(firmware, hold_log):
+    # The rate that picks a sample's OSR also sets the period that sample was taken after. Intervals across a change
+    # of period also hold the conversion time of the sample before, so only those between two samples of the same
+    # kind are checked.
+    fast = hold_log["osr"] != firmware.ms5837.OSR_8192
+    interval = np.diff(hold_log["tick"])
+    same = fast[1:] == fast[:-1]
+    assert fast.any()
+    assert (interval[same & fast[1:]] == firmware.DEPTH_FAST_PERIOD_MS).all()
+    assert (interval[same & ~fast[1:]] == firmware.DEPTH_HOLD_PERIOD_MS).all()
@@ -0,0 +1,136 @@
+""" Block-based dive logger (dive_log.py) """
+
+import os
+import struct
+import zlib
+
+import pytest
+
+from conftest import load_module
+
+dive_log = load_module("v0.0.3/dive_log.py")
+BLOCK_SIZE = dive_log.BLOCK_SIZE
+PROM = [0, 34982, 36352, 20328, 22354, 26646, 26146]
+
+
+def blocks(path="dive.log"):
+    """ (seq, count, kind, crc_ok) for every block in the file """
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(data) % BLOCK_SIZE == 0
+    found = []
+    for start in range(0, len(data), BLOCK_SIZE):
+        magic, seq, count, kind, size, crc = struct.unpack_from(dive_log.HEADER_FORMAT, data, start)
+        body = data[start + dive_log.HEADER_SIZE:start + dive_log.HEADER_SIZE + count * size]
+        found.append((seq, count, kind, magic == dive_log.BLOCK_MAGIC and zlib.crc32(body) == crc))
+    return found
+
+
+def fill(logger, n, first=0):
+    for i in range(first, first + n):
+        logger.log(i, 4000000 + i, 8000000, i, 30000, 5)
+
+
+def test_blocks_carry_sequence_numbers_and_valid_crcs(in_tmp_path):
+    logger = dive_log.DiveLogger()
+    logger.log_calibration(1, PROM)
+    fill(logger, 500)
+    logger.flush()
+    per_block = (BLOCK_SIZE - dive_log.HEADER_SIZE) // dive_log.SAMPLE_SIZE
+    assert blocks() == [
+        (0, 1, dive_log.KIND_CALIBRATION, True),
+        (1, per_block, dive_log.KIND_SAMPLES, True),
+        (2, per_block, dive_log.KIND_SAMPLES, True),
+        (3, 500 - 2 * per_block, dive_log.KIND_SAMPLES, True),
+    ]
+
+
+def test_only_full_blocks_reach_flash_before_flush(in_tmp_path):
+    logger = dive_log.DiveLogger()
+    logger.log_calibration(1, PROM)
+    fill(logger, 450)
+    assert logger.pending() == 2
+    logger.flush_full()
+    assert logger.pending() == 0
+    assert len(blocks()) == 3
+
+
+def test_full_ring_writes_the_oldest_block_instead_of_dropping_it(in_tmp_path):
+    logger = dive_log.DiveLogger(blocks=2)
+    logger.log_calibration(1, PROM)
+    fill(logger, 1000)
+    logger.flush()
+    assert sum(count for seq, count, kind, ok in blocks() if kind == dive_log.KIND_SAMPLES) == 1000
+
+
+def test_sequence_carries_on_after_a_reboot(in_tmp_path):
+    logger = dive_log.DiveLogger()
+    logger.log_calibration(1, PROM)
+    fill(logger, 10)
+    logger.flush()
+    logger = dive_log.DiveLogger()
+    fill(logger, 10)
+    logger.flush()
+    assert [seq for seq, count, kind, ok in blocks()] == [0, 1, 2]
+
+
+def test_torn_block_is_padded_and_skipped(in_tmp_path):
+    logger = dive_log.DiveLogger()
+    logger.log_calibration(1, PROM)
+    fill(logger, 300)
+    logger.flush()
+    # A reset part way through writing the last block
+    with open("dive.log", "r+b") as f:
+        f.truncate(2 * BLOCK_SIZE + 1500)
+
+    logger = dive_log.DiveLogger()
+    assert os.path.getsize("dive.log") == 3 * BLOCK_SIZE
+    fill(logger, 20, first=300)
+    logger.flush()
+    found = blocks()
+    assert [ok for seq, count, kind, ok in found] == [True, True, False, True]
+    # The block after the torn one is aligned and carries on the sequence
+    assert [seq for seq, count, kind, ok in found] == [0, 1, 2, 3]
+
+
+def test_torn_header_takes_the_sequence_from_the_block_before(in_tmp_path):
+    logger = dive_log.DiveLogger()
+    logger.log_calibration(1, PROM)
+    fill(logger, 10)
+    logger.flush()
+    with open("dive.log", "ab") as f:
+        f.write(b"NF")
+    logger = dive_log.DiveLogger()
+    fill(logger, 10)
+    logger.flush()
+    assert [seq for seq, count, kind, ok in blocks() if ok] == [0, 1, 2]
+
+
+def test_damaged_block_is_dropped_by_the_decoder(in_tmp_path):
+    decode = pytest.importorskip("nanolog.decode")
+    logger = dive_log.DiveLogger()
+    logger.log_calibration(1, PROM)
+    fill(logger, 500)
+    logger.flush()
+    with open("dive.log", "r+b") as f:
+        f.seek(2 * BLOCK_SIZE + 100)
+        f.write(b"\x00\x00\x00\x00")
+
+    sections = decode.read_log("dive.log")
+    assert len(sections) == 1
+    ticks = list(sections[0].samples["tick"])
+    per_block = (BLOCK_SIZE - dive_log.HEADER_SIZE) // dive_log.SAMPLE_SIZE
+    assert ticks == list(range(per_block)) + list(range(2 * per_block, 500))
+
+
+def test_rotates_at_the_next_calibration_past_the_cap(in_tmp_path):
+    logger = dive_log.DiveLogger(max_bytes=3 * BLOCK_SIZE)
+    logger.log_calibration(1, PROM)
+    fill(logger, 500)
+    logger.flush()
+    assert len(blocks()) == 4
+    logger.log_calibration(1, PROM)
+    assert len(blocks("dive.old")) == 4
+    assert [kind for seq, count, kind, ok in blocks()] == [dive_log.KIND_CALIBRATION]
+    # Sequence numbers keep going across files
+    assert blocks()[0][0] == blocks("dive.old")[-1][0] + 1
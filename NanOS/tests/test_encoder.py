@@ -0,0 +1,56 @@
+""" x4 quadrature decoding in encoder_isr (boot.py) """
+
+from nanosim.devices import QUADRATURE
+
+
+def set_phase(board, phase, fire=True):
+    """ Puts the encoder outputs at QUADRATURE[phase % 4], one channel at a
+        time, so each change reaches the firmware's ISR as its own edge """
+    a, b = QUADRATURE[phase % 4]
+    board.drive_input(board.wiring["encoder_a"], a, fire)
+    board.drive_input(board.wiring["encoder_b"], b, fire)
+
+
+def test_counts_every_edge_both_ways(firmware, board):
+    start = firmware.encoder_read()
+    for phase in range(1, 41):
+        set_phase(board, phase)
+    assert firmware.encoder_read() == start + 40
+    for phase in range(39, -1, -1):
+        set_phase(board, phase)
+    assert firmware.encoder_read() == start
+
+
+def test_direction_reversal_mid_cycle(firmware, board):
+    start = firmware.encoder_read()
+    for phase in (1, 2, 1, 2, 3, 2):
+        set_phase(board, phase)
+    assert firmware.encoder_read() == start + 2
+
+
+def test_missed_edge_is_not_counted(firmware, board):
+    start = firmware.encoder_read()
+    set_phase(board, 1)
+    # Both channels change between interrupts: the ISR sees a double step and can't tell the direction
+    a, b = QUADRATURE[3]
+    board.drive_input(board.wiring["encoder_a"], a, fire=False)
+    board.drive_input(board.wiring["encoder_b"], b)
+    assert firmware.encoder_read() == start + 1
+    # Decoding carries on from the state it last saw
+    set_phase(board, 0)
+    assert firmware.encoder_read() == start + 2
+
+
+def test_bounce_on_one_channel_cancels_out(firmware, board):
+    start = firmware.encoder_read()
+    for _ in range(5):
+        set_phase(board, 1)
+        set_phase(board, 0)
+    assert firmware.encoder_read() == start
+
+
+def test_tracks_the_piston_through_moves(firmware, board):
+    for target in (3000, 500, 7000):
+        firmware.piston_move("abs", target).wait()
+        assert firmware.encoder_read() == board.piston.count
+        assert abs(firmware.encoder_read() - target) <= firmware.PISTON_DEADBAND
@@ -0,0 +1,32 @@
+""" Limit switch stop and re-referencing (limit_isr, piston_home in boot.py) """
+
+
+def test_move_past_full_extension_stops_at_the_switch(firmware, board):
+    move = firmware.piston_move("abs", firmware.PISTON_LIMIT_POS + 1000)
+    assert move.wait() == firmware.MOVE_LIMIT
+    assert board.piston.count == firmware.PISTON_LIMIT_POS
+    assert firmware.encoder_read() == firmware.PISTON_LIMIT_POS
+    assert move.end_pos == firmware.PISTON_LIMIT_POS
+    assert firmware.limit_events == 1
+    assert board.motor_duty() == 0
+
+
+def test_no_driving_out_after_a_limit_stop(firmware, board):
+    firmware.piston_move("abs", firmware.PISTON_LIMIT_POS + 1000).wait()
+    assert firmware.limit_hit
+    firmware.piston_out()
+    assert firmware.piston_drive_duty == 0 and board.motor_duty() == 0
+
+    # Driving in clears it
+    firmware.piston_in()
+    assert firmware.piston_drive_duty < 0
+    assert not firmware.limit_hit
+    firmware.piston_stop()
+
+
+def test_homing_corrects_encoder_drift(firmware, board):
+    firmware.piston_move("abs", 6000).wait()
+    firmware.encoder_set(board.piston.count - 500)
+    assert firmware.piston_home()
+    assert firmware.limit_drift == -500
+    assert firmware.encoder_read() == board.piston.count == firmware.PISTON_LIMIT_POS
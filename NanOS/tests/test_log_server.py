@@ -0,0 +1,139 @@
+""" Log downloads: log_server.py on the simulated float, nanolog.client on the host """
+
+import importlib
+import os
+import random
+import socket
+import threading
+
+import pytest
+
+from nanolog import client
+
+
+@pytest.fixture
+def log_server(firmware):
+    """ The firmware's log_server module, with the compressor probed afresh """
+    module = importlib.import_module("log_server")
+    module._compressor = None
+    return module
+
+
+@pytest.fixture
+def serve(log_server):
+    """ Starts a LogServer for dive.log in a thread, on a free port, and returns the port. The server stops once
+        nobody has connected for a second. """
+    threads = []
+
+    def start():
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        server = log_server.LogServer(port=port)
+        thread = threading.Thread(target=server.serve, kwargs={"idle_s": 1})
+        thread.start()
+        threads.append(thread)
+        return port
+
+    yield start
+    for thread in threads:
+        thread.join()
+
+
+def pull(port, path, **kwargs):
+    return client.pull("127.0.0.1", "dive.log", path=str(path), port=port, retry_delay=0, **kwargs)
+
+
+def write_log(size, compressible=True):
+    rng = random.Random(12)
+    if compressible:
+        data = bytes(rng.choice(b"NanOS float ") for _ in range(size))
+    else:
+        data = bytes(rng.getrandbits(8) for _ in range(size))
+    with open("dive.log", "wb") as f:
+        f.write(data)
+    return data
+
+
+def test_pull_resumes_from_the_local_copy(serve, tmp_path):
+    data = write_log(5 * client.CHUNK_SIZE + 700)
+    local = tmp_path / "dive.log"
+    # A verified prefix from an earlier download, ending part way into a chunk
+    local.write_bytes(data[:2 * client.CHUNK_SIZE + 100])
+
+    result = pull(serve(), local)
+    assert result.complete
+    assert result.start_offset == 2 * client.CHUNK_SIZE
+    assert result.bytes_raw == len(data) - 2 * client.CHUNK_SIZE
+    assert local.read_bytes() == data
+
+
+def test_pull_resumes_after_the_link_drops(serve, log_server, tmp_path, monkeypatch):
+    data = write_log(5 * client.CHUNK_SIZE)
+    compress = log_server.compress
+    calls = []
+
+    def drop_third_chunk(chunk):
+        calls.append(len(chunk))
+        if len(calls) == 3:
+            raise OSError("link lost")
+        return compress(chunk)
+
+    monkeypatch.setattr(log_server, "compress", drop_third_chunk)
+    local = tmp_path / "dive.log"
+    result = pull(serve(), local)
+    assert result.complete and result.connections == 2
+    assert local.read_bytes() == data
+    # Two chunks went through before the drop, so only the last three are sent again
+    assert len(calls) == 5 + 1
+
+
+def test_incompressible_chunks_are_sent_stored(serve, tmp_path):
+    data = write_log(3 * client.CHUNK_SIZE, compressible=False)
+    local = tmp_path / "dive.log"
+    result = pull(serve(), local)
+    assert local.read_bytes() == data
+    assert result.bytes_received == len(data) + 4 * client.CHUNK_HEADER_SIZE
+
+
+def test_deflate_without_compression_falls_back(serve, log_server, tmp_path, monkeypatch):
+    class DeflateIO(object):
+        """ Stock ESP32 deflate: compression compiled out """
+        def __init__(self, stream, format, wbits):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def write(self, data):
+            raise OSError(95)  # EOPNOTSUPP
+
+    class deflate(object):
+        RAW = 1
+
+    deflate.DeflateIO = DeflateIO
+    monkeypatch.setattr(log_server, "deflate", deflate)
+    data = write_log(3 * client.CHUNK_SIZE)
+    local = tmp_path / "dive.log"
+    result = pull(serve(), local)
+    assert local.read_bytes() == data
+    assert log_server._compressor is log_server._zlib
+    assert result.ratio > 2
+
+
+def test_malformed_offset_is_refused(serve, tmp_path, monkeypatch):
+    data = write_log(client.CHUNK_SIZE)
+    port = serve()
+    local = tmp_path / "dive.log"
+    monkeypatch.setattr(client, "_local_offset", lambda path: -client.CHUNK_SIZE)
+    with pytest.raises(FileNotFoundError):
+        pull(port, local)
+
+    # The server is still up for a well-formed request
+    monkeypatch.undo()
+    assert pull(port, local).complete
+    assert local.read_bytes() == data
@@ -0,0 +1,19 @@
+""" Slow-move flagging (motion_health.py, piston_finish in boot.py) """
+
+
+def test_normal_move_is_not_flagged(firmware, board):
+    move = firmware.piston_move("abs", 9000)
+    assert move.wait() == firmware.MOVE_DONE
+    assert move.slow_ms == 0
+    assert move.speed_pct > 90
+
+
+def test_slow_piston_is_flagged(firmware, board):
+    board.piston.max_speed = 900  # Under half the speed the duty should give, as with a worn gearbox
+    move = firmware.piston_move("abs", 9000)
+    assert move.wait() == firmware.MOVE_DONE
+    assert move.slow_ms > 0
+    assert move.speed_pct < 60
+    with open(firmware.MOVE_LOG_FILE) as f:
+        last = f.read().splitlines()[-1]
+    assert last.endswith("slow %d ms" % move.slow_ms)
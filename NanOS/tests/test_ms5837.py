@@ -0,0 +1,72 @@
+""" MS5837 integer compensation (lib/ms5837.py) """
+
+import random
+
+import pytest
+
+from conftest import load_module
+
+ms5837 = load_module("lib/ms5837.py")
+
+# PROM and ADC readings of the MS5837-30BA datasheet's worked example
+DATASHEET_PROM = [0, 34982, 36352, 20328, 22354, 26646, 26146]
+DATASHEET_D1 = 4958179
+DATASHEET_D2 = 6815414
+
+
+class StubBus(object):
+    def write_byte(self, address, value):
+        pass
+
+
+def calculate(d1, d2, prom=DATASHEET_PROM, model=ms5837.MODEL_30BA):
+    sensor = ms5837.MS5837(model, StubBus())
+    sensor._C = prom
+    sensor._D1 = d1
+    sensor._D2 = d2
+    sensor._calculate()
+    return sensor
+
+
+def float_30ba(d1, d2, C):
+    """ The datasheet's 30BA compensation in floating point, with no intermediate truncated. Returns (mbar,
+        0.01 degC). """
+    dT = d2 - C[5] * 256.0
+    SENS = C[1] * 32768 + C[3] * dT / 256
+    OFF = C[2] * 65536 + C[4] * dT / 128
+    TEMP = 2000 + dT * C[6] / 8388608
+    if TEMP < 2000:
+        Ti = 3 * dT * dT / 8589934592
+        OFFi = 3 * (TEMP - 2000) ** 2 / 2
+        SENSi = 5 * (TEMP - 2000) ** 2 / 8
+        if TEMP < -1500:
+            OFFi += 7 * (TEMP + 1500) ** 2
+            SENSi += 4 * (TEMP + 1500) ** 2
+    else:
+        Ti = 2 * dT * dT / 137438953472
+        OFFi = (TEMP - 2000) ** 2 / 16
+        SENSi = 0
+    return (d1 * (SENS - SENSi) / 2097152 - (OFF - OFFi)) / 8192 / 10, TEMP - Ti
+
+
+def test_datasheet_example():
+    sensor = calculate(DATASHEET_D1, DATASHEET_D2)
+    assert sensor.pressure_pa() == 399980
+    assert sensor.temperature_centi() == 1981
+    assert sensor.pressure() == pytest.approx(3999.8)
+    assert sensor.temperature() == pytest.approx(19.81)
+
+
+@pytest.mark.parametrize("low, high", [(-1500, 2000), (-4000, -1500)], ids=["below 20 C", "below -15 C"])
+def test_low_temperature_branches_match_the_float_formula(low, high):
+    rng = random.Random(6)
+    checked = 0
+    while checked < 500:
+        d1 = rng.randint(4000000, 6000000)
+        d2 = rng.randint(5000000, 8000000)
+        mbar, temp = float_30ba(d1, d2, DATASHEET_PROM)
+        # Surface to about 30 m, the float's working range
+        if not (low <= temp < high and 900 <= mbar <= 4000):
+            continue
+        assert abs(calculate(d1, d2).pressure_pa() / 100 - mbar) <= 0.2
+        checked += 1
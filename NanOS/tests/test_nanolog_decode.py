@@ -0,0 +1,35 @@
+""" Vectorized compensation in nanolog.decode against the driver (lib/ms5837.py) """
+
+import random
+
+import pytest
+
+from conftest import load_module
+
+np = pytest.importorskip("numpy")
+decode = pytest.importorskip("nanolog.decode")
+ms5837 = load_module("lib/ms5837.py")
+
+
+class StubBus(object):
+    def write_byte(self, address, value):
+        pass
+
+
+@pytest.mark.parametrize("model", [ms5837.MODEL_30BA, ms5837.MODEL_02BA], ids=["30BA", "02BA"])
+def test_compensate_matches_the_driver(model):
+    rng = random.Random(13)
+    sensor = ms5837.MS5837(model, StubBus())
+    for _ in range(20):
+        prom = [0] + [rng.randint(0, 0xFFFF) for _ in range(6)]
+        d1 = [rng.randint(0, 0xFFFFFF) for _ in range(100)]
+        d2 = [rng.randint(0, 0xFFFFFF) for _ in range(100)]
+        pressure, temperature = decode.compensate(np.array(d1, dtype=np.uint32), np.array(d2, dtype=np.uint32),
+                                                  prom, model)
+        sensor._C = prom
+        expected = []
+        for raw in zip(d1, d2):
+            sensor._D1, sensor._D2 = raw
+            sensor._calculate()
+            expected.append((sensor.pressure_pa(), sensor.temperature_centi()))
+        assert list(zip(pressure.tolist(), temperature.tolist())) == expected
@@ -0,0 +1,92 @@
+""" Position journal (piston_journal.py) and its use at boot """
+
+import os
+
+from conftest import FIRMWARE_DIR, load_module
+from nanosim import Simulator
+
+piston_journal = load_module("v0.0.3/piston_journal.py")
+RECORD_SIZE = piston_journal.RECORD_SIZE
+
+
+def journal(**kwargs):
+    return piston_journal.PositionJournal(**kwargs)
+
+
+def test_empty_journal_recovers_the_default(in_tmp_path):
+    assert journal().recover() == 0
+    assert journal().recover(None) is None
+
+
+def test_recovers_the_last_position(in_tmp_path):
+    j = journal()
+    j.recover()
+    for position in (10, 250, -40, 9000):
+        j.append(position)
+    assert journal().recover() == 9000
+
+
+def test_unchanged_position_is_not_written(in_tmp_path):
+    j = journal()
+    j.recover()
+    j.append(42)
+    j.append(42)
+    assert os.path.getsize("pos0.jnl") == RECORD_SIZE
+
+
+def test_torn_record_falls_back_to_the_one_before(in_tmp_path):
+    j = journal()
+    j.recover()
+    j.append(100)
+    j.append(200)
+    with open("pos0.jnl", "ab") as f:
+        f.write(b"\x02\x00\x00\x00\x2c\x01")  # A reset half way through the record for 300
+
+    j = journal()
+    assert j.recover() == 200
+    # The next save overwrites the torn record rather than appending after it
+    j.append(300)
+    assert os.path.getsize("pos0.jnl") == 3 * RECORD_SIZE
+    assert journal().recover() == 300
+
+
+def test_record_failing_its_crc_is_skipped(in_tmp_path):
+    j = journal()
+    j.recover()
+    j.append(100)
+    j.append(200)
+    with open("pos0.jnl", "r+b") as f:
+        f.seek(RECORD_SIZE + 4)
+        f.write(b"\xff")
+    assert journal().recover() == 100
+
+
+def test_rotates_through_the_ring(in_tmp_path):
+    j = journal(files=3, records_per_file=4)
+    j.recover()
+    for position in range(1, 31):
+        j.append(position)
+    assert journal(files=3, records_per_file=4).recover() == 30
+    names = sorted(name for name in os.listdir() if name.endswith(".jnl"))
+    assert names == ["pos0.jnl", "pos1.jnl", "pos2.jnl"]
+    assert all(os.path.getsize(name) <= 4 * RECORD_SIZE for name in names)
+
+
+def test_position_survives_a_reboot(simulator, board):
+    boot = simulator.boot()
+    boot.piston_move("abs", 4000).wait()
+    boot.save_position()
+    assert simulator.boot().position == board.piston.count
+
+
+def test_seeded_once_from_an_old_piston_pos(tmp_path, board):
+    (tmp_path / "piston_pos.py").write_text("position = 4321\n")
+    with Simulator(FIRMWARE_DIR, board=board, flash_dir=str(tmp_path), echo=False) as sim:
+        assert sim.boot().position == 4321
+        assert not os.path.exists("piston_pos.py")
+        assert sim.boot().position == 4321
+
+    # With a journal on flash, a piston_pos.py is ignored
+    (tmp_path / "piston_pos.py").write_text("position = 7\n")
+    with Simulator(FIRMWARE_DIR, board=board, flash_dir=str(tmp_path), echo=False) as sim:
+        assert sim.boot().position == 4321
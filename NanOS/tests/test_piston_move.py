@@ -0,0 +1,50 @@
+""" Piston motion engine (piston_move, piston_tick, piston_finish in boot.py) """
+
+
+def move_log_lines(firmware):
+    with open(firmware.MOVE_LOG_FILE) as f:
+        return f.read().splitlines()
+
+
+def tick_while_stopping(firmware, monkeypatch):
+    """ Runs a control tick from inside piston_finish, straight after it stops the motor, the way a Timer(0)
+        callback already scheduled on the board can """
+    stop = firmware.piston_stop
+
+    def stop_then_tick():
+        stop()
+        firmware.piston_tick(None)
+
+    monkeypatch.setattr(firmware, "piston_stop", stop_then_tick)
+
+
+def test_cancel_while_retracting_stops_the_motor(firmware, board, simulator, monkeypatch):
+    firmware.piston_move("abs", 6000).wait()
+    move = firmware.piston_move("abs", 0)
+    simulator.clock.sleep_ms(500)
+    assert board.motor_duty() < 0
+    tick_while_stopping(firmware, monkeypatch)
+    move.cancel()
+    assert move.status == firmware.MOVE_CANCELLED
+    assert board.motor_duty() == 0
+    position = board.piston.count
+    simulator.clock.sleep_ms(500)
+    assert board.piston.count == position
+
+
+def test_a_move_is_finished_only_once(firmware, board, monkeypatch):
+    move = firmware.piston_move("abs", 3000)
+    move.timeout_ms = -1  # So the tick would finish the move itself
+    tick_while_stopping(firmware, monkeypatch)
+    move.cancel()
+    firmware.piston_finish(firmware.MOVE_TIMEOUT)
+    assert move.status == firmware.MOVE_CANCELLED
+    assert [line.split()[8] for line in move_log_lines(firmware)] == ["cancelled"]
+
+
+def test_retarget_logs_the_replaced_move(firmware, board):
+    first = firmware.piston_move("abs", 6000)
+    second = firmware.piston_move("abs", 2000)
+    assert first.status == firmware.MOVE_CANCELLED
+    assert second.wait() == firmware.MOVE_DONE
+    assert [line.split()[8] for line in move_log_lines(firmware)] == ["cancelled", "done"]
@@ -0,0 +1,26 @@
+""" Stall detection from the motor current (motor_monitor.py, piston_tick in boot.py) """
+
+
+def test_end_stop_ends_the_move_as_a_stall(firmware, board):
+    firmware.piston_move("abs", 2000).wait()
+    move = firmware.piston_move("abs", -500)
+    assert move.wait() == firmware.MOVE_STALLED
+    assert board.piston.count == 0
+    assert firmware.piston_drive_duty == 0 and board.motor_duty() == 0
+
+
+def test_jammed_piston_is_cut_quickly(firmware, board):
+    board.piston.start_duty = 70000  # More than any duty: the motor never turns
+    move = firmware.piston_move("abs", 3000)
+    assert move.wait() == firmware.MOVE_STALLED
+    assert move.duration_ms < 500
+    assert board.piston.count == 0
+    assert firmware.piston_drive_duty == 0
+
+
+def test_stall_is_logged(firmware, board):
+    board.piston.start_duty = 70000
+    firmware.piston_move("abs", 3000).wait()
+    with open(firmware.MOVE_LOG_FILE) as f:
+        last = f.read().splitlines()[-1]
+    assert " stalled " in last
@@ -20,7 +20,9 @@ import webrepl
 import network
 import urequests
 
-import random
+# Importing the config store, which keeps the float's settings in config.bin (see float_config).
+# It's shared between NanOS versions in NanOS/lib, which goes to the board's /lib (on MicroPython's sys.path).
+import config_store
 
 # Starting up the WiFi Access Point. In this case, the network is set to AP_IF, putting it into access point mode.
 # In other use cases, the network may be set to STA_IF which sets it as a default station which can connect to WiFi.
@@ -133,258 +135,36 @@ def end_func():
 
 #================================================================================================================================================
 #                                                              floatConfig
-            
-# This code chunk defines all the config menus and options
-            
-class menu_item:
-    def __init__(self, number, name):
-        self.number = number
-        self.name = name
-
-    def __str__(self):
-        return f'{self.number}. {self.name}'
-    
-class menu:
-    def __init__(self, items):
-        self.items = items
-
-    def show(self):
-        sleep(random.randint(0,150)*0.01)
-        print('-------')
-        for i in range(len(self.items)):
-            print(str(f'{self.items[i]}'))
-        print('-------')
-
-end_states_dict = {}
-
-items_root = [menu_item(1,'Control Parameters'), 
-            menu_item(2,'Sensors'), 
-            menu_item(3,'Data/Storage'), 
-            menu_item(4,'Wireless'), 
-            menu_item(5,'Float Info'),
-            menu_item(6,'Exit config menu')]
-
-menu_root = menu(items_root)
-
-items1 = [menu_item(1,'Parameter 1'), 
-            menu_item(2, 'Parameter 2'), 
-            menu_item(3,'Parameter 3'), 
-            menu_item(4,'Parameter 4'), 
-            menu_item(5,'Parameter 5'),
-            menu_item(6,'Parameter 6'),
-            menu_item(7,'Return')]
-
-menu1 = menu(items1)
-
-items11 = [menu_item(1,'Change Parameter 1'),
-            menu_item(2,'Return')]
-
-menu11 = menu(items11)
-
-items12 = [menu_item(1,'Change Parameter 2'),
-            menu_item(2,'Return')]
-
-menu12 = menu(items12)
-
-items13 = [menu_item(1,'Change Parameter 3'),
-            menu_item(2,'Return')]
-
-menu13 = menu(items13)
-
-items14 = [menu_item(1,'Change Parameter 4'),
-            menu_item(2,'Return')]
-
-menu14 = menu(items14)
-
-items15 = [menu_item(1,'Change Parameter 5'),
-            menu_item(2,'Return')]
-
-menu15 = menu(items15)
-
-items16 = [menu_item(1,'Change Parameter 6'),
-            menu_item(2,'Return')]
-
-menu16 = menu(items16)
-
-items2 = [menu_item(1,'Pressure'), 
-            menu_item(2, 'Conductivity'), 
-            menu_item(3,'Temperature'),
-            menu_item(4,'Return')]
-
-menu2 = menu(items2)
 
-items21 = [menu_item(1,'Calibrate Pressure'),
-           menu_item(2, 'Sensor Info'),
-            menu_item(3,'Return')]
-
-menu21 = menu(items21)
-
-items22 = [menu_item(1,'Calibrate Conductivity'),
-           menu_item(2, 'Sensor Info'),
-            menu_item(3,'Return')]
-
-menu22 = menu(items22)
-
-items23 = [menu_item(1,'Calibrate Temperature'),
-           menu_item(2, 'Sensor Info'),
-            menu_item(3,'Return')]
-
-menu23 = menu(items23)
-
-items3 = [menu_item(1,'Erase stored data'), 
-            menu_item(2, 'Access stored data'), 
-            menu_item(3,'Return')]
-
-menu3 = menu(items3)
-
-items4 = [menu_item(1,'WebREPL - On'), 
-            menu_item(2, 'WebREPL - Off'), 
-            menu_item(3, 'WiFi access point - On'),
-            menu_item(4, 'WiFi access point - Off'),
-            menu_item(5, 'WiFi station - On'),
-            menu_item(6, 'WiFi station - Off'),
-            menu_item(7,'Return')]
-
-menu4 = menu(items4)
-
-items_final = [menu_item(1,'Return')]
-
-menu_final = menu(items_final)
-
-def placeholder_func():
-    print("This functionality has not been developed yet. It is coming soon...")
-    menu_final.show()
-
-def float_info():
-    print("NanOS Ver. 0.0.1")
-    print("Gen. 1 NanoFloat hardware: Seeed Studio XIAO ESP32C3, flashed with MicroPython")
-    print("Micropython v1.22.2 (2024-02-22)")
-    print("Dives completed: 0") # IMPLEMENT LATER ------------- IMPLEMENT LATER ------------- IMPLEMENT LATER ------------- IMPLEMENT LATER
-    print("Dives till next maintenance cycle: 0")#------------- IMPLEMENT LATER ------------- IMPLEMENT LATER ------------- IMPLEMENT LATER
-    print("Float owner: Remotely Operated Vehicles team at the University of Washington")
-    print("Contact uwrov@uw.edu for more information on your specific float.")
-    menu_final.show()
-
-def float_config():
-    
-   class menu_item:
-    def __init__(self, number, name):
-        self.number = number
-        self.name = name
+# The config menus are a tree of menu nodes, built once when this file runs. Each node renders its screen when it's
+# built and looks up the typed choice in a dict, so showing a screen is a single print and choosing is one lookup.
+#
+# A node with children shows them as a numbered list, followed by a last entry (back) that returns to its parent.
+# A node without children is an action: its handler is called when it's entered, and its screen is just the back entry.
+# Leaving the root ends float_config().
 
-    def __str__(self):
-        return f'{self.number}. {self.name}'
-    
 class menu:
-    def __init__(self, items):
-        self.items = items
+    def __init__(self, name, children=(), handler=None, back='Return'):
+        self.name = name
+        self.handler = handler
+        self.parent = None
+        self.choices = {}
+
+        lines = ['-------']
+        for i, child in enumerate(children):
+            child.parent = self
+            self.choices[str(i+1)] = child
+            lines.append(f'{i+1}. {child.name}')
+        self.back = str(len(children)+1)
+        lines.append(f'{self.back}. {back}')
+        lines.append('-------')
+        self.text = '\n'.join(lines)
 
     def show(self):
-        print('-------')
-        sleep(random.randint(20,150)*0.01)
-        for i in range(len(self.items)):
-            print(str(f'{self.items[i]}'))
-        print('-------')
-
-end_states_dict = {}
-
-items_root = [menu_item(1,'Control Parameters'), 
-            menu_item(2,'Sensors'), 
-            menu_item(3,'Data/Storage'), 
-            menu_item(4,'Wireless'), 
-            menu_item(5,'Float Info'),
-            menu_item(6,'Exit config menu')]
-
-menu_root = menu(items_root)
-
-items1 = [menu_item(1,'Parameter 1'), 
-            menu_item(2, 'Parameter 2'), 
-            menu_item(3,'Parameter 3'), 
-            menu_item(4,'Parameter 4'), 
-            menu_item(5,'Parameter 5'),
-            menu_item(6,'Parameter 6'),
-            menu_item(7,'Return')]
-
-menu1 = menu(items1)
-
-items11 = [menu_item(1,'Change Parameter 1'),
-            menu_item(2,'Return')]
-
-menu11 = menu(items11)
-
-items12 = [menu_item(1,'Change Parameter 2'),
-            menu_item(2,'Return')]
-
-menu12 = menu(items12)
-
-items13 = [menu_item(1,'Change Parameter 3'),
-            menu_item(2,'Return')]
-
-menu13 = menu(items13)
-
-items14 = [menu_item(1,'Change Parameter 4'),
-            menu_item(2,'Return')]
-
-menu14 = menu(items14)
-
-items15 = [menu_item(1,'Change Parameter 5'),
-            menu_item(2,'Return')]
-
-menu15 = menu(items15)
-
-items16 = [menu_item(1,'Change Parameter 6'),
-            menu_item(2,'Return')]
-
-menu16 = menu(items16)
-
-items2 = [menu_item(1,'Pressure'), 
-            menu_item(2, 'Conductivity'), 
-            menu_item(3,'Temperature'),
-            menu_item(4,'Return')]
-
-menu2 = menu(items2)
-
-items21 = [menu_item(1,'Calibrate Pressure'),
-           menu_item(2, 'Sensor Info'),
-            menu_item(3,'Return')]
-
-menu21 = menu(items21)
-
-items22 = [menu_item(1,'Calibrate Conductivity'),
-           menu_item(2, 'Sensor Info'),
-            menu_item(3,'Return')]
-
-menu22 = menu(items22)
-
-items23 = [menu_item(1,'Calibrate Temperature'),
-           menu_item(2, 'Sensor Info'),
-            menu_item(3,'Return')]
-
-menu23 = menu(items23)
-
-items3 = [menu_item(1,'Erase stored data'), 
-            menu_item(2, 'Access stored data'), 
-            menu_item(3,'Return')]
-
-menu3 = menu(items3)
-
-items4 = [menu_item(1,'WebREPL - On'), 
-            menu_item(2, 'WebREPL - Off'), 
-            menu_item(3, 'WiFi access point - On'),
-            menu_item(4, 'WiFi access point - Off'),
-            menu_item(5, 'WiFi station - On'),
-            menu_item(6, 'WiFi station - Off'),
-            menu_item(7,'Return')]
-
-menu4 = menu(items4)
-
-items_final = [menu_item(1,'Return')]
-
-menu_final = menu(items_final)
+        print(self.text)
 
 def placeholder_func():
     print("This functionality has not been developed yet. It is coming soon...")
-    menu_final.show()
 
 def float_info():
     print("NanOS Ver. 0.0.1")
@@ -394,7 +174,64 @@ def float_info():
     print("Dives till next maintenance cycle: 0")#------------- IMPLEMENT LATER ------------- IMPLEMENT LATER ------------- IMPLEMENT LATER
     print("Float owner: Remotely Operated Vehicles team at the University of Washington")
     print("Contact uwrov@uw.edu for more information on your specific float.")
-    menu_final.show()
+
+# Mission parameters, edited from the Control Parameters menu. They're read from config.bin (see config_store.py)
+# once here at boot and saved as soon as they're changed, so a new value applies straight away, without a reboot.
+# Their defaults are config_store.MISSION_DEFAULTS, the same ones v0.0.3 uses.
+MISSION_PARAMETERS = [('Number of dives', 'dives'),
+                      ('Dive depth (m)', 'dive_depth_m'),
+                      ('Depth tolerance (m)', 'dive_tolerance_m'),
+                      ('Bottom time (s)', 'dive_bottom_s'),
+                      ('Surface time (s)', 'dive_surface_s'),
+                      ('Depth hold timeout (s)', 'depth_hold_timeout_s')]
+
+config = config_store.ConfigStore(config_store.MISSION_DEFAULTS)
+config.load()
+
+def parameter_show(name, key):
+    print(f'{name}: {config[key]}')
+
+def parameter_change(name, key):
+    print(f'Enter the new {name}, or press Enter to keep {config[key]}:')
+
+    value = input()
+
+    if value == 'end':
+        end_func()
+
+    elif value != '':
+        try:
+            config.set(key, value)
+            config.save()
+            print(f'{name} set to {config[key]}')
+        except ValueError:
+            print(f'ERROR: {value} is not a valid {name}.')
+        except OSError:
+            print('ERROR: Could not save the config.')
+
+def parameter_menu(name, key):
+    return menu(name, [menu('Change ' + name, handler=lambda: parameter_change(name, key))],
+                handler=lambda: parameter_show(name, key))
+
+def sensor_menu(name):
+    return menu(name, [menu('Calibrate ' + name, handler=placeholder_func),
+                       menu('Sensor Info', handler=placeholder_func)])
+
+menu_root = menu('NanoFloat Configuration Menu', [
+    menu('Control Parameters', [parameter_menu(name, key) for name, key in MISSION_PARAMETERS]),
+    menu('Sensors', [sensor_menu('Pressure'),
+                     sensor_menu('Conductivity'),
+                     sensor_menu('Temperature')]),
+    menu('Data/Storage', [menu('Erase stored data', handler=placeholder_func),
+                          menu('Access stored data', handler=placeholder_func)]),
+    menu('Wireless', [menu('WebREPL - On', handler=placeholder_func),
+                      menu('WebREPL - Off', handler=placeholder_func),
+                      menu('WiFi access point - On', handler=placeholder_func),
+                      menu('WiFi access point - Off', handler=placeholder_func),
+                      menu('WiFi station - On', handler=placeholder_func),
+                      menu('WiFi station - Off', handler=placeholder_func)]),
+    menu('Float Info', handler=float_info),
+], back='Exit config menu')
 
 def float_config():
     
@@ -402,87 +239,27 @@ def float_config():
     print('NanoFloat Configuration Menu')
     print('Type "end" at any point to quit the config menu.')
 
-    menu_dict = {
-
-        '0000000000':[menu_root.show,items_root],
-
-        '0100000000':[menu1.show,items1],
-        '0200000000':[menu2.show,items2],
-        '0300000000':[menu3.show,items3],
-        '0400000000':[menu4.show,items4],
-        '0500000000':[float_info,items_final],
-
-        '0110000000':[menu11.show,items11],
-        '0120000000':[menu12.show,items12],
-        '0130000000':[menu13.show,items13],
-        '0140000000':[menu14.show,items14],
-        '0150000000':[menu15.show,items15],
-        '0160000000':[menu16.show,items16],
-
-        '0210000000':[menu21.show,items21],
-        '0220000000':[menu22.show,items22],
-        '0230000000':[menu23.show,items23],
-
-        '0310000000':[placeholder_func,'0'],
-        '0320000000':[placeholder_func,'0'],
-        '0330000000':[placeholder_func,'0'],
+    node = menu_root
+    entered = True
 
-        '0410000000':[placeholder_func,'0'],
-        '0420000000':[placeholder_func,'0'],
-        '0430000000':[placeholder_func,'0'],
-        '0440000000':[placeholder_func,'0'],
-        '0450000000':[placeholder_func,'0'],
-        '0460000000':[placeholder_func,'0'],
+    while node is not None:
 
-        '0111000000':[placeholder_func,'0'],
-        '0121000000':[placeholder_func,'0'],
-        '0131000000':[placeholder_func,'0'],
-        '0141000000':[placeholder_func,'0'],
-        '0151000000':[placeholder_func,'0'],
-        '0161000000':[placeholder_func,'0'],
-
-        '0211000000':[placeholder_func,'0'],
-        '0221000000':[placeholder_func,'0'],
-        '0231000000':[placeholder_func,'0'],
-    }
-
-    path = [0,0,0,0,0,0,0,0,0,0]
-
-    level = 0
-
-    choice = 0
-
-    while True:
-
-        path_convert = ""
-
-        for i in range(len(path)):
-            path_convert += str(path[i])
-
-        menu_dict[path_convert][0]()
+        if entered and node.handler is not None:
+            node.handler()
+        node.show()
 
         choice = input()
+        entered = False
 
-        valid = False
-
-        for i in range(len(menu_dict[path_convert][1])):
-            if choice == str(i+1):
-                valid = True
-                break
-        
         if choice == 'end':
             end_func()
 
-        if valid == True and choice == str(len(menu_dict[path_convert][1])):
-            path[level] = 0
-            level += -1
-
-        elif valid == True:
-            level += 1
-            path[level] = choice
+        elif choice == node.back:
+            node = node.parent
 
-        if level == -1:
-                sys.exit()
+        elif choice in node.choices:
+            node = node.choices[choice]
+            entered = True
     
 #================================================================================================================================================
 #                                                              motorTest
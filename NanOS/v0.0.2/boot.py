@@ -13,7 +13,8 @@ import sys
 # Importing the WiFi config files, which store the network name, or SSID, and the password
 import wlan_cfg
 
-# Importing the i2c library for our pressure sensor
+# Importing the i2c library for our pressure sensor.
+# It's shared between NanOS versions in NanOS/lib, which goes to the board's /lib (on MicroPython's sys.path).
 import ms5837
 
 # Importing the following from the esp32's operating system:
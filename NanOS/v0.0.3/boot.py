@@ -4,57 +4,124 @@
 # This file is executed on every boot (including wake-boot from deepsleep)
 # It includes the entire code for the nanofloat, all functions are defined here
 
-# Importing sleep to allow for waiting
-from time import sleep, sleep_ms
+# Importing sleep to allow for waiting, and ticks to time piston moves
+from time import sleep, sleep_ms, ticks_ms, ticks_us, ticks_diff, time
 
-# Importing Piston Position
+# Boot profiling. boot.py runs in stages, and boot_stage(name) at the end of each one records how many ms it took.
+# The first entry is the time from reset until boot.py started. See boot_report() and the startup section.
+boot_stages = [("firmware", ticks_ms())]
+boot_mark = boot_stages[0][1]
+
+def boot_stage(name):
+    global boot_mark
+    now = ticks_ms()
+    boot_stages.append((name, ticks_diff(now, boot_mark)))
+    boot_mark = now
+
+# Importing the piston position journal and recovering the last saved position
 # Reference save_position function to see how the position is updated.
-import piston_pos
-position = piston_pos.position
+import piston_journal
+position_journal = piston_journal.PositionJournal()
+position = position_journal.recover(None)
+if position is None:
+    # No journal yet. A float upgraded from firmware that kept its position in a generated piston_pos.py starts the
+    # journal from there, once: the file is removed when its position is on record.
+    position = 0
+    try:
+        import piston_pos
+        position = piston_pos.position
+    except Exception:
+        pass # Missing, or torn by a reset while the old firmware was rewriting it
+    position_journal.append(position)
+    try:
+        import os
+        os.remove("piston_pos.py")
+    except OSError:
+        pass
+boot_stage("journal")
 
 # Impoting sys, it is used in the sys.exit() function within endFunc()
 import sys
 
-# Importing the WiFi config files, which store the network name, or SSID, and the password
-import wlan_cfg
+# Importing the i2c library for our pressure sensor, and the SMBus adapter it talks through.
+# Both are shared between NanOS versions in NanOS/lib, which goes to the board's /lib (on MicroPython's sys.path).
+import ms5837
+from smbus import SMBus
+
+# Importing the binary dive logger, which buffers samples in RAM and writes them to flash in whole blocks
+import dive_log
 
-# Importing the i2c library for our pressure sensor
-#import ms5837
+# Importing the mission state, which is kept in RTC memory so a dive can carry on after each deepsleep wake
+import mission_state
+
+# Importing the motor current monitor, which cuts the piston motor when it stalls, and the motion health monitor,
+# which watches the piston's speed
+import motor_monitor
+import motion_health
+
+# Importing array for the encoder's edge history
+from array import array
 
 # Importing the following from the esp32's operating system:
 #       - Pin to control GPIOs
 #       - I2C to control sensors operating over the i2c serial bus
-from machine import Pin, I2C, ADC
-
-# Importing WebREPL to interface wirelessly with the controller's WiFi Access Point 
-import webrepl
-
-# Importing network which will allow the controller to start up its own WiFi Access Point
-import network 
-
-# Starting up the WiFi Access Point. In this case, the network is set to AP_IF, putting it into access point mode.
-# In other use cases, the network may be set to STA_IF which sets it as a default station which can connect to WiFi.
-try:
-    ap = network.WLAN(network.STA_IF)
-    ap.config(beep)
-    print("Startup in Station Mode")
-except:
-    print("---")
-    print("WARNING: ROUTER CONNECTION FAILED: Initializing Access-Point Mode")
-    print("---")
-    try:
-        ap = network.WLAN(network.AP_IF)
-        ap.config(ssid = wlan_cfg.network_name, max_clients = 1)
-        ap.active(True)
+#       - PWM to control the speed of the piston motor
+#       - ADC to read the piston motor current
+#       - Timer to run the piston control loop in the background
+#       - disable_irq/enable_irq to read the encoder count without the ISR changing it mid-read
+#       - deepsleep/lightsleep and reset_cause to sleep between dive phases and tell a wake from a cold boot
+from machine import Pin, I2C, ADC, PWM, Timer, disable_irq, enable_irq
+from machine import deepsleep, lightsleep, reset_cause, DEEPSLEEP_RESET
+
+# Imported on demand, so a deepsleep wake in the middle of a dive doesn't pay for them:
+#       - network, webrepl and wifi (the connection manager), in radio_start()
+#       - log_server, which lets the host pull dive.log over TCP at the surface, in log_download()
+#       - depth_control (the depth-hold controller) and sampler (fixed-rate pressure sampling), in depth_hold()
+boot_stage("imports")
+
+# Wi-Fi connection manager (see wifi.py) and the network interface the float is reachable on, set by radio_start()
+wlan = None
+ap = None
+
+# Starting up the network: station mode if the config names a router (router_ssid) and it can be reached within a
+# few attempts, otherwise the float's own access point (network_name). block=False returns as soon as connecting has
+# started; poll wlan (or call radio_wait()) to finish it. The one poll that scans for the router blocks for about
+# 2 s, and a float with the router's BSSID cached doesn't scan. This is called at the end of boot.py, and skipped
+# when the float wakes from deepsleep mid-mission (see mission).
+def radio_start(block=True):
+    global wlan
+    import wifi, webrepl
+    wlan = wifi.WifiManager(config["network_name"], config["router_ssid"], config["router_password"])
+    wlan.start()
+
+    # Starting up WebREPL access, which sets the password for access and assigns the default IP address to the controller
+    # Change the password with config_set("webrepl_password", ...); it takes effect on the next boot. Until one is set,
+    # webrepl.start() reads webrepl_cfg.PASS itself.
+    webrepl.start(password=config["webrepl_password"] or None)
+
+    if block:
+        radio_wait()
+
+# Finishes connecting and reports how the float can be reached
+def radio_wait():
+    global ap
+    import wifi
+    state = wlan.wait()
+    ap = wlan.interface()
+    if state == wifi.STATE_STATION:
+        print("Startup in Station Mode:", wlan.ifconfig()[0], "in", wlan.connect_ms, "ms")
+    elif state == wifi.STATE_ACCESS_POINT:
+        if wlan.sta is not None:
+            print("---")
+            print("WARNING: ROUTER CONNECTION FAILED: Initializing Access-Point Mode")
+            print("---")
         print("Startup in Access-Point Mode Successful")
-    except:
+    else:
         print("Startup in Access-Point Mode Failed, USB Connection Required")
-
-# Starting up WebREPL access, which sets the password for access and assigns the default IP address to the controller
-# Reset the psasword to what you prefer by changing it in the webrepl_cfg.py file, default is "123"
-webrepl.start()
+    return state
 
 # Defining the GPIOs (digital pin numbers do not always align with true GPIO numbers, check Seeed Studio XIAO ESP32C3 datasheet)
+d0 = Pin(0) #-------------------------- Motor current sense (ADC)
 d1 = Pin(1, Pin.IN) #------------------ Encoder A phase
 d2 = Pin(2, Pin.IN) #------------------ Encoder B phase
 d3 = Pin(21, Pin.OUT) #---------------- UNUSED
@@ -70,12 +137,20 @@ d10 = Pin(18, Pin.OUT) #--------------- Motor Input 2
 en_A = d1
 en_B = d2
 
-# Defining the pins for the I2C bus and creating the i2c object
+# Defining the pins for the I2C bus. The i2c object is created by i2c_start() the first time the sensor is used.
+# SMBus is a machine.I2C with the py-smbus methods the ms5837 driver uses added on
 sda = d4
 scl = d5
-i2c = I2C(scl=scl, sda=sda)
+i2c = None
+
+def i2c_start():
+    global i2c
+    if i2c is None:
+        i2c = SMBus(0, scl=scl, sda=sda)
+    return i2c
 
 # Defining the Limit Switch Pins and setting the limit switch activator pin to be pulled high, or enabled.
+# The switch is normally closed, so lim_sw_state reads 1 until the piston opens it at full extension (see limit_isr).
 lim_sw_state = d6
 lim_sw_activate = d7
 lim_sw_activate.value(1)
@@ -84,39 +159,81 @@ lim_sw_activate.value(1)
 motor1 = d9
 motor2 = d10
 
+# Motor drive settings. Duties are duty_u16 values, 0 (off) to 65535 (fully on).
+PISTON_PWM_FREQ = 20000 #-------------- DRV8833 PWM frequency in Hz, kept above the audible range
+PISTON_CRUISE_DUTY = 65535 #----------- Default top speed of a move
+PISTON_MIN_DUTY = 26000 #-------------- Slowest duty that still reliably turns the motor (start and end of a ramp)
+PISTON_RAMP_COUNTS = 400 #------------- Encoder counts spent accelerating from, and decelerating to, PISTON_MIN_DUTY
+
+# Both motor inputs are driven with PWM: the DRV8833 runs the motor forwards while IN1 is pulsed and IN2 is low,
+# and backwards the other way round, so the duty on the active input sets the speed.
+motor1_pwm = PWM(motor1, freq=PISTON_PWM_FREQ, duty_u16=0)
+motor2_pwm = PWM(motor2, freq=PISTON_PWM_FREQ, duty_u16=0)
+
+# Signed duty currently applied to the motor, positive while extending and negative while retracting
+piston_drive_duty = 0
+
+# Motor current, read across the DRV8833's sense resistor. The 11 dB attenuation covers the whole 0-3.3 V range.
+motor_sense = ADC(d0, atten=ADC.ATTN_11DB)
+piston_current = motor_monitor.MotorMonitor(motor_sense)
+
+# Piston speed against the duty driving it (see motion_health.py and encoder_velocity())
+piston_health = motion_health.MotionHealth()
+
+boot_stage("pins")
+
+#================================================================================================================================================
+#                                                           piston_drive
+
+# Runs the motor at a signed duty between -65535 (full speed in) and 65535 (full speed out). 0 stops it.
+# The piston is never driven out while the limit switch is open, or after limit_isr has stopped it until it's driven
+# back in: it is already at full extension. The check and the PWM writes run with interrupts off, so limit_isr can't
+# stop the motor between them and have it started again straight after.
+def piston_drive(duty):
+    global piston_drive_duty, limit_hit
+    if duty > 65535:
+        duty = 65535
+    elif duty < -65535:
+        duty = -65535
+    irq_state = disable_irq()
+    if duty > 0 and (limit_hit or not lim_sw_state.value()):
+        duty = 0
+    if duty >= 0:
+        motor2_pwm.duty_u16(0)
+        motor1_pwm.duty_u16(duty)
+    else:
+        motor1_pwm.duty_u16(0)
+        motor2_pwm.duty_u16(-duty)
+        limit_hit = False
+    piston_drive_duty = duty
+    enable_irq(irq_state)
+
 #================================================================================================================================================
 #                                                           piston_out
 
-def piston_out():
-    motor1.value(1)
-    motor2.value(0)
+def piston_out(duty=PISTON_CRUISE_DUTY):
+    piston_drive(duty)
 
 #================================================================================================================================================
 #                                                           piston_in
 
-def piston_in():
-    motor1.value(0)
-    motor2.value(1)
+def piston_in(duty=PISTON_CRUISE_DUTY):
+    piston_drive(-duty)
 
 #================================================================================================================================================
 #                                                           piston_stop
 
 def piston_stop():
-    motor1.value(0)
-    motor2.value(0)
+    piston_drive(0)
 
 #================================================================================================================================================
 #                                                           save_position
 
+# Appends the current position to the journal (see piston_journal.py). This is one 12-byte write,
+# and an unchanged position is not written at all.
 def save_position():
     
-    global position
-    
-    with open("piston_pos.py", "w") as f:
-
-        f.write('position = %d' % (position))
-        
-        f.close()
+    position_journal.append(position)
         
 #================================================================================================================================================
 #                                                           position_reset
@@ -127,22 +244,32 @@ def position_reset():
     
     position = 0
     
+    encoder_set(0)
+    
     save_position()
 
 #================================================================================================================================================
 #                                                           piston_move
 
-# piston_move() requires three arguments: method, target, and units (optional, raw counts assumed).
+# piston_move() requires two arguments: method and target, plus an optional cruise duty, timeout_ms and verbose.
+# verbose=False leaves out the start and target printout, for callers such as depth_hold() that retarget the piston
+# every few seconds and would flood the console with it.
+# It returns immediately with a piston_motion handle. Call .wait() (or "await .wait_async()" under uasyncio) to block
+# until the move is over, or poll .done(). .status then holds MOVE_DONE, MOVE_TIMEOUT or MOVE_CANCELLED.
 #
 # method: a string which decides whether the piston should move an arbitrary delta_x or if it should move to a specified position.
 # |
 # '--> accepts: "rel" or "relative"
 #               "abs" or "absolute"
 #
-# target: a float representing either the relative distance the piston should move or the absolute position to which it should move.
+# target: a number of encoder counts representing either the relative distance the piston should move or the absolute position to which it should move.
 # |
-# '--> accepts: for relative values, either positive or negative floats for retraction and extension respectively
-#               for absolute values, only positive floats
+# '--> accepts: for relative values, either positive or negative counts for extension and retraction respectively
+#               for absolute values, only positive counts
+#
+# duty: the cruise duty (speed) of the move, from PISTON_MIN_DUTY to 65535. Defaults to PISTON_CRUISE_DUTY.
+#
+# timeout_ms: the longest the move may run before the motor is stopped regardless of position. Defaults to PISTON_TIMEOUT_MS.
 #
 # units: a string which defines the units of the target argument. If left unspecified, raw counts are used. (WORK IN PROGRESS, CURRENTLY SUPPRESSED)
 # |
@@ -151,123 +278,655 @@ def position_reset():
 #               "revs_o" (revolutions of output shaft)
 #               "revs_i" (revolutions of input shaft)
 
-# A-Channel previous state tracker initialization
-a_prev = 0
+# Quadrature decoder
+#
+# Both edges of both encoder channels fire encoder_isr, giving 4 counts per encoder line (x4 decoding).
+# The ISR packs the previous and current A/B states into a 4-bit index and looks the step up in quad_table,
+# so every interrupt does the same constant amount of work no matter how fast the piston is moving.
+#
+#   index = (A_prev << 3) | (B_prev << 2) | (A << 1) | B
+#
+# Valid transitions give +1 or -1, no change gives 0, and an illegal double step (both channels changed
+# between interrupts, i.e. a missed edge) also gives 0 rather than guessing a direction.
+# If the count runs backwards relative to piston_out(), swap en_A and en_B above.
+quad_table = (0, -1, 1, 0,
+              1, 0, 0, -1,
+              -1, 0, 0, 1,
+              0, 1, -1, 0)
+
+# Previous A/B state, stored as (A << 1) | B
+quad_state = (en_A.value() << 1) | en_B.value()
+
+# Signed encoder count, seeded with the saved piston position. Only encoder_isr writes to it,
+# everything else should go through encoder_read() and encoder_set().
+encoder_count = position
+
+# Edge history: the ISR stamps every counted edge with ticks_us into a fixed ring of EDGE_HISTORY entries, so the
+# piston's speed can be worked out whenever it's wanted (see encoder_velocity()) without any work per edge beyond
+# two array writes
+EDGE_HISTORY = 64 #-------------------- Edges kept, a power of two
+EDGE_MASK = EDGE_HISTORY - 1
+EDGE_WINDOW = 16 #--------------------- Edges encoder_velocity() averages over by default
 
-delta = 0
+edge_times = array("i", [ticks_us()] * EDGE_HISTORY)
+edge_counts = array("i", [position] * EDGE_HISTORY)
+edge_index = 0 #----------------------- Where the next edge goes
 
-# Encoder ISR to run as the handler for the interrupt and update position
+# Encoder ISR to run as the handler for the interrupt and update the encoder count
 def encoder_isr(pin):
-    global delta, a_prev
-    a = en_A.value()
-    if a != a_prev:
-        delta += 1
+    global encoder_count, quad_state, edge_index
+    state = (en_A.value() << 1) | en_B.value()
+    step = quad_table[(quad_state << 2) | state]
+    quad_state = state
+    if step:
+        encoder_count += step
+        i = edge_index
+        edge_times[i] = ticks_us()
+        edge_counts[i] = encoder_count
+        edge_index = (i + 1) & EDGE_MASK
+
+# Returns the encoder count. Interrupts are held off for the read so the main loop never sees a half-updated value.
+def encoder_read():
+    irq_state = disable_irq()
+    count = encoder_count
+    enable_irq(irq_state)
+    return count
+
+# Overwrites the encoder count, e.g. after re-zeroing the piston
+def encoder_set(count):
+    global encoder_count, quad_state
+    irq_state = disable_irq()
+    encoder_count = count
+    quad_state = (en_A.value() << 1) | en_B.value()
+    enable_irq(irq_state)
+    encoder_history_reset()
+
+# Fills the edge history with the current count at the current time, so velocities don't span a jump in the count or
+# edges from an earlier move
+def encoder_history_reset():
+    irq_state = disable_irq()
+    now = ticks_us()
+    for i in range(EDGE_HISTORY):
+        edge_times[i] = now
+        edge_counts[i] = encoder_count
+    enable_irq(irq_state)
+
+# Piston speed in counts/s, positive extending, over the last `edges` edges (1 for the instantaneous speed). If the
+# piston has gone longer than that since its last edge, the wait counts too, so a piston that stops reads as
+# slowing down to 0 rather than holding its last speed.
+def encoder_velocity(edges=EDGE_WINDOW):
+    irq_state = disable_irq()
+    last = (edge_index - 1) & EDGE_MASK
+    first = (edge_index - 1 - edges) & EDGE_MASK
+    t_last = edge_times[last]
+    t_first = edge_times[first]
+    counts = edge_counts[last] - edge_counts[first]
+    enable_irq(irq_state)
+    span = ticks_diff(t_last, t_first)
+    idle = ticks_diff(ticks_us(), t_last)
+    if idle > span:
+        span = idle
+    if span <= 0:
+        return 0
+    return counts * 1000000 // span
+
+# Initializing interrupts to watch both edges of both encoder outputs
+en_A.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=encoder_isr, hard=True)
+en_B.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=encoder_isr, hard=True)
 
-# Initializing interrupt to watch the encoder outputs
-en_A.irq(trigger=Pin.IRQ_RISING, handler=encoder_isr)
+# Limit switch
+#
+# The switch opens as the piston reaches full extension, and the falling edge fires limit_isr. The ISR stops the
+# motor itself, so the piston stops within microseconds of reaching the switch rather than on the next control tick,
+# and no loop has to poll the switch. The switch is also a fixed reference point: the ISR sets the encoder count to
+# PISTON_LIMIT_POS, and the correction it made is kept in limit_drift as a check on the encoder.
+#
+# Edges while the motor is retracting are contact bounce as the switch closes again, and are ignored.
+PISTON_LIMIT_POS = 12000 #------------- Encoder count at which the piston opens the limit switch
+
+limit_hit = False #-------------------- Set by limit_isr, cleared when a move starts or the piston is driven in
+limit_events = 0 #--------------------- Times the switch has stopped the piston since boot
+limit_tick_us = 0 #-------------------- ticks_us of the last one
+limit_drift = 0 #---------------------- Encoder count minus PISTON_LIMIT_POS just before the last re-zero
+
+# Runs as a hard interrupt: no allocation, only the motor, the encoder count and a few integers
+def limit_isr(pin):
+    global piston_drive_duty, encoder_count, quad_state, limit_hit, limit_events, limit_tick_us, limit_drift
+    if piston_drive_duty < 0:
+        return
+    motor1_pwm.duty_u16(0)
+    motor2_pwm.duty_u16(0)
+    piston_drive_duty = 0
+    limit_tick_us = ticks_us()
+    limit_drift = encoder_count - PISTON_LIMIT_POS
+    encoder_count = PISTON_LIMIT_POS
+    quad_state = (en_A.value() << 1) | en_B.value()
+    limit_events += 1
+    limit_hit = True
+
+lim_sw_state.irq(trigger=Pin.IRQ_FALLING, handler=limit_isr, hard=True)
+boot_stage("encoder")
+
+# Piston motion engine
+#
+# piston_move() only plans a move and returns a piston_motion handle straight away. The actual control runs in
+# piston_tick(), which piston_timer calls every PISTON_TICK_MS: it reads the encoder, drives the motor towards
+# the target, and stops the motor once the count is within PISTON_DEADBAND of the target, the motor current shows
+# a stall (see motor_monitor.py), or the move has run longer than its timeout. The CPU is free for sensor sampling
+# and WebREPL in between ticks.
+#
+# Each move follows a trapezoidal speed profile planned over encoder counts:
+#
+#   duty
+#    ^      ________________  cruise
+#    |     /                \
+#    |    /                  \
+#    |___/                    \___ PISTON_MIN_DUTY
+#    +---|---|------------|---|---> position
+#      start  ramp        ramp  target
+#
+# The duty climbs from PISTON_MIN_DUTY to the cruise duty over the first ramp_counts and falls back over the last
+# ramp_counts, so the piston never hits the target (or an end stop) at full speed. Short moves get a triangular
+# profile with each ramp covering half the distance.
+#
+# Move status codes (piston_motion.status)
+MOVE_RUNNING = 0
+MOVE_DONE = 1
+MOVE_TIMEOUT = 2
+MOVE_CANCELLED = 3
+MOVE_STALLED = 4 #--------------------- The motor current showed a stall (jam or end stop) and the motor was cut
+MOVE_LIMIT = 5 #----------------------- The piston reached the limit switch at full extension before the target
+
+MOVE_STATUS_NAMES = ("running", "done", "timeout", "cancelled", "stalled", "limit")
+
+PISTON_TICK_MS = 10 #------------------ Control loop period
+PISTON_DEADBAND = 8 #------------------ Counts either side of the target that count as "arrived"
+PISTON_TIMEOUT_MS = 90000 #------------ Default move timeout, longer than a full stroke
+
+piston_timer = Timer(0)
+
+# The move currently being driven by piston_tick(), or None when the piston is idle
+active_move = None
 
 target_pos = position
 
-def piston_move(method, input):
-    
-    input *= 2000000000
-    
-    global target_pos, position, delta
+class piston_motion:
+    def __init__(self, start, target, cruise_duty, timeout_ms):
+        self.start_pos = start
+        self.target = target
+        self.cruise_duty = cruise_duty
+        self.ramp_counts = min(PISTON_RAMP_COUNTS, abs(target - start) // 2)
+        self.timeout_ms = timeout_ms
+        self.start = ticks_ms()
+        self.status = MOVE_RUNNING
+        self.end_pos = None #----------------- Filled in when the move finishes, along with the rest below
+        self.duration_ms = 0
+        self.peak_ma = 0 #-------------------- Motor current over the move
+        self.mean_ma = 0
+        self.peak_cps = 0 #------------------- Piston speed over the move, in counts/s
+        self.mean_cps = 0
+        self.speed_pct = 0 #------------------ Mean speed as a percentage of what the duty should give
+        self.slow_ms = 0 #-------------------- Time the piston spent flagged slow (see motion_health.py)
+
+    def done(self):
+        return self.status != MOVE_RUNNING
+
+    # Blocks until the move finishes and returns its status code
+    def wait(self):
+        while self.status == MOVE_RUNNING:
+            sleep_ms(PISTON_TICK_MS)
+        return self.status
+
+    # uasyncio version of wait(), use as "await move.wait_async()"
+    async def wait_async(self):
+        import uasyncio
+        while self.status == MOVE_RUNNING:
+            await uasyncio.sleep_ms(PISTON_TICK_MS)
+        return self.status
+
+    def cancel(self):
+        if self is active_move:
+            piston_finish(MOVE_CANCELLED)
+
+    # Duty for the current position along the trapezoidal profile
+    def profile_duty(self, pos, remaining):
+        duty = self.cruise_duty
+        ramp = self.ramp_counts
+        if ramp > 0:
+            span = self.cruise_duty - PISTON_MIN_DUTY
+            travelled = abs(pos - self.start_pos)
+            if travelled < ramp:
+                duty = PISTON_MIN_DUTY + span * travelled // ramp
+            if remaining < ramp:
+                duty = min(duty, PISTON_MIN_DUTY + span * remaining // ramp)
+        return max(duty, PISTON_MIN_DUTY)
+
+# Stops the motor and the control timer, then records the final position and a summary of the active move.
+# Called both from piston_tick and from the main thread (cancel, piston_move), so the move is taken and active_move
+# cleared with interrupts off before anything else: a tick already scheduled then finds no move and can't drive the
+# motor again after it's been stopped, and no move is finished (and logged) twice.
+def piston_finish(status):
+    global active_move, position
+    irq_state = disable_irq()
+    move = active_move
+    active_move = None
+    enable_irq(irq_state)
+    if move is None:
+        return
+    piston_stop()
+    piston_timer.deinit()
+    position = encoder_read()
+    move.end_pos = position
+    move.duration_ms = ticks_diff(ticks_ms(), move.start)
+    move.peak_ma = piston_current.peak_ma()
+    move.mean_ma = piston_current.mean_ma()
+    move.peak_cps = piston_health.peak
+    if move.duration_ms:
+        move.mean_cps = abs(position - move.start_pos) * 1000 // move.duration_ms
+    move.speed_pct = piston_health.speed_pct()
+    move.slow_ms = piston_health.slow_ms
+    move.status = status
+    save_position()
+    move_log_save(move)
+    if move.slow_ms:
+        print("WARNING: piston ran slow for", move.slow_ms, "ms, at", move.speed_pct, "% of the expected speed")
+
+# Control loop, called by piston_timer
+def piston_tick(timer):
+    move = active_move
+    if move is None:
+        return
+    if piston_drive_duty:
+        piston_health.update(encoder_velocity(), piston_drive_duty, PISTON_TICK_MS)
+    pos = encoder_read()
+    error = move.target - pos
+    if -PISTON_DEADBAND <= error <= PISTON_DEADBAND:
+        piston_finish(MOVE_DONE)
+    elif limit_hit or (error > 0 and not lim_sw_state.value()):
+        # At full extension, the piston can't go any further out. limit_isr has already stopped the motor.
+        piston_finish(MOVE_LIMIT)
+    elif piston_drive_duty and piston_current.sample():
+        piston_finish(MOVE_STALLED)
+        print("WARNING: piston motor stalled at position", position, "target", move.target,
+              "current", piston_current.current_ma(), "mA")
+    elif ticks_diff(ticks_ms(), move.start) > move.timeout_ms:
+        piston_finish(MOVE_TIMEOUT)
+        print("WARNING: piston move timed out at position", position, "target", move.target)
+    elif error > 0:
+        piston_out(move.profile_duty(pos, error))
+    else:
+        piston_in(move.profile_duty(pos, -error))
+
+def piston_move(method, input, duty=PISTON_CRUISE_DUTY, timeout_ms=PISTON_TIMEOUT_MS, verbose=True):
     
-    print("Starting Position:", position)
+    global target_pos, active_move, limit_hit
     
     if method in ("rel","relative"):
         
-        method_check = True
-        target_pos = position + input
-        method = "rel"
+        target_pos = encoder_read() + int(input)
         
     elif method in ("abs","absolute"):
         
-        method_check = True
-        target_pos = input
-        method = "abs"
+        target_pos = int(input)
         
     else:
         
-        method_check = False
         print("Error: first argument in piston_move()")
         print("|")
         print("'--> Please enter a valid argument for the 'method' parameter.")
         print("     'method' accepts the following arguments: 'rel' or 'relative', and 'abs' or 'absolute'")
+        return None
     
-    if method_check == True and method == "rel":
-        
-        if input < 0:
-            
-            delta = 0
-            
-            piston_in()
-            
-            while position > target_pos:
-                
-                position -= delta
-
-            piston_stop()
-            
-            save_position()
-        
-        else:
-            
-            delta = 0
-            
-            piston_out()
-            
-            while position + delta < target_pos:
-                
-                position += delta
-
-            piston_stop()
-            
-            save_position()
+    # A new move replaces whatever move is still running
+    if active_move is not None:
+        piston_finish(MOVE_CANCELLED)
     
-    elif method_check == True and method == "abs":
-        
-        if position < target_pos:
-            
-            delta = 0
-            
-            piston_out()
-            
-            while position < target_pos:
-                
-                position += delta
-                
-            piston_stop()
-            
-            save_position()
-        
-        else:
-            
-            delta = 0
-            
-            piston_in()
-            
-            while position > target_pos:
-                
-                position -= delta
-                
-            piston_stop()
-            
-            save_position()
+    if verbose:
+        print("Starting Position:", encoder_read(), "Target Position:", target_pos)
+    
+    # Kept in a local: a move that's already in the deadband finishes on the first tick, which clears active_move
+    move = piston_motion(encoder_read(), target_pos, duty, timeout_ms)
+    active_move = move
+    limit_hit = False
+    piston_current.start()
+    piston_health.start()
+    encoder_history_reset()
+    piston_tick(None)
+    if not move.done():
+        piston_timer.init(mode=Timer.PERIODIC, period=PISTON_TICK_MS, callback=piston_tick)
     
-    print("New Position:", position)
+    return move
+
+#================================================================================================================================================
+#                                                           piston_home
+
+# Re-references the encoder: drives the piston out slowly, for up to a full stroke past wherever the count says it
+# is, until it opens the limit switch, which sets the count to PISTON_LIMIT_POS. Returns True if the switch was reached.
+def piston_home(duty=PISTON_MIN_DUTY):
+    status = piston_move("rel", PISTON_LIMIT_POS, duty).wait()
+    if status != MOVE_LIMIT:
+        print("WARNING: homing ended without reaching the limit switch:", MOVE_STATUS_NAMES[status])
+        return False
+    print("Homed at", PISTON_LIMIT_POS, "- encoder was off by", limit_drift, "counts")
+    return True
+
+#================================================================================================================================================
+#                                                              move_log
+
+# One line per finished piston move: when it started (ticks_ms), start, target and end position, status, how long it
+# took, the motor current, and the piston speed: mean and peak, mean as a percentage of the expected speed, and the
+# time flagged slow. The file is moved to moves.old once it passes MOVE_LOG_MAX bytes.
+MOVE_LOG_FILE = "moves.txt"
+MOVE_LOG_MAX = 8192
+
+def move_log_save(move):
+    import os
+    line = "t %d start %d target %d end %d %s %d ms peak %d mA mean %d mA speed %d cps peak %d cps %d%% slow %d ms\n" % (
+        move.start, move.start_pos, move.target, move.end_pos, MOVE_STATUS_NAMES[move.status], move.duration_ms,
+        move.peak_ma, move.mean_ma, move.mean_cps, move.peak_cps, move.speed_pct, move.slow_ms)
+    try:
+        if os.stat(MOVE_LOG_FILE)[6] > MOVE_LOG_MAX:
+            os.rename(MOVE_LOG_FILE, "moves.old")
+    except OSError:
+        pass
+    try:
+        with open(MOVE_LOG_FILE, "a") as f:
+            f.write(line)
+    except OSError:
+        pass
+
+#================================================================================================================================================
+#                                                              log_sample
+
+# The dive logger (see dive_log.py). Samples go into a RAM ring buffer and reach dive.log a whole 4 KB block at a time.
+# dive.log is rotated to dive.old past dive_log.DIVE_LOG_MAX.
+dive_logger = dive_log.DiveLogger("dive.log", old_path="dive.old")
+boot_stage("logger")
+
+# Logs the sensor's last reading along with the piston state and the oversampling it was taken at.
+# Call it right after a successful sensor read. tick is when the sample was taken, in ticks_ms (default: now).
+def log_sample(sensor, tick=None):
+    d1, d2 = sensor.raw()
+    osr = sensor.osr()
+    flags = dive_log.FLAG_MOVING if piston_drive_duty else 0
+    if tick is None:
+        tick = ticks_ms()
+    dive_logger.log(tick, d1, d2, encoder_read(), piston_drive_duty, osr, flags)
+
+# Starts a log section with the sensor's calibration, so the raw samples after it can be compensated on the ground.
+# Call it once the sensor has been initialized, before the first log_sample().
+def log_begin(sensor):
+    dive_logger.log_calibration(sensor._model, sensor._C)
+
+#================================================================================================================================================
+#                                                              log_download
+
+# Writes out everything the logger holds, then serves the logs to the host until it has been idle for idle_s
+# seconds. On the host: python -m nanolog pull 192.168.4.1
+def log_download(idle_s=120):
+    import log_server
+    dive_logger.flush()
+    server = log_server.LogServer(files=("dive.log", "dive.old", SAMPLING_STATS_FILE, MOVE_LOG_FILE))
+    completed = server.serve(idle_s)
+    if server.bytes_sent:
+        print("Sent", server.bytes_raw, "bytes of log as", server.bytes_sent, "bytes in", completed, "complete transfer(s)")
+    return completed
 
 #================================================================================================================================================
 #                                                              dive
 
-def dive(sleep_time):
-#    
-#    piston_in(58)
-#    sleep(sleep_time)
-#    piston_out()
-#    sleep(sleep_time)
-    pass
+# Piston positions, in encoder counts from the retracted end, and dive timing
+DIVE_SINK_POS = 0 #-------------------- Piston fully in: the float sinks
+DIVE_RISE_POS = 12000 #---------------- Piston fully out: the float rises
+MISSION_LIGHTSLEEP_S = 10 #------------ Waits shorter than this use lightsleep; a deepsleep wake costs a full boot
+
+# Default dive timing and depth, for the functions below that take them as arguments. They come from the mission
+# defaults in config_store, which v0.0.1 shares through the same config.bin. deploy() uses the values in config.
+from config_store import MISSION_DEFAULTS
+DIVE_BOTTOM_S = MISSION_DEFAULTS["dive_bottom_s"]
+DIVE_SURFACE_S = MISSION_DEFAULTS["dive_surface_s"]
+DIVE_DEPTH_M = MISSION_DEFAULTS["dive_depth_m"]
+DIVE_TOLERANCE_M = MISSION_DEFAULTS["dive_tolerance_m"]
+
+# Depth hold settings
+DEPTH_HOLD_PERIOD_MS = 1000 #---------- Control period: one pressure reading and piston update per period
+DEPTH_FAST_PERIOD_MS = 250 #----------- Control period while the depth changes fast enough for a lower OSR
+DEPTH_HOLD_TIMEOUT_S = MISSION_DEFAULTS["depth_hold_timeout_s"]
+DEPTH_NEUTRAL_POS = 6000 #------------- First guess at the neutrally buoyant piston position, refined by the controller
+DEPTH_OSR = ms5837.OSR_ADAPTIVE #------ Pressure sensor oversampling used while holding depth, see depth_hold()
+
+# The mission. On a deepsleep wake it's read back from RTC memory at the end of boot.py.
+mission = mission_state.MissionState()
+
+# Pressure sensor used for depth, set up on first use by sensor_start()
+pressure_sensor = None
+
+def sensor_start():
+    global pressure_sensor
+    if pressure_sensor is None:
+        sensor = ms5837.MS5837(ms5837.MODEL_30BA, i2c_start())
+        if not sensor.init():
+            raise OSError("pressure sensor init failed")
+        pressure_sensor = sensor
+        log_begin(sensor)
+    return pressure_sensor
+
+# Sampling statistics of every depth hold are appended here as text, one line per hold, to read at the surface
+SAMPLING_STATS_FILE = "sampling.txt"
+
+# Sampler behind the current (or last) depth hold, for sampling_stats()
+depth_sampler = None
+
+# Holds the float at `depth` metres until it has spent hold_s seconds within `tolerance` of it. The sampler takes a
+# pressure sample every DEPTH_HOLD_PERIOD_MS on a Timer, and each one steers the piston through
+# depth_control.DepthHold and goes to the dive log. Returns True once the hold is done, or False if it timed out.
+#
+# While the float is sinking or rising fast (fast enough that the sensor's adaptive OSR drops below OSR_8192), the
+# period is cut to DEPTH_FAST_PERIOD_MS so the controller sees the depth sooner, and the lower OSR keeps the
+# conversions short. The controller's rate term is scaled by the actual time between samples (dt_us), so it stays
+# in m/s whatever the period. Near the commanded depth the rate drops and the hold goes back to DEPTH_HOLD_PERIOD_MS
+# at OSR_8192, where the noise matters most.
+def depth_hold(depth, hold_s, tolerance=DIVE_TOLERANCE_M, timeout_s=DEPTH_HOLD_TIMEOUT_S):
+    global depth_sampler
+    import depth_control, sampler
+    sensor = sensor_start()
+    hold = depth_control.DepthHold(depth, tolerance, DEPTH_NEUTRAL_POS, DIVE_SINK_POS, DIVE_RISE_POS)
+    depth_sampler = sampler.Sampler(sensor, DEPTH_HOLD_PERIOD_MS, DEPTH_OSR)
+    start = ticks_ms()
+    last = None
+    held_us = 0
+    done = False
+    depth_sampler.start()
+    try:
+        while held_us < hold_s * 1000000:
+            if ticks_diff(ticks_ms(), start) > timeout_s * 1000:
+                print("WARNING: depth hold at", depth, "m timed out after", timeout_s, "s")
+                break
+            if not depth_sampler.poll():
+                if dive_logger.pending():
+                    # Time to spare until the next sample: write out full log blocks here rather than from log_sample()
+                    dive_logger.flush_full()
+                    continue
+                # Nothing new yet: sleep until the conversion is done, or briefly while waiting for the next tick
+                sleep_ms(max(1, depth_sampler.remaining_us() // 1000) if depth_sampler.remaining_us() else 10)
+                continue
+            stamp = depth_sampler.stamp_us
+            log_sample(sensor, depth_sampler.stamp_ms)
+            reading = sensor.depth()
+            dt_us = ticks_diff(stamp, last) if last is not None else 0
+            last = stamp
+            if hold.holding(reading):
+                held_us += dt_us
+            target = hold.update(reading, dt_us / 1000000, encoder_read())
+            fast = sensor.adaptive_osr() != ms5837.OSR_8192
+            depth_sampler.set_period(DEPTH_FAST_PERIOD_MS if fast else DEPTH_HOLD_PERIOD_MS)
+            if target != target_pos or (active_move is None and abs(encoder_read() - target) > PISTON_DEADBAND):
+                piston_move("abs", target, verbose=False)
+        else:
+            done = True
+    finally:
+        depth_sampler.stop()
+        sampling_save(depth, depth_sampler.stats())
+    return done
+
+def sampling_save(depth, stats):
+    try:
+        with open(SAMPLING_STATS_FILE, "a") as f:
+            f.write("hold %.2f m: %d samples, %d skipped, %d late, jitter mean %.0f us std %.0f us min %d us max %d us\n" % (
+                depth, stats["samples"], stats["skipped"], stats["late"], stats["jitter_mean_us"],
+                stats["jitter_std_us"], stats["jitter_min_us"], stats["jitter_max_us"]))
+    except OSError:
+        print("Could not save sampling statistics")
+
+# Prints the sampling statistics of the running (or last) depth hold in this boot, and of every hold on file
+def sampling_stats():
+    if depth_sampler is not None:
+        print("Current:", depth_sampler.stats())
+    try:
+        with open(SAMPLING_STATS_FILE) as f:
+            for line in f:
+                print(line, end="")
+    except OSError:
+        print("No sampling statistics on file")
+
+# Runs the current phase of the mission and moves on to the next one.
+# Returns the number of seconds to sleep before the phase after that.
+def dive_step():
+    if mission.phase == mission_state.PHASE_SINK:
+        mission.phase = mission_state.PHASE_BOTTOM
+        if mission.depth_cm:
+            # The depth hold drives the descent itself
+            return 0
+        piston_move("abs", DIVE_SINK_POS).wait()
+        return mission.bottom_s
+
+    if mission.phase == mission_state.PHASE_BOTTOM:
+        if mission.depth_cm:
+            depth_hold(mission.depth_cm / 100, mission.bottom_s, mission.tolerance_cm / 100, config["depth_hold_timeout_s"])
+        mission.phase = mission_state.PHASE_RISE
+        return 0
+
+    if mission.phase == mission_state.PHASE_RISE:
+        piston_move("abs", DIVE_RISE_POS).wait()
+        if mission.dive + 1 >= mission.dives:
+            # Last dive: finish at the surface straight away, with the radio up for the download
+            mission.dive += 1
+            mission.phase = mission_state.PHASE_DONE
+            return 0
+        mission.phase = mission_state.PHASE_SURFACE
+        return mission.surface_s
+
+    if mission.phase == mission_state.PHASE_SURFACE:
+        mission.dive += 1
+        mission.phase = mission_state.PHASE_SINK if mission.dive < mission.dives else mission_state.PHASE_DONE
+        return 0
+
+    return 0
+
+# Sleeps until the mission's next wake time. Short waits lightsleep and return. Long ones save everything and
+# deepsleep, which doesn't return: the float boots again and boot.py calls mission_run() to carry on.
+def mission_sleep():
+    remaining = mission.next_wake - int(time())
+    if remaining <= 0:
+        return
+    if remaining < MISSION_LIGHTSLEEP_S:
+        lightsleep(remaining * 1000)
+        return
+    piston_stop()
+    save_position()
+    dive_logger.flush()
+    deepsleep(remaining * 1000)
+
+# Runs the mission from wherever it's up to until every dive is done
+def mission_run():
+    while mission.active():
+        # A wake can come early (e.g. a reset during lightsleep): go back to sleep for the rest
+        mission_sleep()
+        wait_s = dive_step()
+        mission.position = position
+        mission.next_wake = int(time()) + wait_s
+        mission.save()
+        print("Mission:", mission)
+        mission_sleep()
+    mission.erase()
+
+# Starts a mission of `dives` dives and runs it. Each dive holds `depth` metres for bottom_s seconds, or with depth 0
+# just sinks with the piston fully in and sleeps. The first deepsleep ends this call; the rest of the mission runs
+# from boot.py on each wake.
+def mission_start(dives, bottom_s=DIVE_BOTTOM_S, surface_s=DIVE_SURFACE_S, depth=DIVE_DEPTH_M, tolerance=DIVE_TOLERANCE_M):
+    mission.start(dives, bottom_s, surface_s, int(depth * 100), int(tolerance * 100))
+    mission.next_wake = int(time())
+    mission.save()
+    mission_run()
+
+# Stops the mission after the current phase: the float stays awake and doesn't resume on the next wake
+def mission_stop():
+    mission.erase()
+
+# A single dive, holding DIVE_DEPTH_M for sleep_time seconds
+def dive(sleep_time, depth=DIVE_DEPTH_M):
+    mission_start(1, sleep_time, sleep_time, depth)
+
+#================================================================================================================================================
+#                                                              config
+
+# Settings kept in config.bin (see config_store.py), read once here at boot. config["key"] is a dict lookup.
+# config_set() changes a setting and saves it straight away. Mission settings apply to the next deploy() with no
+# reboot, and network settings apply from the next boot.
+# config_store is shared between NanOS versions in NanOS/lib, which goes to the board's /lib
+import config_store
+
+CONFIG_DEFAULTS = {
+    "network_name": "NF1.1-01", #------------------ SSID of the float's own access point
+    "router_ssid": "", #--------------------------- Router to join in station mode, "" to always start the access point
+    "router_password": "",
+    "webrepl_password": "", #---------------------- "" for webrepl_cfg.PASS
+}
+CONFIG_DEFAULTS.update(MISSION_DEFAULTS) #--------- Mission parameters used by deploy()
+
+config = config_store.ConfigStore(CONFIG_DEFAULTS)
+
+# Before config.bin exists, the network settings come from wlan_cfg.py and webrepl_cfg.py, so an upgraded float
+# keeps its network name and passwords. After that those files are never imported again.
+def config_seed():
+    try:
+        import wlan_cfg
+        for key in ("network_name", "router_ssid", "router_password"):
+            if hasattr(wlan_cfg, key):
+                config.set(key, getattr(wlan_cfg, key))
+    except ImportError:
+        pass
+    try:
+        import webrepl_cfg
+        config.set("webrepl_password", webrepl_cfg.PASS)
+    except (ImportError, AttributeError):
+        pass
+    config.dirty = True
+    try:
+        config.save()
+    except OSError:
+        print("Could not save config")
+
+def config_show():
+    for key in config.keys():
+        print("%-22s %r" % (key, config[key]))
+
+# Changes a setting and saves it, e.g. config_set("dive_depth_m", 3)
+def config_set(key, value):
+    try:
+        value = config.set(key, value)
+    except KeyError:
+        print("No setting called", key)
+        return
+    except ValueError as e:
+        print("Invalid value for", key, "-", e)
+        return
+    config.save()
+    print(key, "=", repr(value))
+
+if not config.load():
+    config_seed()
+boot_stage("config")
 
 #================================================================================================================================================
 #                                                              deploy
@@ -277,7 +936,8 @@ def deploy():
     print("-------")
     print("INITIATING DEPLOYMENT")
     print("Type 'confirm' to start the first dive. Any other input will cancel the deployment.")
-    print("At any point that the NanoFloat is surfaced and wirelessly connected, pass the 'stop' command to prevent further automatic dives.")
+    print("The radio stays off for the whole mission. It ends on its own after", config["dives"], "dive(s), at the surface with the radio up.")
+    print("To end it early, recover the NanoFloat and press reset or power-cycle it: only a deepsleep wake resumes a mission.")
     print("-------")
     
     conf_dive = input()
@@ -290,14 +950,15 @@ def deploy():
     print("Prepare to reconnect to the network upon dive completion.")
     print("-------")
 
-    for n in range(6):
-        try:
-            dive(60) # CHANGE SLEEP TIME ACCORDINGLY
-            
-        except:
-            print('Failed to dive. Entering Recovery mode.')
-            piston_out()
-            sys.exit()
+    try:
+        mission_start(config["dives"], config["dive_bottom_s"], config["dive_surface_s"],
+                      config["dive_depth_m"], config["dive_tolerance_m"])
+    
+    except Exception as e:
+        print('Failed to dive. Entering Recovery mode.', e)
+        mission_stop()
+        piston_out()
+        sys.exit()
             
 #================================================================================================================================================
 #                                                              encoder_test
@@ -307,7 +968,7 @@ def encoder_test(repetitions):
     for n in range(repetitions):
         
         print("Encoder A:", en_A.value(), "Encoder B:", en_B.value())
-        print(delta)
+        print(encoder_read())
         
         sleep(0.1)
 
@@ -315,8 +976,7 @@ def encoder_test(repetitions):
 #                                                              motor_test
 def motor_test():
     
-    motor1.value(0)
-    motor2.value(0)
+    piston_stop()
     
     print("-------")
     print("Beginning Motor Test. Input either 1, -1, or 0 to run the motor forwards, backwards, or stop, respectively.")
@@ -328,8 +988,7 @@ def motor_test():
         direction = input()
         
         if direction == "end":
-            motor1.value(0)
-            motor2.value(0)
+            piston_stop()
             print("Motor Test Concluded")
             break
     
@@ -337,18 +996,15 @@ def motor_test():
             print("ERROR: Input either 1, -1, or 0 to run the motor forwards, backwards, or stop, respectively.")
     
         elif direction == "1":
-            motor1.value(1)
-            motor2.value(0)
+            piston_out()
             print("Running Motor Forwards...")
         
         elif direction == "-1":
-            motor1.value(0)
-            motor2.value(1)
+            piston_in()
             print("Running Motor Backwards...")
         
         elif direction == "0":
-            motor1.value(0)
-            motor2.value(0)
+            piston_stop()
             print("Stopping Motor...")    
 
 #================================================================================================================================================
@@ -364,7 +1020,7 @@ def sensor_test():
     
     
     
-    pressure_sensor = ms5837.MS5837(ms5837.MODEL_30BA, 0)
+    pressure_sensor = ms5837.MS5837(ms5837.MODEL_30BA, i2c_start())
 
     pressure_sensor.init()
 
@@ -406,3 +1062,62 @@ def sensor_test():
 
     else:
         print("Sensor connection failed.")
+
+#================================================================================================================================================
+#                                                              boot_report
+
+# The last few boots' reports are kept here, one line each; the file is moved to boot.old once it passes
+# BOOT_REPORT_MAX bytes
+BOOT_REPORT_FILE = "boot.txt"
+BOOT_REPORT_MAX = 4096
+
+# Prints how long each stage of this boot took
+def boot_report():
+    total = 0
+    for name, ms in boot_stages:
+        total += ms
+        print("%-10s %6d ms" % (name, ms))
+    print("%-10s %6d ms" % ("total", total))
+
+def boot_report_save():
+    import os
+    line = "reset %d:" % reset_cause()
+    total = 0
+    for name, ms in boot_stages:
+        total += ms
+        line += " %s %d" % (name, ms)
+    line += " total %d ms\n" % total
+    try:
+        if os.stat(BOOT_REPORT_FILE)[6] > BOOT_REPORT_MAX:
+            os.rename(BOOT_REPORT_FILE, "boot.old")
+    except OSError:
+        pass
+    try:
+        with open(BOOT_REPORT_FILE, "a") as f:
+            f.write(line)
+    except OSError:
+        print("Could not save boot report")
+
+#================================================================================================================================================
+#                                                              startup
+
+# On a deepsleep wake in the middle of a mission, carry on with it straight away and leave the radio off.
+# Otherwise (a cold boot, or the mission just finished) bring up the radio and WebREPL.
+# The boot report is saved just before control starts, so on a mission wake its total is the wake-to-control latency.
+resuming = reset_cause() == DEEPSLEEP_RESET and mission.load() and mission.active()
+boot_stage("mission")
+
+if resuming:
+    boot_report_save()
+    print("Resuming", mission)
+    try:
+        mission_run()
+    except Exception as e:
+        print('Failed to dive. Entering Recovery mode.', e)
+        mission_stop()
+        piston_out()
+
+radio_start()
+boot_stage("radio")
+if not resuming:
+    boot_report_save()
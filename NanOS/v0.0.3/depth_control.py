@@ -0,0 +1,74 @@
+#================================================================================================================================================
+#                                                              depth_control
+
+# Closed-loop depth hold: MS5837 depth in, piston target position (encoder counts) out.
+#
+# The float's vertical speed is roughly proportional to how far the piston is from its neutral-buoyancy position,
+# so depth is the integral of the piston command. The controller is:
+#
+#   target = neutral + kp * error + kd * rate
+#
+# where error is depth minus the commanded depth (positive when too deep, which calls for more piston out), rate is
+# the filtered vertical speed (positive going down), and neutral is the integral term: it is learnt with ki while
+# the float is near the commanded depth, and ends up at the piston position that makes the float neutral.
+#
+# To keep the piston from hunting:
+#   - the integral only runs within integral_band of the commanded depth, and is frozen while the output is pinned
+#     at either end of the stroke (anti-windup), and is itself kept inside the stroke
+#   - the target moves by at most max_rate counts per second (rate limit), so one noisy reading can't swing it
+#   - new targets closer than min_step counts to the current one are ignored, so the motor only runs when it matters
+
+class DepthHold(object):
+
+    def __init__(self, depth, tolerance=0.25, neutral=6000, min_pos=0, max_pos=12000,
+                 kp=2500.0, ki=40.0, kd=12000.0, max_rate=600, min_step=60, integral_band=1.0):
+        self.depth = depth #------------------ Commanded depth in m
+        self.tolerance = tolerance #---------- Depth error, in m, that counts as holding
+        self.neutral = float(neutral) #------- Integral term: estimated neutral-buoyancy piston position
+        self.min_pos = min_pos
+        self.max_pos = max_pos
+        self.kp = kp #------------------------ Counts per m of depth error
+        self.ki = ki #------------------------ Counts per m of depth error per second
+        self.kd = kd #------------------------ Counts per m/s of vertical speed
+        self.max_rate = max_rate #------------ Fastest the target may move, in counts per second
+        self.min_step = min_step #------------ Smallest target change worth moving the piston for
+        self.integral_band = integral_band #-- Depth error, in m, within which the integral runs
+        self.target = None #------------------ Current piston target, None until the first update
+        self.rate = 0.0 #--------------------- Filtered vertical speed in m/s, positive going down
+        self._last_depth = None
+
+    # True when the last reading was within tolerance of the commanded depth
+    def holding(self, depth):
+        return abs(depth - self.depth) <= self.tolerance
+
+    # Takes a depth reading, the seconds since the previous one and the piston's position (the starting target).
+    # Returns the piston target, in counts.
+    def update(self, depth, dt, position):
+        if self.target is None:
+            self.target = position
+        if self._last_depth is not None and dt > 0:
+            # Exponential filter: the depth readings are noisy and the differences between them more so
+            self.rate += 0.5 * ((depth - self._last_depth) / dt - self.rate)
+        self._last_depth = depth
+
+        error = depth - self.depth
+        output = self.neutral + self.kp * error + self.kd * self.rate
+
+        # Anti-windup: integrate only near the commanded depth, and not while the output can't do any more
+        saturated = (output >= self.max_pos and error > 0) or (output <= self.min_pos and error < 0)
+        if abs(error) <= self.integral_band and not saturated:
+            self.neutral += self.ki * error * dt
+            self.neutral = min(max(self.neutral, self.min_pos), self.max_pos)
+
+        output = min(max(output, self.min_pos), self.max_pos)
+
+        # Rate limit
+        step = self.max_rate * dt
+        if output > self.target + step:
+            output = self.target + step
+        elif output < self.target - step:
+            output = self.target - step
+
+        if abs(output - self.target) >= self.min_step:
+            self.target = int(output)
+        return self.target
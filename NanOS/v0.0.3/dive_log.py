@@ -0,0 +1,168 @@
+#================================================================================================================================================
+#                                                              dive_log
+
+# Binary dive logger.
+#
+# Samples are packed with struct into a RAM ring buffer that is allocated once, up front. The ring is split into
+# BLOCK_SIZE blocks, and flash only ever sees whole blocks: a block is written out once it is full (by
+# flush_full(), which depth_hold() in boot.py calls between samples) or when the float surfaces (flush(), which also
+# writes the partly filled block). The log file is a sequence of BLOCK_SIZE blocks, so every block starts on an
+# aligned offset and a reader can seek straight to block n. A reset in the middle of a write leaves a torn block at
+# the end of the file; the next DiveLogger pads it out to BLOCK_SIZE, so the blocks after it stay aligned, and its
+# CRC fails so readers skip it.
+#
+# The file is capped at about max_bytes: once it's past that, the next log_calibration() renames it to old_path
+# (replacing the previous one) and starts a new file, which begins with its own calibration block.
+#
+# Block layout:
+#
+#   offset  size  field
+#   0       4     magic, b"NFLB"
+#   4       4     block sequence number (uint32)
+#   8       2     number of records in the block (uint16)
+#   10      1     block kind, KIND_SAMPLES or KIND_CALIBRATION
+#   11      1     record size in bytes
+#   12      4     CRC32 of the records (count * record size bytes from offset 16)
+#   16      ...   records, then 0xFF padding up to BLOCK_SIZE
+#
+# Sample record (SAMPLE_FORMAT, 20 bytes):
+#
+#   tick (uint32, ticks_ms), D1 (uint32), D2 (uint32), piston count (int32),
+#   motor duty / 2 (int16, signed, positive extending), OSR (uint8), flags (uint8)
+#
+# The raw D1/D2 readings are logged instead of compensated values: that's cheaper on the float, and the log can be
+# reprocessed on the ground. A calibration block (CALIBRATION_FORMAT: model, then the 7 PROM words) is written at the
+# start of every log so the file can be decoded on its own.
+
+import os
+import struct
+from binascii import crc32
+
+DIVE_LOG_MAX = 512 * 1024 #------------ Size past which the log is rotated at its next calibration block
+
+BLOCK_SIZE = 4096
+BLOCK_MAGIC = b"NFLB"
+HEADER_FORMAT = "<4sIHBBI"
+HEADER_SIZE = 16
+
+KIND_SAMPLES = 0
+KIND_CALIBRATION = 1
+
+SAMPLE_FORMAT = "<IIIihBB"
+SAMPLE_SIZE = 20
+
+CALIBRATION_FORMAT = "<B7H"
+CALIBRATION_SIZE = 15
+
+# Sample flags
+FLAG_MOVING = 0x01 #------------------- Piston was being driven when the sample was taken
+
+class DiveLogger(object):
+
+    def __init__(self, path="dive.log", blocks=4, max_bytes=DIVE_LOG_MAX, old_path="dive.old"):
+        self._path = path
+        self._old_path = old_path
+        self._max_bytes = max_bytes
+        self._blocks = blocks
+        self._per_block = (BLOCK_SIZE - HEADER_SIZE) // SAMPLE_SIZE
+        self._buf = bytearray(BLOCK_SIZE * blocks)
+        self._mv = memoryview(self._buf)
+        self._head = 0 #----------------------- Block being filled
+        self._tail = 0 #----------------------- Oldest block not yet on flash
+        self._count = 0 #---------------------- Records in the head block
+        self._seq = self._recover()
+        self.samples = 0
+        self.blocks_written = 0
+
+    # Pads a torn block at the end of the file out to BLOCK_SIZE, and returns the sequence number to carry on from,
+    # so blocks stay in order when a log is reopened after a reboot
+    def _recover(self):
+        try:
+            with open(self._path, "rb") as f:
+                end = f.seek(0, 2)
+        except OSError:
+            return 0
+        torn = end % BLOCK_SIZE
+        if torn:
+            with open(self._path, "ab") as f:
+                f.write(b"\xff" * (BLOCK_SIZE - torn))
+            end += BLOCK_SIZE - torn
+
+        # The torn block's header may not have made it to flash: look at the block before it too
+        with open(self._path, "rb") as f:
+            for block in range(end // BLOCK_SIZE - 1, max(-1, end // BLOCK_SIZE - 3), -1):
+                f.seek(block * BLOCK_SIZE)
+                magic, seq, count, kind, size, crc = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+                if magic == BLOCK_MAGIC:
+                    return seq + 1
+        return 0
+
+    # Records a sample. This only packs 20 bytes into RAM. If every block in the ring is full and still waiting for
+    # flush_full(), the oldest block is written out first so nothing is dropped.
+    def log(self, tick, d1, d2, count, duty, osr, flags=0):
+        offset = self._head * BLOCK_SIZE + HEADER_SIZE + self._count * SAMPLE_SIZE
+        struct.pack_into(SAMPLE_FORMAT, self._buf, offset, tick & 0xFFFFFFFF, d1, d2, count, duty >> 1, osr, flags)
+        self._count += 1
+        self.samples += 1
+        if self._count == self._per_block:
+            self._advance()
+
+    # Closes the head block and moves on to the next one in the ring
+    def _advance(self):
+        self._seal(self._head, self._count, KIND_SAMPLES, SAMPLE_SIZE)
+        self._head = (self._head + 1) % self._blocks
+        self._count = 0
+        if self._head == self._tail:
+            # Ring is full: make room
+            self._write(self._tail)
+            self._tail = (self._tail + 1) % self._blocks
+
+    # Fills in a block's header and pads the unused part of the block. Full sample blocks have no unused part
+    # (204 records fill a block exactly), so the padding loop only runs for blocks flushed early.
+    def _seal(self, block, count, kind, size):
+        start = block * BLOCK_SIZE
+        end = start + HEADER_SIZE + count * size
+        for i in range(end, start + BLOCK_SIZE):
+            self._buf[i] = 0xFF
+        crc = crc32(self._mv[start + HEADER_SIZE:end]) & 0xFFFFFFFF
+        struct.pack_into(HEADER_FORMAT, self._buf, start, BLOCK_MAGIC, self._seq, count, kind, size, crc)
+        self._seq += 1
+
+    def _write(self, block):
+        with open(self._path, "ab") as f:
+            f.write(self._mv[block * BLOCK_SIZE:(block + 1) * BLOCK_SIZE])
+        self.blocks_written += 1
+
+    # Number of full blocks waiting for flash
+    def pending(self):
+        return (self._head - self._tail) % self._blocks
+
+    # Writes out every full block. Cheap to call when nothing is pending; call it from the main loop between moves.
+    def flush_full(self):
+        while self._tail != self._head:
+            self._write(self._tail)
+            self._tail = (self._tail + 1) % self._blocks
+
+    # Writes everything, including the block still being filled. Use at the surface or before deepsleep.
+    def flush(self):
+        self.flush_full()
+        if self._count:
+            self._seal(self._head, self._count, KIND_SAMPLES, SAMPLE_SIZE)
+            self._write(self._head)
+            self._head = (self._head + 1) % self._blocks
+            self._tail = self._head
+            self._count = 0
+
+    # Writes a calibration block straight to flash, so the raw samples that follow can be compensated on the ground.
+    # This is where the log is rotated, so every file starts with a calibration block.
+    def log_calibration(self, model, prom):
+        self.flush()
+        try:
+            if os.stat(self._path)[6] >= self._max_bytes:
+                os.rename(self._path, self._old_path)
+        except OSError:
+            pass
+        block = self._head
+        struct.pack_into(CALIBRATION_FORMAT, self._buf, block * BLOCK_SIZE + HEADER_SIZE, model, *prom)
+        self._seal(block, 1, KIND_CALIBRATION, CALIBRATION_SIZE)
+        self._write(block)
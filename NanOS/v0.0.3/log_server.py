@@ -0,0 +1,187 @@
+#================================================================================================================================================
+#                                                              log_server
+
+# Serves log files over plain TCP so they can be pulled off the float at the surface (see nanolog on the host side).
+#
+# Protocol. The client opens a connection and sends one request line:
+#
+#   GET <file name> <byte offset>\n
+#
+# The server answers with a header (HEADER_FORMAT): magic b"NFLT", the file's size, and the offset it will start
+# from. That offset is the requested one rounded down to a CHUNK_SIZE boundary, or 0 if the file is now shorter
+# than the request (the log was cleared since the last download). A size of NO_FILE refuses the request: a file
+# that isn't served or doesn't exist, or a malformed request line. Otherwise the file follows as chunks, from that
+# offset to the end:
+#
+#   CHUNK_FORMAT: byte offset (uint32), raw length (uint16), sent length (uint16), CRC32 of the raw bytes (uint32)
+#   then `sent length` bytes of raw deflate data, or the raw bytes themselves when sent length == raw length
+#
+# A chunk with raw length 0 ends the transfer. Every chunk is compressed on its own, so a client that loses the link
+# keeps every chunk it has checked and asks again from the first byte it is missing. Chunks are CHUNK_SIZE bytes,
+# the dive log's block size, so a resumed download starts on a log block.
+#
+# Compression uses MicroPython's deflate module (1.21 and up) with a small window to keep its RAM use down. Without
+# it (older firmware, or CPython under nanosim) zlib is used if it can compress, and chunks are sent stored if not.
+# Stock ESP32 builds ship deflate with compression compiled out: DeflateIO.write() raises OSError(EOPNOTSUPP). So the
+# first chunk tries each compressor on a short sample and keeps the first that works (see _probe()).
+
+import struct
+import socket
+from binascii import crc32
+from io import BytesIO
+
+try:
+    import deflate
+except ImportError:
+    deflate = None
+try:
+    import zlib
+except ImportError:
+    zlib = None
+
+LOG_PORT = 8270
+CHUNK_SIZE = 4096
+DEFLATE_WBITS = 10 #------------------- 1 KB compression window
+
+HEADER_MAGIC = b"NFLT"
+HEADER_FORMAT = "<4sII"
+HEADER_SIZE = 12
+NO_FILE = 0xFFFFFFFF
+CHUNK_FORMAT = "<IHHI"
+CHUNK_HEADER_SIZE = 12
+
+def _deflate(data):
+    out = BytesIO()
+    with deflate.DeflateIO(out, deflate.RAW, DEFLATE_WBITS) as d:
+        d.write(data)
+    return out.getvalue()
+
+def _zlib(data):
+    c = zlib.compressobj(9, zlib.DEFLATED, -DEFLATE_WBITS)
+    return c.compress(data) + c.flush()
+
+_compressor = None #------------------- Compressing function once probed, False if none works
+
+# Returns the first compressor that actually compresses, or False
+def _probe():
+    candidates = []
+    if deflate is not None:
+        candidates.append(_deflate)
+    if zlib is not None and hasattr(zlib, "compressobj"):
+        candidates.append(_zlib)
+    for candidate in candidates:
+        try:
+            candidate(b"NanOS" * 8)
+        except (OSError, ValueError, AttributeError):
+            continue
+        return candidate
+    return False
+
+# Compresses one chunk to raw deflate data. Returns None when there's no working compressor or it didn't make the
+# chunk any smaller, in which case the chunk is sent stored.
+def compress(data):
+    global _compressor
+    if _compressor is None:
+        _compressor = _probe()
+    if not _compressor:
+        return None
+    try:
+        packed = _compressor(data)
+    except OSError:
+        # No memory for the window, say: this chunk goes stored and the next one tries again
+        return None
+    if len(packed) >= len(data):
+        return None
+    return packed
+
+# Reads the request line, without assuming the socket has readline()
+def _read_request(conn):
+    line = b""
+    while not line.endswith(b"\n"):
+        part = conn.recv(64)
+        if not part:
+            return None
+        line += part
+        if len(line) > 128:
+            return None
+    return line.decode().split()
+
+def _file_size(path):
+    try:
+        with open(path, "rb") as f:
+            return f.seek(0, 2)
+    except OSError:
+        return -1
+
+class LogServer(object):
+
+    def __init__(self, port=LOG_PORT, files=("dive.log",)):
+        self._port = port
+        self._files = files #----------------- Only these files can be requested
+        self._chunk = bytearray(CHUNK_SIZE)
+        self._mv = memoryview(self._chunk)
+        self.bytes_sent = 0
+        self.bytes_raw = 0
+
+    # Accepts clients one at a time until none has connected for idle_s seconds.
+    # Returns the number of transfers that reached the end of their file.
+    def serve(self, idle_s=120):
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(socket.getaddrinfo("0.0.0.0", self._port)[0][-1])
+        s.listen(1)
+        s.settimeout(idle_s)
+        print("Log server listening on port", self._port)
+        completed = 0
+        try:
+            while True:
+                try:
+                    conn, addr = s.accept()
+                except OSError:
+                    break # Nobody came back within idle_s
+                try:
+                    conn.settimeout(10)
+                    if self.handle(conn):
+                        completed += 1
+                except OSError as e:
+                    # The link dropped: the client resumes from its last good chunk
+                    print("Log transfer to", addr[0], "interrupted:", e)
+                finally:
+                    conn.close()
+        finally:
+            s.close()
+        return completed
+
+    # Serves one request on an open connection. Returns True when the whole file was sent.
+    def handle(self, conn):
+        request = _read_request(conn)
+        # The offset must be plain digits: int() would raise on anything else, and take "-4096"
+        if not request or len(request) != 3 or request[0] != "GET" or request[1] not in self._files \
+                or not request[2].isdigit():
+            conn.sendall(struct.pack(HEADER_FORMAT, HEADER_MAGIC, NO_FILE, 0))
+            return False
+        path = request[1]
+        size = _file_size(path)
+        if size < 0:
+            conn.sendall(struct.pack(HEADER_FORMAT, HEADER_MAGIC, NO_FILE, 0))
+            return False
+        offset = int(request[2])
+        offset = offset - offset % CHUNK_SIZE if offset <= size else 0
+        conn.sendall(struct.pack(HEADER_FORMAT, HEADER_MAGIC, size, offset))
+
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while offset < size:
+                n = f.readinto(self._chunk)
+                if not n:
+                    break
+                raw = self._mv[:n]
+                packed = compress(raw)
+                body = raw if packed is None else packed
+                conn.sendall(struct.pack(CHUNK_FORMAT, offset, n, len(body), crc32(raw) & 0xFFFFFFFF))
+                conn.sendall(body)
+                self.bytes_raw += n
+                self.bytes_sent += CHUNK_HEADER_SIZE + len(body)
+                offset += n
+        conn.sendall(struct.pack(CHUNK_FORMAT, offset, 0, 0, 0))
+        return True
@@ -0,0 +1,96 @@
+#================================================================================================================================================
+#                                                              mission_state
+
+# Mission state kept in RTC memory, which survives deepsleep but not a power cycle or a reflash.
+#
+# The dive executor in boot.py deep sleeps between control points, and every wake is a fresh boot. Before each
+# sleep it saves where the mission is up to here, and boot.py reads it back on a deepsleep wake to carry on from the
+# same point without setting up the radio or WebREPL.
+#
+# RTC memory layout (STATE_FORMAT, 32 bytes):
+#
+#   magic b"NFMS", dive index (uint8), number of dives (uint8), phase (uint8), spare (uint8),
+#   piston count (int32), next wake (uint32, time.time() seconds), bottom time (uint32, s),
+#   surface time (uint32, s), hold depth (uint16, cm, 0 for an open-loop dive), hold tolerance (uint16, cm),
+#   CRC32 of everything before it (uint32)
+#
+# Anything that doesn't check out (a cold boot leaves RTC memory empty) reads as no mission.
+
+import struct
+from binascii import crc32
+from machine import RTC
+
+STATE_MAGIC = b"NFMS"
+STATE_FORMAT = "<4sBBBBiIIIHHI"
+STATE_SIZE = 32
+
+# Phases, in the order a dive goes through them
+PHASE_IDLE = 0 #----------------------- No mission
+PHASE_SINK = 1 #----------------------- Retract the piston and sink
+PHASE_BOTTOM = 2 #--------------------- Hold the commanded depth (or just sleep) for the bottom time
+PHASE_RISE = 3 #----------------------- Extend the piston and rise
+PHASE_SURFACE = 4 #-------------------- Sleep at the surface for the surface time, then start the next dive
+PHASE_DONE = 5 #----------------------- Every dive finished
+
+PHASE_NAMES = ("idle", "sink", "bottom", "rise", "surface", "done")
+
+class MissionState(object):
+
+    def __init__(self):
+        self._rtc = RTC()
+        self.clear()
+
+    # Resets to no mission, in RAM only. save() to make it stick.
+    def clear(self):
+        self.dive = 0
+        self.dives = 0
+        self.phase = PHASE_IDLE
+        self.position = 0
+        self.next_wake = 0
+        self.bottom_s = 0
+        self.surface_s = 0
+        self.depth_cm = 0
+        self.tolerance_cm = 0
+
+    def start(self, dives, bottom_s, surface_s, depth_cm=0, tolerance_cm=25):
+        self.clear()
+        self.dives = dives
+        self.bottom_s = bottom_s
+        self.surface_s = surface_s
+        self.depth_cm = depth_cm
+        self.tolerance_cm = tolerance_cm
+        self.phase = PHASE_SINK
+
+    # True while there are dives left to run
+    def active(self):
+        return PHASE_IDLE < self.phase < PHASE_DONE
+
+    # Reads the state back from RTC memory. Returns False, leaving no mission, if there isn't a valid one.
+    def load(self):
+        data = self._rtc.memory()
+        if len(data) < STATE_SIZE:
+            self.clear()
+            return False
+        fields = struct.unpack(STATE_FORMAT, data[:STATE_SIZE])
+        if fields[0] != STATE_MAGIC or fields[-1] != crc32(data[:STATE_SIZE - 4]) & 0xFFFFFFFF:
+            self.clear()
+            return False
+        magic, self.dive, self.dives, self.phase, spare, self.position, self.next_wake, \
+            self.bottom_s, self.surface_s, self.depth_cm, self.tolerance_cm, crc = fields
+        return True
+
+    def save(self):
+        data = bytearray(STATE_SIZE)
+        struct.pack_into(STATE_FORMAT[:-1], data, 0, STATE_MAGIC, self.dive, self.dives, self.phase, 0,
+                         self.position, self.next_wake, self.bottom_s, self.surface_s, self.depth_cm, self.tolerance_cm)
+        struct.pack_into("<I", data, STATE_SIZE - 4, crc32(data[:STATE_SIZE - 4]) & 0xFFFFFFFF)
+        self._rtc.memory(data)
+
+    # Wipes the mission from RTC memory, so the next wake doesn't resume it
+    def erase(self):
+        self.clear()
+        self._rtc.memory(b"")
+
+    def __repr__(self):
+        return "<mission dive %d/%d %s, piston %d>" % (min(self.dive + 1, self.dives), self.dives, PHASE_NAMES[self.phase],
+                                                      self.position)
@@ -0,0 +1,76 @@
+#================================================================================================================================================
+#                                                              motion_health
+
+# Piston motion health: is the piston moving as fast as the duty driving it should make it?
+#
+# boot.py's encoder ISR stamps every edge into a ring buffer, and encoder_velocity() turns that into a speed on
+# demand. piston_tick() passes the speed and the duty it is driving to update() every control tick while the motor
+# runs. update() keeps an exponentially filtered speed, and the speed the duty should give (full_speed counts/s at
+# full duty, in proportion below that) filtered the same way, so the lag of the filter and of the motor on the ramps
+# doesn't look like a slow-down.
+#
+# A piston that stays below slow_pct percent of the expected speed for slow_ms is flagged slow. That points to a
+# jam building up, a low battery or dragging seals. Nothing is stopped here: the current monitor and the limit switch
+# do that. The flag, the time spent slow and the speed ratio go into each move's summary (see move_log in boot.py),
+# so a drifting ratio over many dives shows the actuator wearing before a mission fails. All maths is integer, as
+# this runs in the timer callback.
+
+MOTION_FULL_SPEED = 2000 #------------- Piston speed at full duty, in counts/s
+MOTION_SLOW_PCT = 60 #----------------- Speeds below this percentage of the expected speed count as slow
+MOTION_SLOW_MS = 200 #----------------- How long the piston must stay slow before it's flagged
+
+class MotionHealth(object):
+
+    def __init__(self, full_speed=MOTION_FULL_SPEED, slow_pct=MOTION_SLOW_PCT, slow_ms=MOTION_SLOW_MS,
+                 filter_shift=2):
+        self.full_speed = full_speed
+        self._slow_pct = slow_pct
+        self._slow_ms = slow_ms
+        self._shift = filter_shift #---------- Filter weight of a new reading is 1 / 2**filter_shift
+        self.start()
+
+    # Resets the filters and the per-move statistics. Call it as a move starts.
+    def start(self):
+        self.velocity = 0 #------------------- Last speed passed in, in counts/s, positive extending
+        self.filtered = 0 #------------------- Filtered speed
+        self.expected = 0 #------------------- Filtered speed the duty should give
+        self.peak = 0 #----------------------- Highest filtered speed this move, either direction
+        self.slow = False #------------------- Flagged slow at some point this move
+        self.slow_ms = 0 #-------------------- Time spent flagged slow this move
+        self._slow_for = 0
+        self._pct_sum = 0
+        self._pct_n = 0
+
+    # Takes the piston's speed and the signed duty driving it, dt_ms after the previous update.
+    # Returns True while the piston is flagged slow.
+    def update(self, velocity, duty, dt_ms):
+        self.velocity = velocity
+        self.filtered += (velocity - self.filtered) >> self._shift
+        self.expected += (self.full_speed * duty // 65535 - self.expected) >> self._shift
+        speed = abs(self.filtered)
+        expected = abs(self.expected)
+        if speed > self.peak:
+            self.peak = speed
+        if not duty or not expected:
+            self._slow_for = 0
+            return False
+
+        pct = speed * 100 // expected
+        self._pct_sum += pct
+        self._pct_n += 1
+        if pct >= self._slow_pct:
+            self._slow_for = 0
+            return False
+        self._slow_for += dt_ms
+        if self._slow_for < self._slow_ms:
+            return False
+        if self._slow_for - dt_ms < self._slow_ms:
+            # Just flagged: the time it took to be flagged counts as slow too
+            self.slow_ms += self._slow_for - dt_ms
+        self.slow_ms += dt_ms
+        self.slow = True
+        return True
+
+    # Mean speed this move as a percentage of the expected speed, 0 before any update
+    def speed_pct(self):
+        return self._pct_sum // self._pct_n if self._pct_n else 0
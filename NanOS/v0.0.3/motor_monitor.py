@@ -0,0 +1,80 @@
+#================================================================================================================================================
+#                                                              motor_monitor
+
+# Piston motor current monitor.
+#
+# The DRV8833's current flows through a sense resistor to ground, and the voltage across it is read on an ADC pin.
+# piston_tick() calls sample() every control tick while the motor is driven. Each call reads a burst of ADC samples,
+# averages them to knock down PWM ripple, and feeds the average into an exponential filter (integer maths only, as
+# this runs in the timer callback).
+#
+# A motor that stalls, whether jammed or driven into a hard stop at either end of the stroke, draws several times
+# its running current. sample() reports a stall once the filtered current has stayed above stall_ma for stall_ms, so
+# the motor is cut within a few ticks instead of at the end of the move's timeout. The inrush when the motor starts
+# looks like a stall, so nothing is reported for the first inrush_ms of a move.
+#
+# Peak and mean current are kept for every move (see peak_ma() and mean_ma()).
+
+from time import ticks_ms, ticks_diff
+
+MOTOR_FULL_SCALE_MA = 2000 #----------- Motor current that reads 65535 on the ADC
+MOTOR_STALL_MA = 1200 #---------------- Filtered current above which the motor counts as stalled
+MOTOR_STALL_MS = 30 #------------------ How long the current must stay above MOTOR_STALL_MA
+MOTOR_INRUSH_MS = 60 #----------------- Start of a move in which high current is expected and ignored
+
+class MotorMonitor(object):
+
+    def __init__(self, adc, full_scale_ma=MOTOR_FULL_SCALE_MA, stall_ma=MOTOR_STALL_MA, stall_ms=MOTOR_STALL_MS,
+                 inrush_ms=MOTOR_INRUSH_MS, burst=4, filter_shift=2):
+        self._adc = adc
+        self._full_scale_ma = full_scale_ma
+        self._stall_counts = stall_ma * 65535 // full_scale_ma
+        self._stall_ms = stall_ms
+        self._inrush_ms = inrush_ms
+        self._burst = burst
+        self._shift = filter_shift #---------- Filter weight of a new reading is 1 / 2**filter_shift
+        self.start()
+
+    # Resets the filter and the per-move statistics. Call it as the motor starts.
+    def start(self):
+        self._start = ticks_ms()
+        self._over_since = None
+        self.filtered = 0 #------------------- Filtered reading, in ADC counts
+        self.peak = 0 #----------------------- Highest reading this move, in ADC counts
+        self._sum = 0
+        self.samples = 0
+        self.stalled = False
+
+    # Takes one burst of readings. Returns True once the motor has been stalled for stall_ms.
+    def sample(self):
+        adc = self._adc
+        total = 0
+        for _ in range(self._burst):
+            total += adc.read_u16()
+        reading = total // self._burst
+        self.filtered += (reading - self.filtered) >> self._shift
+        if reading > self.peak:
+            self.peak = reading
+        self._sum += reading
+        self.samples += 1
+
+        now = ticks_ms()
+        if self.filtered < self._stall_counts or ticks_diff(now, self._start) < self._inrush_ms:
+            self._over_since = None
+        elif self._over_since is None:
+            self._over_since = now
+        elif ticks_diff(now, self._over_since) >= self._stall_ms:
+            self.stalled = True
+        return self.stalled
+
+    def ma(self, counts):
+        return counts * self._full_scale_ma // 65535
+
+    def current_ma(self):
+        return self.ma(self.filtered)
+
+    def peak_ma(self):
+        return self.ma(self.peak)
+
+    def mean_ma(self):
+        return self.ma(self._sum // self.samples) if self.samples else 0
@@ -0,0 +1,126 @@
+#================================================================================================================================================
+#                                                           piston_journal
+
+# Append-only, wear-leveled journal of the piston position.
+#
+# Every save appends one fixed-size binary record to the active journal file:
+#
+#   offset  size  field
+#   0       4     sequence number (uint32, increases by one per record)
+#   4       4     piston position in encoder counts (int32)
+#   8       4     CRC32 of bytes 0-7
+#
+# Records are spread over a ring of JOURNAL_FILES files. When the active file holds records_per_file records the
+# journal moves on to the next file in the ring and truncates it, so no single file is rewritten over and over and
+# the journal never grows past JOURNAL_FILES * records_per_file records.
+#
+# A save is a single small append. If power drops mid-write, only the torn record at the end of the file is lost:
+# recover() checks the CRC and falls back to the record before it.
+
+import struct
+from binascii import crc32
+
+RECORD_FORMAT = "<IiI"
+RECORD_SIZE = 12
+
+JOURNAL_FILES = 4
+JOURNAL_PREFIX = "pos"
+
+class PositionJournal(object):
+
+    def __init__(self, prefix=JOURNAL_PREFIX, files=JOURNAL_FILES, records_per_file=256):
+        self._prefix = prefix
+        self._files = files
+        self._records_per_file = records_per_file
+        self._buf = bytearray(RECORD_SIZE)
+        self._file = 0
+        self._count = 0
+        self._seq = 0
+        self._position = None
+
+    def _name(self, index):
+        return "%s%d.jnl" % (self._prefix, index)
+
+    # Packs a record into the preallocated buffer and returns it
+    def _pack(self, seq, position):
+        struct.pack_into("<Ii", self._buf, 0, seq, position)
+        struct.pack_into("<I", self._buf, 8, crc32(memoryview(self._buf)[:8]) & 0xFFFFFFFF)
+        return self._buf
+
+    # Returns (seq, position) for a valid record, or None for a torn or blank one
+    def _unpack(self, data):
+        if len(data) != RECORD_SIZE:
+            return None
+        seq, position, crc = struct.unpack(RECORD_FORMAT, data)
+        if crc != crc32(memoryview(data)[:8]) & 0xFFFFFFFF:
+            return None
+        return seq, position
+
+    # Sequence number of the first record in a journal file, or None if the file is missing or empty
+    def _first_seq(self, index):
+        try:
+            with open(self._name(index), "rb") as f:
+                record = self._unpack(f.read(RECORD_SIZE))
+        except OSError:
+            return None
+        if record is None:
+            return None
+        return record[0]
+
+    # Finds the newest journal file and reads back the last valid record in it.
+    # Returns the recovered position, or default if the journal is empty.
+    def recover(self, default=0):
+        newest = None
+        newest_seq = -1
+        for i in range(self._files):
+            seq = self._first_seq(i)
+            if seq is not None and seq > newest_seq:
+                newest = i
+                newest_seq = seq
+
+        if newest is None:
+            self._file = 0
+            self._count = 0
+            self._seq = 0
+            self._position = None
+            return default
+
+        self._file = newest
+        record = None
+        with open(self._name(newest), "rb") as f:
+            count = f.seek(0, 2) // RECORD_SIZE
+            # Normally a single seek to the last record. A torn final write fails its CRC, so step back over it.
+            while count > 0:
+                f.seek((count - 1) * RECORD_SIZE)
+                record = self._unpack(f.read(RECORD_SIZE))
+                if record is not None:
+                    break
+                count -= 1
+
+        self._count = count
+        if record is None:
+            self._seq = newest_seq
+            self._position = None
+            return default
+
+        self._seq = record[0] + 1
+        self._position = record[1]
+        return record[1]
+
+    # Appends a record for position, moving on to the next file in the ring when the active one is full.
+    # Saving the position that is already on record is skipped.
+    def append(self, position):
+        if position == self._position:
+            return
+        if self._count >= self._records_per_file:
+            self._file = (self._file + 1) % self._files
+            self._count = 0
+        # Writing at the end of the last good record (rather than appending) overwrites a torn record, if there is one,
+        # so records stay aligned
+        mode = "r+b" if self._count else "wb"
+        with open(self._name(self._file), mode) as f:
+            f.seek(self._count * RECORD_SIZE)
+            f.write(self._pack(self._seq, position))
+        self._count += 1
+        self._seq += 1
+        self._position = position
@@ -1 +0,0 @@
-position = 0
\ No newline at end of file
@@ -0,0 +1,133 @@
+#================================================================================================================================================
+#                                                              sampler
+
+# Fixed-rate pressure sampling on a machine.Timer.
+#
+# Every timer tick starts an MS5837 conversion (one I2C write) and stamps it with ticks_us and ticks_ms, so samples
+# are taken on the timer's schedule no matter what the main loop is doing. The main loop calls poll(), which
+# finishes the conversion with the sensor's non-blocking ready()/collect() and returns True once per new sample.
+#
+# Every tick is checked against its deadline (start + n * period):
+#   - skipped: a deadline passed without a sample, because the timer fired more than a period late or the previous
+#     sample still hadn't been collected
+#   - late: the tick came more than late_us after its deadline
+# and the interval between consecutive samples is compared with the period to keep running statistics of period
+# jitter (count, mean, standard deviation, min, max), which stats() returns.
+#
+# The owner can change the period between samples with set_period(). With oversampling=OSR_ADAPTIVE the sensor picks
+# the OSR of each sample from the rate of pressure change (see ms5837.adaptive_osr).
+
+from time import ticks_us, ticks_ms, ticks_diff, ticks_add
+from machine import Timer
+from ms5837 import OSR_8192
+
+SAMPLER_TIMER = 1 #-------------------- Timer 0 runs the piston control loop
+
+class Sampler(object):
+
+    def __init__(self, sensor, period_ms=1000, oversampling=OSR_8192, timer_id=SAMPLER_TIMER, late_us=2000):
+        self._sensor = sensor
+        self._period_us = period_ms * 1000
+        self._period_ms = period_ms
+        self._osr = oversampling
+        self._timer = Timer(timer_id)
+        self._late_us = late_us
+        self._deadline = 0
+        self._pending = False #--------------- A conversion was started and hasn't been collected yet
+        self._last_stamp = None
+        self.stamp_us = 0 #------------------- ticks_us at which the latest sample's conversion started
+        self.stamp_ms = 0 #------------------- ticks_ms for the same moment, for logs that outlive a ticks_us wrap
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.samples = 0
+        self.skipped = 0
+        self.late = 0
+        self._n = 0
+        self._sum = 0
+        self._sum_sq = 0
+        self._min = 0
+        self._max = 0
+
+    def start(self):
+        self._deadline = ticks_add(ticks_us(), self._period_us)
+        self._last_stamp = None
+        self._timer.init(mode=Timer.PERIODIC, period=self._period_ms, callback=self._tick)
+
+    def stop(self):
+        self._timer.deinit()
+        self._pending = False
+
+    # Changes the period from the next tick on, restarting the timer. Called between samples (after poll()), so no
+    # conversion is in flight. The interval across the change isn't counted as jitter.
+    def set_period(self, period_ms):
+        if period_ms == self._period_ms:
+            return
+        self._period_ms = period_ms
+        self._period_us = period_ms * 1000
+        self.start()
+
+    def _tick(self, timer):
+        now = ticks_us()
+        lateness = ticks_diff(now, self._deadline)
+
+        # Whole periods that went by without a tick. Intervals that span a skip aren't counted as jitter.
+        while lateness >= self._period_us:
+            self.skipped += 1
+            self._last_stamp = None
+            self._deadline = ticks_add(self._deadline, self._period_us)
+            lateness -= self._period_us
+        self._deadline = ticks_add(self._deadline, self._period_us)
+
+        if self._pending or not self._sensor.start(self._osr):
+            # The last sample is still waiting for poll() (skip this one rather than overwrite it), or the sensor
+            # couldn't start a conversion
+            self.skipped += 1
+            self._last_stamp = None
+            return
+        if lateness > self._late_us:
+            self.late += 1
+        self._pending = True
+        self.stamp_ms = ticks_ms()
+        if self._last_stamp is not None:
+            jitter = ticks_diff(now, self._last_stamp) - self._period_us
+            if self._n == 0 or jitter < self._min:
+                self._min = jitter
+            if self._n == 0 or jitter > self._max:
+                self._max = jitter
+            self._n += 1
+            self._sum += jitter
+            self._sum_sq += jitter * jitter
+        self._last_stamp = now
+        self.stamp_us = now
+
+    # Finishes the conversion started by the last tick. Returns True once for each new sample.
+    def poll(self):
+        if not self._pending or not self._sensor.ready():
+            return False
+        # Collect before clearing _pending, so a tick in between can't start a conversion over this sample
+        ok = self._sensor.collect()
+        self._pending = False
+        if ok:
+            self.samples += 1
+        return ok
+
+    # Microseconds until the conversion in progress is done, for callers that want to sleep until then
+    def remaining_us(self):
+        return self._sensor.remaining_us() if self._pending else 0
+
+    # Running statistics, with jitter in microseconds
+    def stats(self):
+        n = self._n
+        mean = self._sum / n if n else 0.0
+        var = self._sum_sq / n - mean * mean if n else 0.0
+        return {
+            "period_us": self._period_us,
+            "samples": self.samples,
+            "skipped": self.skipped,
+            "late": self.late,
+            "jitter_mean_us": mean,
+            "jitter_std_us": var ** 0.5 if var > 0 else 0.0,
+            "jitter_min_us": self._min,
+            "jitter_max_us": self._max,
+        }
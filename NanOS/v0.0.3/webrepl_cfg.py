@@ -1,3 +1,5 @@
 # This file contains the WebREPL password. It is required for secure remote access of the nanofloat.
+# boot.py copies it into config.bin on a boot with no config.bin. After that, change it with
+# config_set("webrepl_password", ...).
 
 PASS = 'nanofloat'
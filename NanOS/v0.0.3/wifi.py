@@ -0,0 +1,222 @@
+#================================================================================================================================================
+#                                                              wifi
+
+# Wi-Fi connection manager: station mode with bounded attempts and a cached access point, falling back to the
+# float's own access point.
+#
+# start() begins connecting and returns straight away; poll() moves the connection along and status() says where
+# it's up to, so callers can carry on (e.g. finish surfacing) while the radio comes up. wait() does the polling for
+# callers that would rather block.
+#
+# Station mode is only tried when there is a router SSID. Each attempt either re-associates straight to the
+# BSSID and channel cached from the last good connection, which skips the scan, or scans and picks the strongest
+# access point with that SSID. An attempt that hasn't got an IP within attempt_ms fails; a failed cached attempt
+# drops the cache so the next one scans. After `attempts` failures the float starts its own access point, named
+# network_name, as it always has.
+#
+# WLAN.scan() blocks for about 2 s and MicroPython has no way to run it in the background. So start() never scans:
+# an attempt that needs a scan leaves it to the next poll(), which blocks for the scan and connects. Every other
+# call returns straight away. With a cached BSSID there is no scan at all.
+#
+# Cache file (CACHE_FORMAT): BSSID (6 bytes), channel (uint8), SSID length (uint8), then the SSID and a CRC32 of
+# everything before it.
+
+import struct
+import network
+from binascii import crc32
+from time import ticks_ms, ticks_diff, sleep_ms
+
+CACHE_FILE = "wifi.bin"
+CACHE_FORMAT = "<6sBB"
+CACHE_SIZE = 8
+
+# Connection states
+STATE_OFF = 0
+STATE_CONNECTING = 1 #----------------- Station mode attempt in progress
+STATE_STATION = 2 #-------------------- Connected to the router
+STATE_ACCESS_POINT = 3 #--------------- Running the float's own access point
+STATE_FAILED = 4 #--------------------- Neither worked: USB connection required
+
+STATE_NAMES = ("off", "connecting", "station", "access point", "failed")
+
+# Station statuses that end an attempt early
+_FAILED = tuple(getattr(network, name) for name in ("STAT_NO_AP_FOUND", "STAT_WRONG_PASSWORD", "STAT_CONNECT_FAIL")
+                if hasattr(network, name))
+
+class WifiManager(object):
+
+    def __init__(self, network_name, ssid="", password="", attempts=3, attempt_ms=10000, cache_file=CACHE_FILE):
+        self._network_name = network_name #--- The float's own access point
+        self._ssid = ssid #------------------- Router to join in station mode, "" for none
+        self._key = password
+        self._attempts = attempts
+        self._attempt_ms = attempt_ms
+        self._cache_file = cache_file
+        self._cache = None #------------------ (bssid, channel) of the last good connection to _ssid
+        self._state = STATE_OFF
+        self._tries = 0
+        self._started = 0
+        self._cached_attempt = False
+        self._scan_pending = False #---------- The attempt in progress still has to scan, on the next poll()
+        self.sta = None
+        self.ap = None
+        self.connect_ms = 0 #----------------- How long the last successful station connection took
+
+    def status(self):
+        return self._state
+
+    def connected(self):
+        return self._state in (STATE_STATION, STATE_ACCESS_POINT)
+
+    # Interface the float can be reached on, or None
+    def interface(self):
+        if self._state == STATE_STATION:
+            return self.sta
+        if self._state == STATE_ACCESS_POINT:
+            return self.ap
+        return None
+
+    def ifconfig(self):
+        wlan = self.interface()
+        return wlan.ifconfig() if wlan is not None else None
+
+    # Starts connecting. Returns the state, which is already STATE_ACCESS_POINT if there is no router configured.
+    def start(self):
+        self._tries = 0
+        if not self._ssid:
+            self._start_access_point()
+            return self._state
+        self.sta = network.WLAN(network.STA_IF)
+        self.sta.active(True)
+        self._cache = self._load_cache()
+        self._state = STATE_CONNECTING
+        self._attempt()
+        return self._state
+
+    def _attempt(self):
+        self._tries += 1
+        self._started = ticks_ms()
+        self._cached_attempt = self._cache is not None
+        self._scan_pending = not self._cached_attempt
+        if self._scan_pending:
+            return
+        bssid, channel = self._cache
+        try:
+            try:
+                self.sta.config(channel=channel)
+            except (OSError, ValueError, TypeError):
+                pass # Not every port lets the station's channel be set, the BSSID alone still skips the scan
+            self.sta.connect(self._ssid, self._key, bssid=bssid)
+        except OSError:
+            self._fail()
+
+    # Second half of an attempt without a cached access point: blocks for the scan, then connects
+    def _scan_connect(self):
+        self._scan_pending = False
+        try:
+            best = self._scan()
+            if best is None:
+                self._fail()
+                return
+            self._cache = best
+            self.sta.connect(self._ssid, self._key, bssid=best[0])
+        except OSError:
+            self._fail()
+            return
+        # The attempt's time limit is for associating, not for the scan
+        self._started = ticks_ms()
+
+    # Strongest access point with our SSID, as (bssid, channel), or None
+    def _scan(self):
+        best = None
+        best_rssi = -1000
+        ssid = self._ssid.encode()
+        for found in self.sta.scan():
+            if found[0] == ssid and found[3] > best_rssi:
+                best = (bytes(found[1]), found[2])
+                best_rssi = found[3]
+        return best
+
+    # Moves the connection along: call it until status() is no longer STATE_CONNECTING. Returns the state.
+    # The poll that runs a scan blocks for it (see above); every other one returns straight away.
+    def poll(self):
+        if self._state != STATE_CONNECTING:
+            return self._state
+        if self._scan_pending:
+            self._scan_connect()
+            return self._state
+        status = self.sta.status()
+        if status == network.STAT_GOT_IP:
+            self.connect_ms = ticks_diff(ticks_ms(), self._started)
+            self._state = STATE_STATION
+            if not self._cached_attempt:
+                self._save_cache()
+        elif status in _FAILED or ticks_diff(ticks_ms(), self._started) > self._attempt_ms:
+            self._fail()
+        return self._state
+
+    def _fail(self):
+        try:
+            self.sta.disconnect()
+        except OSError:
+            pass
+        # Whatever was cached didn't work: rescan next time
+        self._cache = None
+        if self._tries < self._attempts:
+            self._attempt()
+            return
+        self.sta.active(False)
+        self._start_access_point()
+
+    def _start_access_point(self):
+        try:
+            self.ap = network.WLAN(network.AP_IF)
+            self.ap.config(ssid=self._network_name, max_clients=1)
+            self.ap.active(True)
+            self._state = STATE_ACCESS_POINT
+        except OSError:
+            self._state = STATE_FAILED
+
+    # Blocks until connected one way or the other, polling every poll_ms. Returns the state.
+    def wait(self, poll_ms=50):
+        while self.poll() == STATE_CONNECTING:
+            sleep_ms(poll_ms)
+        return self._state
+
+    def _load_cache(self):
+        try:
+            with open(self._cache_file, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < CACHE_SIZE + 4:
+            return None
+        bssid, channel, length = struct.unpack(CACHE_FORMAT, data[:CACHE_SIZE])
+        end = CACHE_SIZE + length
+        if len(data) < end + 4 or struct.unpack("<I", data[end:end + 4])[0] != crc32(data[:end]) & 0xFFFFFFFF:
+            return None
+        if data[CACHE_SIZE:end] != self._ssid.encode():
+            return None # Cached for a different router
+        return bssid, channel
+
+    def _save_cache(self):
+        if self._cache is None:
+            return
+        bssid, channel = self._cache
+        ssid = self._ssid.encode()
+        data = struct.pack(CACHE_FORMAT, bssid, channel, len(ssid)) + ssid
+        try:
+            with open(self._cache_file, "wb") as f:
+                f.write(data + struct.pack("<I", crc32(data) & 0xFFFFFFFF))
+        except OSError:
+            pass
+
+    def __repr__(self):
+        text = "<wifi %s" % STATE_NAMES[self._state]
+        if self._state == STATE_CONNECTING:
+            text += " to %s, attempt %d/%d%s" % (self._ssid, self._tries, self._attempts,
+                                                 " (cached)" if self._cached_attempt else
+                                                 " (scan pending)" if self._scan_pending else "")
+        elif self.connected():
+            text += " %s" % self.ifconfig()[0]
+        return text + ">"
@@ -1,2 +1,8 @@
 #This file saves the SSID name for reference on boot
-network_name = "NF1.1-01"
\ No newline at end of file
+# It is only read on a boot with no config.bin, which copies these settings into it. After that, change them with
+# config_set() (see the config section of boot.py).
+network_name = "NF1.1-01"
+
+# Router to join in station mode, if there is one in range. Leave router_ssid empty to always start the access point.
+router_ssid = ""
+router_password = ""